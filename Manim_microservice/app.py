@@ -1,15 +1,29 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
+import json
 from flask_cors import CORS
 import os
+from pathlib import Path
 from werkzeug.serving import run_simple
 import threading
-import queue
 import time
 from dotenv import load_dotenv
 from services.manim_executor import ManimExecutor
 from services.file_manager import FileManager
+from services.worker_pool import WorkerPool, compute_pool_size
+from services.result_cache import create_render_cache
+from services.upload_stage import UploadStage
+from services.job_store import create_job_store, MemoryJobStore, PENDING_STATES
+from services.work_queue import create_work_queue, SQLiteWorkQueue
+from services.render_predictor import RenderPredictor
+from services.render_profiles import RenderProfileStore
+from services.preflight import format_errors
+from services.webhook_dispatcher import WebhookDispatcher
+from services.admission import AdmissionController
+from services.metrics import (
+    registry, STAGE_SECONDS, JOBS_TOTAL, ACTIVE_JOBS, QUEUE_DEPTH, WORKERS, WORKER_UTILIZATION, WEBHOOK_OUTBOX,
+    PREDICTION_MAE, PREDICTION_MAPE
+)
 import atexit
-import requests
 
 
 load_dotenv()
@@ -17,139 +31,488 @@ load_dotenv()
 app = Flask(__name__)
 CORS(app)
 
+# What this process does: 'all' takes requests and renders; 'api' only takes requests
+# (run as many as needed: gunicorn -c gunicorn.conf.py app:app) and 'worker' only renders
+# (python worker.py). Split processes share the job store, work queue, render cache and
+# webhook outbox, which the render process delivers
+service_role = os.getenv('SERVICE_ROLE', 'all').lower()
+if service_role not in ('all', 'api', 'worker'):
+    raise ValueError(f"Unsupported SERVICE_ROLE: {service_role}")
+renders_here = service_role != 'api'
+shared = service_role != 'all'
+
 # Initialize services
-manim_executor = ManimExecutor()
+job_store = create_job_store()
+manim_executor = ManimExecutor(job_store=job_store)
 file_manager = FileManager()
+# Streaming uploads get one thread per render worker, apart from finished uploads
+upload_stage = UploadStage(stream_workers=compute_pool_size()) if renders_here else None
+webhook_dispatcher = WebhookDispatcher(poll_seconds=1 if shared else None)
+if renders_here:
+    webhook_dispatcher.start()
+
+# Initialize queue system (job state is persisted in the job store)
+render_predictor = RenderPredictor()
+render_profiles = RenderProfileStore()
+work_queue = create_work_queue(cost_fn=render_predictor.predict_job)
+if shared and (not work_queue.durable or isinstance(job_store, MemoryJobStore)):
+    raise ValueError(
+        f"SERVICE_ROLE={service_role} needs a JOB_STORE_URL and a WORK_QUEUE_URL (sqlite:// or redis://) "
+        "shared with the other processes"
+    )
+# Whoever finishes a render must release the jobs attached to it, so with a queue other
+# nodes lease from, identical jobs are only coalesced when renders in flight are tracked
+# where every node sees them: RENDER_CACHE_URL, or next to a SQLite queue
+render_cache_url = os.getenv('RENDER_CACHE_URL')
+if not render_cache_url and isinstance(work_queue, SQLiteWorkQueue):
+    render_cache_url = f"sqlite:///{work_queue.path.parent / 'render_cache.db'}"
+render_cache = create_render_cache(
+    render_cache_url, shared=shared, coalesce=bool(render_cache_url) or not work_queue.durable
+)
+max_job_attempts = int(os.getenv('MAX_JOB_ATTEMPTS', '3'))
+preflight_enabled = os.getenv('PREFLIGHT', 'true').lower() == 'true'
+# GET /render/<job_uuid>/events polls the job store this often and sends a comment line
+# when nothing changed for keepalive seconds
+events_poll_seconds = float(os.getenv('EVENTS_POLL_SECONDS', '0.5'))
+events_keepalive_seconds = float(os.getenv('EVENTS_KEEPALIVE_SECONDS', '15'))
+# /health is answered from a snapshot at most this old; the render process of a split
+# deployment writes its own to WORKER_STATUS_PATH every WORKER_STATUS_SECONDS
+health_cache_seconds = float(os.getenv('HEALTH_CACHE_SECONDS', '1'))
+worker_status_path = Path(os.getenv('WORKER_STATUS_PATH', 'data/worker_status.json'))
+worker_status_seconds = float(os.getenv('WORKER_STATUS_SECONDS', '2'))
+
+CANCELLED = {'success': False, 'status': 'cancelled', 'error': 'Job was cancelled'}
+
+def process_queued_job(lease, worker):
+    """Render one leased job on a render worker's container"""
+    job_data = lease.job_data
+    job_uuid = job_data.get('job_uuid')
+    if lease.deliveries > max_job_attempts:
+        complete_job(job_data, {
+            'success': False,
+            'error': f"Job was interrupted {lease.deliveries - 1} times and will not be retried"
+        }, lease)
+        return
+
+    try:
+        encoding = manim_executor.encoding_for(job_data.get('config') or {})
+    except ValueError as e:
+        complete_job(job_data, {'success': False, 'error': str(e)}, lease)
+        return
+
+    if not job_store.set_status(job_uuid, 'processing'):
+        # Cancelled before a worker got to it; jobs attached to it are re-queued
+        print(f"🛑 Skipping cancelled job {job_uuid}")
+        complete_job(job_data, dict(CANCELLED), lease)
+        return
+
+    output_path = manim_executor.output_path_for(job_uuid, encoding['format'])
+    object_name = manim_executor.object_name_for(job_uuid, encoding['format'])
+    streaming = None
+    started = time.time()
+    stages = {'queue_wait': round(started - job_data.get('enqueued_at', started), 3)}
+    STAGE_SECONDS.observe(stages['queue_wait'], stage='queue_wait')
+    ACTIVE_JOBS.inc()
+    try:
+        print(f"📋 Processing job: {job_uuid} (worker {worker.worker_id})")
+        # A transcoded video only appears once the encode pass is done
+        if upload_stage.streaming and not encoding['encode']:
+            streaming = upload_stage.stream(job_uuid, output_path, object_name, encoding['content_type'])
+        render = manim_executor.render_job(
+            job_data['job_uuid'],
+            job_data['code'],
+            job_data.get('config', {}) or {},
+            worker.container,
+            render_done=streaming.done_event if streaming else None,
+            run_parts=worker.run_parts
+        )
+    except Exception as e:
+        print(f"❌ Job {job_uuid or 'unknown'} exception: {str(e)}")
+        render = {'success': False, 'error': str(e)}
+    stages['render'] = round(time.time() - started, 3)
+    STAGE_SECONDS.observe(stages['render'], stage='render')
+
+    if not render.get('success'):
+        if streaming:
+            upload_stage.cancel(streaming)
+        complete_job(job_data, render, lease, stages)
+        return
 
-# Initialize queue system
-job_queue = queue.Queue()
-job_status={}
-job_results={}
+    # Hand the upload to the upload stage so this worker can take the next job
+    if not job_store.set_status(job_uuid, 'uploading'):
+        # Cancelled while it rendered (the cancel was already reported): don't upload
+        print(f"🛑 Dropping the render of cancelled job {job_uuid}")
+        if streaming:
+            upload_stage.cancel(streaming)
+        complete_job(job_data, dict(CANCELLED), lease, stages)
+        return
+    upload_started = time.time()
 
-# Register cleanup function
-atexit.register(lambda: manim_executor.stop_container())
+    def on_uploaded(s3_result):
+        stages['upload'] = round(time.time() - upload_started, 3)
+        STAGE_SECONDS.observe(stages['upload'], stage='upload')
+        complete_job(job_data, manim_executor.finish_upload(job_uuid, render, s3_result), lease, stages)
 
-def background_worker():
-    """Background worker to process jobs continuously"""
-    print("🔥 Background worker started")
+    if streaming:
+        upload_stage.attach(streaming, on_uploaded)
+    else:
+        upload_stage.submit(job_uuid, render['video_path'], object_name, on_uploaded, encoding['content_type'])
 
-    while True:
-        job_data = None
-        job_uuid = None
+def complete_job(job_data, result, lease=None, stages=None):
+    """Finish a job and every identical job that attached to its render"""
+    job_uuid = job_data.get('job_uuid')
+    if stages:
+        result['stages'] = stages
+    finish_job(job_uuid, result)
+    if lease is not None:
+        work_queue.ack(lease)
+    if stages is not None:
+        ACTIVE_JOBS.dec()
+    if stages:
         try:
-            job_data = job_queue.get() # blocks
-            job_uuid = job_data.get('job_uuid')
-            print(f"📋 Processing job: {job_uuid}")
-            job_status[job_uuid] = 'processing'
-             # Process the job using your existing logic
-            result = manim_executor.process_job(
-                job_data['job_uuid'],
-                job_data['code'],
-                job_data.get('config', {}) or {}
-            )
-
-            job_results[job_uuid] = result
-
-            if result.get('success'):
-                job_status[job_uuid] = 'completed'
-                print(f"✅ Job {job_uuid} completed successfully")
-                notify_backend_async(job_uuid, result)  # always notify
-            else:
-                job_status[job_uuid] = 'failed'
-                err_msg = result.get('error') or 'Unknown error'
-                print(f"❌ Job {job_uuid} failed: {err_msg}")
-                notify_backend_async(job_uuid, {
-                    'success': False,
-                    'video_path': None,
-                    'file_size': 0,
-                    'error': err_msg
-                })
+            render_predictor.record(job_data, stages, bool(result.get('success')))
         except Exception as e:
-            err_msg = str(e)
-            print(f"❌ Job {job_uuid or 'unknown'} exception: {err_msg}")
-            if job_uuid:
-                job_status[job_uuid] = 'failed'
-                job_results[job_uuid] = {
-                    'success': False,
-                    'video_path': None,
-                    'file_size': 0,
-                    'error': err_msg
-                }
-                notify_backend_async(job_uuid, {
-                    'success': False,
-                    'video_path': None,
-                    'file_size': 0,
-                    'error': err_msg
-                })
-        finally:
-            try:
-                job_queue.task_done()
-            except Exception:
-                pass
+            print(f"⚠️ Failed to record render stats for job {job_uuid}: {str(e)}")
+    if stages and result.get('profile'):
+        try:
+            render_profiles.record(job_uuid, result['profile'])
+        except Exception as e:
+            print(f"⚠️ Failed to record the render profile of job {job_uuid}: {str(e)}")
+
+    cache_key = job_data.get('cache_key')
+    if cache_key:
+        if result.get('success'):
+            render_cache.put(cache_key, result)
+        for follower_uuid in render_cache.finish(cache_key, leader=job_uuid):
+            if result.get('status') == 'cancelled':
+                # Cancelling one job must not take identical jobs down with it
+                record = job_store.get(follower_uuid)
+                if record:
+                    print(f"🔗 Job {follower_uuid} re-queued after identical job {job_uuid} was cancelled")
+                    submit_job(record['payload'], recovered=True)
+                continue
+            print(f"🔗 Job {follower_uuid} completed with the render of {job_uuid}")
+            finish_job(follower_uuid, result)
+
+def finish_job(job_uuid, result):
+    """Record a job's final result and notify the backend (once: a cancelled job stays cancelled)"""
+    record = job_store.get(job_uuid)
+    if record and record['status'] == 'cancelled':
+        # Already reported as cancelled; a render that finished anyway changes nothing
+        return
+    downshift = result.get('downshift') or (record['payload'].get('downshift') if record else None)
+    attempt = record['payload'].get('attempt') if record else None
+    if result.get('success'):
+        if downshift:
+            result = {**result, 'downshift': downshift}
+        if not job_store.finish(job_uuid, 'completed', result):
+            return
+        JOBS_TOTAL.inc(status='completed', error_class='')
+        print(f"✅ Job {job_uuid} completed successfully")
+        notify_backend_async(job_uuid, result, attempt)  # always notify
+    else:
+        err_msg = result.get('error') or 'Unknown error'
+        status = result.get('status') if result.get('status') in ('cancelled', 'timed_out') else 'failed'
+        failure = {
+            'success': False,
+            'status': status,
+            'video_path': None,
+            'file_size': 0,
+            'error': err_msg,
+            'error_category': result.get('error_category'),
+            'error_line': result.get('error_line'),
+            'downshift': downshift
+        }
+        if not job_store.finish(job_uuid, status, failure):
+            return
+        JOBS_TOTAL.inc(status=status, error_class=failure['error_category'] or 'render_error')
+        print(f"❌ Job {job_uuid} {status}: {err_msg}")
+        notify_backend_async(job_uuid, failure, attempt)
 
-def notify_backend_async(job_uuid, result):
-    """Send completion notification to backend"""
+def notify_backend_async(job_uuid, result, attempt=None):
+    """Send completion notification to backend (through the webhook outbox)"""
     try:
-        backend_url = os.getenv('BACKEND_URL', 'http://localhost:5000')
-        webhook_key = os.getenv('WEBHOOK_API_KEY')
-        if not webhook_key:
+        if not webhook_dispatcher.api_key:
             print("⚠️ WEBHOOK_API_KEY not configured")
             return
 
-        payload = {
+        webhook_dispatcher.send({
             'job_uuid': job_uuid,
-            'status': 'completed' if result.get('success') else 'failed',
+            'status': 'completed' if result.get('success') else result.get('status', 'failed'),
             'video_url': result.get('video_path'),
             'file_size': result.get('file_size', 0),
-            'error_message': result.get('error') if not result.get('success') else None
-        }
+            'error_message': result.get('error') if not result.get('success') else None,
+            'error_category': result.get('error_category'),
+            'error_line': result.get('error_line'),
+            'downshift': result.get('downshift'),
+            'profile': result.get('profile'),
+            'attempt': attempt  # the backend's attempt id, echoed so it can drop redelivered events
+        })
 
-        headers = {
-            'Content-Type': 'application/json',
-            'X-Webhook-Key': webhook_key
-        }
+    except Exception as e:
+        print(f"⚠️ Error setting up backend notification: {str(e)}")
+
+def submit_job(data, recovered=False, admit=None):
+    """
+    Persist and queue a job. Identical renders are served from the cache
+    or attach to the one already queued or running (once the manim version
+    is known, see render_cache_key). admit(predicted_seconds)
+    returns (admitted, retry_after) for new submissions.
+
+    Returns (outcome, detail): ('completed', cached_result),
+    ('coalesced', leader_uuid), ('throttled', retry_after) or ('queued', None).
+    """
+    job_uuid = data['job_uuid']
+    cache_key = manim_executor.render_cache_key(data['code'], data.get('config', {}))
+    cached = render_cache.get(cache_key) if cache_key else None
+    if cache_key and not cached and data.get('downshift'):
+        # The render as requested may be cached even though it wouldn't be rendered now
+        cached = render_cache.get(manim_executor.render_cache_key(data['code'], data.get('requested_config', {})))
+        if cached:
+            data.pop('downshift')
+    if cached:
+        print(f"♻️ Cache hit for job: {job_uuid}")
+        finish_job(job_uuid, {**cached, 'downshift': data['downshift']} if data.get('downshift') else cached)
+        return 'completed', cached
+
+    data['cache_key'] = cache_key
+    data.setdefault('enqueued_at', time.time())
+    data['predicted_render_seconds'] = round(render_predictor.predict_job(data), 2)
+    if admit is not None:
+        admitted, retry_after = admit(data['predicted_render_seconds'])
+        if not admitted:
+            return 'throttled', retry_after
+    job_store.enqueue(data, reset_attempts=not recovered)
+
+    leader_uuid = render_cache.attach(cache_key, job_uuid) if cache_key else None
+    if leader_uuid:
+        print(f"🔗 Job {job_uuid} attached to identical job {leader_uuid}")
+        return 'coalesced', leader_uuid
+
+    work_queue.put(data)
+    return 'queued', None
 
-        def send_notification():
-            attempts = 3
-            backoff = 1.0
-            for i in range(attempts):
+def cancel_job(job_uuid, record):
+    """
+    Cancel a queued or rendering job. Returns 'cancelled' when it is done
+    (reported right away) or 'cancelling' when its render is being killed
+    (the worker reports it once the processes are gone).
+    """
+    cancelled = dict(CANCELLED)
+    cache_key = record['payload'].get('cache_key')
+    role, leader_uuid = render_cache.detach(cache_key, job_uuid) if cache_key else (None, None)
+
+    if role in ('follower', 'shared'):
+        # Identical jobs still need the render; only this job is dropped
+        finish_job(job_uuid, cancelled)
+        if role == 'follower' and job_store.get_status(leader_uuid) == 'cancelled' and \
+                render_cache.detach(cache_key, leader_uuid)[0] == 'leader':
+            # This was the last job waiting on a cancelled render
+            work_queue.remove(leader_uuid) or manim_executor.cancel(leader_uuid)
+        return 'cancelled'
+    if work_queue.remove(job_uuid):
+        finish_job(job_uuid, cancelled)
+        return 'cancelled'
+    if manim_executor.cancel(job_uuid):
+        return 'cancelling'
+
+    # Leased on another node, or between stages: workers skip cancelled jobs
+    # and results arriving for them are dropped
+    finish_job(job_uuid, cancelled)
+    return 'cancelled'
+
+def recover_pending_jobs():
+    """Re-enqueue jobs that were queued or running when the process last stopped"""
+    if work_queue.durable:
+        # A shared queue keeps its entries and redelivers expired leases itself
+        return
+
+    pending = job_store.pending_jobs()
+    if pending:
+        print(f"♻️ Recovering {len(pending)} interrupted job(s)")
+
+    for entry in pending:
+        job_data = entry['job_data']
+        job_uuid = job_data.get('job_uuid')
+        if entry['attempts'] >= max_job_attempts:
+            finish_job(job_uuid, {
+                'success': False,
+                'error': f"Job was interrupted {entry['attempts']} times and will not be retried"
+            })
+            continue
+        try:
+            submit_job(job_data, recovered=True)
+        except Exception as e:
+            finish_job(job_uuid, {'success': False, 'error': f"Failed to recover job: {str(e)}"})
+
+def watch_cancellations(interval=None):
+    """Kill renders here whose jobs were cancelled through another process (a front end, another node)"""
+    interval = interval or float(os.getenv('CANCEL_POLL_SECONDS', '1'))
+
+    def watch_loop():
+        while True:
+            time.sleep(interval)
+            for job_uuid, job in list(manim_executor.jobs.items()):
+                if job['status'] != 'running' or job_uuid in manim_executor.cancelled:
+                    continue
                 try:
-                    response = requests.post(
-                        f"{backend_url}/webhooks/job-completion",
-                        json=payload,
-                        headers=headers,
-                        timeout=10
-                    )
-                    if response.status_code == 200:
-                        print(f"✅ Successfully notified backend for job {job_uuid}")
-                        return
-                    else:
-                        print(f"⚠️ Backend notification failed for job {job_uuid}: {response.status_code} - {response.text}")
+                    if job_store.get_status(job_uuid) == 'cancelled':
+                        print(f"🛑 Job {job_uuid} was cancelled elsewhere, stopping its render")
+                        manim_executor.cancel(job_uuid)
                 except Exception as e:
-                    print(f"❌ Notify attempt {i+1} failed for job {job_uuid}: {str(e)}")
-                time.sleep(backoff)
-                backoff *= 2
-            print(f"🚨 Giving up notifying backend for job {job_uuid} after {attempts} attempts")
+                    print(f"⚠️ Could not check job {job_uuid} for cancellation: {str(e)}")
 
-        threading.Thread(target=send_notification, daemon=True).start()
+    threading.Thread(target=watch_loop, daemon=True, name="cancel-watcher").start()
 
-    except Exception as e:
-        print(f"⚠️ Error setting up backend notification: {str(e)}")
+def publish_worker_status():
+    """Write this render process's health to WORKER_STATUS_PATH for the front ends' /health"""
+    def publish_loop():
+        while True:
+            try:
+                report, _ = health_report()
+                partial = worker_status_path.with_suffix('.tmp')
+                partial.parent.mkdir(parents=True, exist_ok=True)
+                partial.write_text(json.dumps({**report, 'updated_at': time.time()}))
+                partial.replace(worker_status_path)
+            except Exception as e:
+                print(f"⚠️ Could not write the worker status: {str(e)}")
+            time.sleep(worker_status_seconds)
+
+    threading.Thread(target=publish_loop, daemon=True, name="worker-status").start()
+
+def read_worker_status():
+    """The render process's last published health, or None"""
+    try:
+        status = json.loads(worker_status_path.read_text())
+    except (OSError, ValueError):
+        return None
+    status['age_seconds'] = round(time.time() - status.pop('updated_at', 0), 1)
+    return status
+
+worker_pool = None
+if renders_here:
+    recover_pending_jobs()
+    job_store.start_pruning()
+    # Jobs that are rendering or uploading keep their files
+    file_manager.start_gc(lambda: set(manim_executor.jobs.copy()))
+    # Start the render worker pool (one warm container per worker)
+    worker_pool = WorkerPool(manim_executor, work_queue, process_queued_job)
+else:
+    # Predictions follow the samples the render process records
+    render_predictor.start_following()
+# Workers of the render process, for queue estimates and admission
+render_workers = worker_pool.size if worker_pool else compute_pool_size()
+admission = AdmissionController(work_queue, lambda: render_workers)
+
+# Gauges read at scrape time
+QUEUE_DEPTH.set_function(work_queue.qsize)
+WEBHOOK_OUTBOX.set_function(webhook_dispatcher.pending)
+PREDICTION_MAE.set_function(lambda: render_predictor.error_stats()['mae_seconds'])
+PREDICTION_MAPE.set_function(lambda: render_predictor.error_stats()['mape'])
+
+def worker_states():
+    states = {}
+    for worker in worker_pool.workers:
+        state = worker.status()['state']
+        states[(state,)] = states.get((state,), 0) + 1
+    return states
+
+if worker_pool:
+    WORKERS.set_function(worker_states)
+    WORKER_UTILIZATION.set_function(
+        lambda: worker_pool.active_count() / len(worker_pool.workers) if worker_pool.workers else 0
+    )
+    # Docker setup (image check, container adoption) runs in the background;
+    # workers start leasing once it is done and /health reports ready
+    manim_executor.start(worker_pool.size)
+    worker_pool.start()
+    if work_queue.durable:
+        watch_cancellations()
+
+    # Register cleanup function (worker containers stay up for adoption with WORKER_ADOPT)
+    atexit.register(worker_pool.stop)
+    atexit.register(webhook_dispatcher.stop)
+
+def health_report():
+    """(report, ready) for /health; a front end is ready once the render process is"""
+    if not renders_here:
+        render = read_worker_status()
+        ready = bool(render and render.get('ready') and render['age_seconds'] <= 5 * worker_status_seconds)
+        return {
+            'status': 'healthy' if ready else 'starting',
+            'ready': ready,
+            'service': 'manim-python-service',
+            'role': service_role,
+            'queue_size': work_queue.qsize(),
+            'work_queue': work_queue.stats(),
+            'render_cache': render_cache.stats(),
+            'admission': admission.stats(),
+            'jobs': job_store.counts(),
+            'render_predictor': render_predictor.stats(),
+            'render': render
+        }, ready
+
+    ready = manim_executor.ready.is_set() and worker_pool.ready_count() > 0
+    return {
+        'status': 'healthy' if ready else 'starting',
+        'ready': ready,
+        'service': 'manim-python-service',
+        'role': service_role,
+        'startup': manim_executor.startup,
+        'queue_size': work_queue.qsize(),
+        'work_queue': work_queue.stats(),
+        'manim_version': manim_executor.get_manim_version(
+            next((w.container for w in worker_pool.workers if w.container), None)
+        ),
+        'container_ready': worker_pool.ready_count() > 0,
+        'active_jobs': ACTIVE_JOBS.get(),
+        'workers': worker_pool.status(),
+        'render_cache': render_cache.stats(),
+        'segment_cache': manim_executor.segment_cache.stats(),
+        'tex_cache': manim_executor.tex_cache.stats(),
+        'render_daemon': manim_executor.render_daemon_stats(),
+        'uploads': upload_stage.stats(),
+        'disk': file_manager.stats(),
+        'admission': admission.stats(),
+        'webhooks': webhook_dispatcher.stats(),
+        'jobs': job_store.counts(),
+        'render_predictor': render_predictor.stats(),
+        'render_profiles': render_profiles.stats(),
+        'progress': {
+            **manim_executor.progress.stats(),
+            'early_abort': manim_executor.early_abort,
+            'aborted_renders': manim_executor.aborted_renders
+        }
+    }, ready
+
+if worker_pool and shared:
+    publish_worker_status()
 
-# Start background worker thread
-worker_thread = threading.Thread(target=background_worker, daemon=True)
-worker_thread.start()
+health_cache = (0, None, 200)  # (built_at, body, status code)
 
 @app.route('/health', methods=['GET'])
 def health_check():
-    """Health check endpoint"""
+    """Health check endpoint (503 until Docker and the workers are ready)"""
+    global health_cache
+    if time.time() - health_cache[0] >= health_cache_seconds:
+        report, ready = health_report()
+        health_cache = (time.time(), json.dumps(report), 200 if ready else 503)
+    return Response(health_cache[1], status=health_cache[2], mimetype='application/json')
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus scrape endpoint"""
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/profiles/slowest', methods=['GET'])
+def slowest_constructs():
+    """Constructs that dominate render time across profiled jobs (config.profile)"""
+    limit = request.args.get('limit', default=20, type=int)
+    sort = request.args.get('sort', default='total')
     return jsonify({
-        'status': 'healthy',
-        'service': 'manim-python-service',
-        'queue_size': job_queue.qsize(),
-        'manim_version': manim_executor.get_manim_version(),
-        'container_ready': manim_executor.container is not None,
-        'active_jobs': len([s for s in job_status.values() if s == 'processing'])
+        'sort': sort,
+        'profiled_jobs': render_profiles.profiles,
+        'constructs': render_profiles.slowest(limit=max(1, min(limit, 200)), sort=sort)
     })
 
 @app.route('/render', methods=['POST'])
@@ -166,19 +529,75 @@ def render_animation():
         job_uuid = data.get('job_uuid')
         code = data.get('code')
         config = data.get('config', {})
-        print(code)
-        
+
         if not job_uuid or not code:
             return jsonify({
                 'error': 'Missing required fields',
                 'required': ['job_uuid', 'code']
             }), 400
         
-        job_queue.put(data)
-        job_status[job_uuid] = 'queued'
+        try:
+            manim_executor.encoding_for(config)
+        except ValueError as e:
+            return jsonify({'error': str(e), 'available': sorted(manim_executor.encoding_profiles)}), 400
+
+        if preflight_enabled:
+            preflight_started = time.time()
+            report = manim_executor.preflight(code, config)
+            STAGE_SECONDS.observe(time.time() - preflight_started, stage='preflight')
+            if not report['ok']:
+                JOBS_TOTAL.inc(status='rejected', error_class=report['errors'][0]['type'])
+                error_message = format_errors(report['errors'])
+                job_store.finish(job_uuid, 'failed', {
+                    'success': False, 'video_path': None, 'file_size': 0, 'error': error_message,
+                    'error_category': report['errors'][0]['type'], 'error_line': report['errors'][0]['line']
+                })
+                print(f"🛑 Rejected job {job_uuid} in preflight: {error_message}")
+                return jsonify({
+                    'status': 'rejected',
+                    'job_uuid': job_uuid,
+                    'error_message': error_message,
+                    'error_category': report['errors'][0]['type'],
+                    'error_line': report['errors'][0]['line'],
+                    'errors': report['errors'],
+                    'warnings': report['warnings'],
+                    'message': 'Code failed preflight validation'
+                }), 422
+            data['preflight'] = report['hints']
+
+        planned_config, downshift = admission.plan_downshift(config)
+        if downshift:
+            data['requested_config'] = config
+            data['config'] = planned_config
+            data['downshift'] = downshift
+            print(f"⏬ Job {job_uuid} downshifted under load: {downshift['requested']} -> {downshift['applied']}")
+
+        outcome, detail = submit_job(data, admit=admission.admit)
+        if outcome == 'throttled':
+            print(f"🚦 Throttled job {job_uuid}: backlog too long, retry after {detail}s")
+            response = jsonify({
+                'status': 'throttled',
+                'job_uuid': job_uuid,
+                'retry_after_seconds': detail,
+                'error_message': f'The render queue is full, retry in {detail} seconds',
+                'message': 'Render backlog exceeds the admission limit'
+            })
+            response.headers['Retry-After'] = str(detail)
+            return response, 429
+        if outcome == 'completed':
+            return jsonify({
+                'status': 'completed',
+                'job_uuid': job_uuid,
+                'cached': True,
+                'video_url': detail.get('video_path'),
+                'downshift': data.get('downshift'),
+                'message': 'Identical render found in cache'
+            })
+        leader_uuid = detail if outcome == 'coalesced' else None
         
-        queue_position = job_queue.qsize()
-        estimated_wait = queue_position * 30  # Rough estimate: 30 seconds per job
+        queue_position, estimated_wait = work_queue.estimate(
+            leader_uuid or job_uuid, render_workers, data['predicted_render_seconds']
+        )
 
         print(f"📋 Queued job: {job_uuid} (Position: {queue_position})")
 
@@ -187,6 +606,9 @@ def render_animation():
             'job_uuid': job_uuid,
             'queue_position': queue_position,
             'estimated_wait_seconds': estimated_wait,
+            'coalesced_with': leader_uuid,
+            'preflight': data.get('preflight'),
+            'downshift': data.get('downshift'),
             'message': 'Job queued for processing'
         })
         
@@ -198,6 +620,88 @@ def render_animation():
             'message': 'Unexpected error during queuing'
         }), 500
 
+@app.route('/render/<job_uuid>/events', methods=['GET'])
+def render_events(job_uuid):
+    """
+    Server-sent events for one job: a 'progress' event whenever its status
+    or render progress changes, then one final event named after its end
+    state (completed, failed, cancelled, timed_out) with the result.
+    """
+    if not job_store.get(job_uuid):
+        return jsonify({'error': 'Job not found', 'job_uuid': job_uuid}), 404
+
+    def event(name, data):
+        return f"event: {name}\ndata: {json.dumps(data)}\n\n"
+
+    def stream():
+        last = None
+        last_sent = time.time()
+        while True:
+            record = job_store.get(job_uuid)
+            if record is None:
+                yield event('error', {'job_uuid': job_uuid, 'error': 'Job expired'})
+                return
+            if record['status'] not in PENDING_STATES:
+                result = record['result'] or {}
+                yield event(record['status'], {
+                    'job_uuid': job_uuid,
+                    'status': record['status'],
+                    'video_url': result.get('video_path'),
+                    'error_message': result.get('error'),
+                    'error_category': result.get('error_category'),
+                    'error_line': result.get('error_line')
+                })
+                return
+            current = {'job_uuid': job_uuid, 'status': record['status'], 'progress': record.get('progress')}
+            if current != last:
+                yield event('progress', current)
+                last, last_sent = current, time.time()
+            elif time.time() - last_sent >= events_keepalive_seconds:
+                yield ': keepalive\n\n'
+                last_sent = time.time()
+            time.sleep(events_poll_seconds)
+
+    return Response(stream(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # don't let a proxy buffer the stream
+    })
+
+@app.route('/render/<job_uuid>', methods=['DELETE'])
+def cancel_render(job_uuid):
+    """Remove a job from the queue, or kill its render and free the worker"""
+    try:
+        record = job_store.get(job_uuid)
+        if not record:
+            return jsonify({'error': 'Job not found', 'job_uuid': job_uuid}), 404
+
+        if record['status'] not in PENDING_STATES:
+            return jsonify({
+                'error': 'Job already finished',
+                'job_uuid': job_uuid,
+                'status': record['status']
+            }), 409
+        if record['status'] == 'uploading':
+            return jsonify({
+                'error': 'Job has finished rendering and is being uploaded',
+                'job_uuid': job_uuid,
+                'status': record['status']
+            }), 409
+
+        outcome = cancel_job(job_uuid, record)
+        print(f"🛑 Cancel requested for job {job_uuid}: {outcome}")
+        return jsonify({
+            'status': outcome,
+            'job_uuid': job_uuid,
+            'message': 'Job cancelled' if outcome == 'cancelled' else 'Render is being stopped'
+        }), 200 if outcome == 'cancelled' else 202
+
+    except Exception as e:
+        print(f"Error cancelling job {job_uuid}: {str(e)}")
+        return jsonify({
+            'status': 'failed',
+            'error_message': f'Internal server error: {str(e)}'
+        }), 500
+
 if __name__ == '__main__':
     os.makedirs('output', exist_ok=True)
     os.makedirs('temp', exist_ok=True)
@@ -218,6 +722,7 @@ if __name__ == '__main__':
             exclude_patterns=['*/temp/*', '*/output/*'] 
         )
     else:
-        # Production mode
+        # Production mode; for many concurrent requests run the front end under gunicorn
+        # (gunicorn -c gunicorn.conf.py app:app) next to `python worker.py` instead
         print("Running in production mode")
-        app.run(host='0.0.0.0', port=port, debug=False)
\ No newline at end of file
+        app.run(host='0.0.0.0', port=port, debug=False, threaded=True)
\ No newline at end of file
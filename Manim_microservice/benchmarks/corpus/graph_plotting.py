@@ -0,0 +1,34 @@
+from manim import *
+
+
+class DerivativeAsTangent(Scene):
+    def construct(self):
+        axes = Axes(
+            x_range=[-3, 3, 1], y_range=[-2, 8, 2], x_length=9, y_length=6,
+            axis_config={"include_numbers": True}
+        )
+        labels = axes.get_axis_labels(x_label="x", y_label="f(x)")
+        curve = axes.plot(lambda x: x ** 2, color=BLUE)
+        curve_label = axes.get_graph_label(curve, label="x^2")
+
+        self.play(Create(axes), Write(labels))
+        self.play(Create(curve), Write(curve_label))
+
+        t = ValueTracker(-2)
+        dot = always_redraw(lambda: Dot(axes.c2p(t.get_value(), t.get_value() ** 2), color=YELLOW))
+        tangent = always_redraw(
+            lambda: axes.plot(
+                lambda x: 2 * t.get_value() * (x - t.get_value()) + t.get_value() ** 2,
+                x_range=[t.get_value() - 1, t.get_value() + 1], color=RED
+            )
+        )
+        slope = always_redraw(
+            lambda: DecimalNumber(2 * t.get_value(), num_decimal_places=2).to_corner(UR)
+        )
+        self.play(FadeIn(dot), Create(tangent), FadeIn(slope))
+        self.play(t.animate.set_value(2), run_time=4, rate_func=linear)
+        self.play(t.animate.set_value(0), run_time=2)
+
+        area = axes.get_area(curve, x_range=[0, 2], color=GREEN, opacity=0.4)
+        self.play(FadeIn(area))
+        self.wait(2)
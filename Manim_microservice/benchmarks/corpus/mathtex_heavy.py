@@ -0,0 +1,34 @@
+from manim import *
+
+
+class QuadraticFormula(Scene):
+    def construct(self):
+        steps = [
+            r"ax^2 + bx + c = 0",
+            r"x^2 + \frac{b}{a}x + \frac{c}{a} = 0",
+            r"x^2 + \frac{b}{a}x = -\frac{c}{a}",
+            r"\left(x + \frac{b}{2a}\right)^2 = \frac{b^2 - 4ac}{4a^2}",
+            r"x + \frac{b}{2a} = \pm\frac{\sqrt{b^2 - 4ac}}{2a}",
+            r"x = \frac{-b \pm \sqrt{b^2 - 4ac}}{2a}",
+        ]
+        current = MathTex(steps[0], font_size=52)
+        self.play(Write(current))
+        self.wait(0.5)
+        for step in steps[1:]:
+            following = MathTex(step, font_size=52)
+            self.play(TransformMatchingTex(current, following))
+            self.wait(0.5)
+            current = following
+
+        box = SurroundingRectangle(current, color=YELLOW, buff=0.2)
+        discriminant = MathTex(r"\Delta = b^2 - 4ac", font_size=40).next_to(box, DOWN, buff=0.6)
+        cases = MathTex(
+            r"\Delta > 0 &\Rightarrow \text{two real roots}\\",
+            r"\Delta = 0 &\Rightarrow \text{one real root}\\",
+            r"\Delta < 0 &\Rightarrow \text{two complex roots}",
+            font_size=34
+        ).next_to(discriminant, DOWN)
+        self.play(Create(box))
+        self.play(Write(discriminant))
+        self.play(Write(cases))
+        self.wait(2)
@@ -0,0 +1,33 @@
+from manim import *
+
+
+class Introduction(Scene):
+    def construct(self):
+        title = Text("Sorting in three steps", font_size=44)
+        self.play(Write(title))
+        self.wait(1)
+        self.play(FadeOut(title))
+
+
+class Unsorted(Scene):
+    def construct(self):
+        values = [5, 2, 8, 1, 9, 3]
+        bars = VGroup(*[
+            Rectangle(width=0.6, height=v * 0.4, fill_opacity=0.8, color=BLUE) for v in values
+        ]).arrange(RIGHT, aligned_edge=DOWN)
+        self.play(LaggedStart(*[GrowFromEdge(bar, DOWN) for bar in bars], lag_ratio=0.2))
+        self.wait(1)
+        self.play(bars[1].animate.set_color(RED), bars[3].animate.set_color(RED))
+        self.wait(1)
+
+
+class Sorted(Scene):
+    def construct(self):
+        values = [1, 2, 3, 5, 8, 9]
+        bars = VGroup(*[
+            Rectangle(width=0.6, height=v * 0.4, fill_opacity=0.8, color=GREEN) for v in values
+        ]).arrange(RIGHT, aligned_edge=DOWN)
+        caption = MathTex(r"O(n \log n)").to_edge(UP)
+        self.play(FadeIn(bars, shift=UP))
+        self.play(Write(caption))
+        self.wait(2)
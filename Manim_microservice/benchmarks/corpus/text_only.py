@@ -0,0 +1,21 @@
+from manim import *
+
+
+class TitleCard(Scene):
+    def construct(self):
+        title = Text("The Pythagorean Theorem", font_size=48)
+        subtitle = Text("a classic result about right triangles", font_size=28).next_to(title, DOWN)
+        self.play(Write(title))
+        self.play(FadeIn(subtitle, shift=UP))
+        self.wait(1)
+
+        bullets = VGroup(
+            Text("1. Draw a right triangle", font_size=30),
+            Text("2. Build a square on every side", font_size=30),
+            Text("3. Compare the areas", font_size=30),
+        ).arrange(DOWN, aligned_edge=LEFT).shift(DOWN * 0.5)
+        self.play(title.animate.to_edge(UP), FadeOut(subtitle))
+        for bullet in bullets:
+            self.play(FadeIn(bullet, shift=RIGHT))
+        self.wait(2)
+        self.play(FadeOut(bullets), FadeOut(title))
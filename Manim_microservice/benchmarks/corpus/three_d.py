@@ -0,0 +1,24 @@
+from manim import *
+
+
+class SaddleSurface(ThreeDScene):
+    def construct(self):
+        axes = ThreeDAxes(x_range=[-3, 3], y_range=[-3, 3], z_range=[-3, 3])
+        surface = Surface(
+            lambda u, v: axes.c2p(u, v, 0.3 * (u ** 2 - v ** 2)),
+            u_range=[-2.5, 2.5], v_range=[-2.5, 2.5], resolution=(24, 24),
+            fill_opacity=0.8
+        )
+        surface.set_fill_by_checkerboard(BLUE_D, BLUE_E)
+
+        self.set_camera_orientation(phi=70 * DEGREES, theta=-45 * DEGREES)
+        self.play(Create(axes))
+        self.play(Create(surface), run_time=2)
+        self.begin_ambient_camera_rotation(rate=0.4)
+        self.wait(4)
+        self.stop_ambient_camera_rotation()
+
+        point = Dot3D(axes.c2p(0, 0, 0), color=YELLOW, radius=0.12)
+        self.play(FadeIn(point))
+        self.move_camera(phi=45 * DEGREES, theta=30 * DEGREES, run_time=2)
+        self.wait(1)
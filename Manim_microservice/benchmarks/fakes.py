@@ -0,0 +1,444 @@
+"""
+Stand-ins for the Docker daemon, S3 and the backend's completion webhook.
+
+The fake Docker client hands out containers whose exec_run understands the
+commands ManimExecutor sends (manim through the render daemon or a plain
+exec, the dry run, ffmpeg concat / encode passes, cleanup). Instead of
+rendering, a fake manim sleeps for a time derived from the scene (number of
+animations, TeX expressions, 3D, quality, frame rate, resolution) and writes
+an output file of a plausible size, so the rest of the pipeline - queueing,
+parts, uploads, webhooks - does its real work.
+"""
+import os
+import re
+import json
+import time
+import shlex
+import shutil
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+QUALITY_FPS = {'-ql': 15, '-qm': 30, '-qh': 60}
+QUALITY_RESOLUTION = {'-ql': (854, 480), '-qm': (1280, 720), '-qh': (1920, 1080)}
+ANIMATION_CALL = re.compile(r'self\.(play|wait|move_camera)\(')
+RUN_TIME = re.compile(r'run_time\s*=\s*([0-9.]+)')
+TEX_CALL = re.compile(r'\b(MathTex|Tex|get_graph_label|include_numbers)\b')
+SCENE_CLASS = re.compile(r'^class\s+(\w+)\s*\(', re.MULTILINE)
+
+
+class CostModel:
+    """
+    Seconds a fake render takes. The defaults are rough proportions of a
+    real 1-CPU worker container scaled down by time_scale so a benchmark
+    finishes in minutes; what matters is how the pipeline around the render
+    behaves, not the absolute numbers.
+    """
+
+    def __init__(self, time_scale=0.05, startup=0.4, per_megapixel_frame=0.02,
+                 per_tex=0.35, three_d_factor=3.0, encode_per_megapixel_frame=0.004,
+                 bytes_per_pixel_frame=0.015):
+        self.time_scale = time_scale
+        self.startup = startup
+        self.per_megapixel_frame = per_megapixel_frame
+        self.per_tex = per_tex
+        self.three_d_factor = three_d_factor
+        self.encode_per_megapixel_frame = encode_per_megapixel_frame
+        self.bytes_per_pixel_frame = bytes_per_pixel_frame
+
+    @staticmethod
+    def scene_source(code, scene):
+        """The body of one scene class (all of the code if it can't be found)"""
+        starts = [(m.start(), m.group(1)) for m in SCENE_CLASS.finditer(code)]
+        for index, (start, name) in enumerate(starts):
+            if name == scene:
+                end = starts[index + 1][0] if index + 1 < len(starts) else len(code)
+                return code[start:end]
+        return code
+
+    def animations(self, source):
+        """Duration in seconds of every play()/wait() call"""
+        durations = []
+        for line in source.splitlines():
+            for _ in ANIMATION_CALL.finditer(line):
+                match = RUN_TIME.search(line)
+                durations.append(float(match.group(1)) if match else 1.0)
+        return durations
+
+    def render(self, source, fps, resolution, animation_range=None):
+        """(seconds, output bytes) of rendering a scene"""
+        durations = self.animations(source) or [1.0]
+        if animation_range:
+            start, end = animation_range
+            durations = durations[start:end + 1] or [1.0]
+            tex = 0  # compiled while constructing, before the first animation of the range
+        else:
+            tex = len(TEX_CALL.findall(source))
+        megapixels = resolution[0] * resolution[1] / 1e6
+        frames = sum(durations) * fps
+        per_frame = self.per_megapixel_frame * megapixels
+        if 'ThreeDScene' in source:
+            per_frame *= self.three_d_factor
+        seconds = self.startup + frames * per_frame + tex * self.per_tex
+        size = int(frames * resolution[0] * resolution[1] * self.bytes_per_pixel_frame)
+        return seconds * self.time_scale, max(size, 1024)
+
+    def profile(self, source, seconds, fps):
+        """A runtime/render_profile.py report spreading a fake render's time over its animations"""
+        durations = self.animations(source) or [1.0]
+        share = seconds / sum(durations)
+        animations = [
+            {
+                'index': index, 'scene': None, 'line': None, 'animations': ['Animation'], 'updaters': {},
+                'constructs': ['Animation'], 'run_time': duration, 'frames': int(duration * fps),
+                'seconds': round(duration * share, 4), 'update_seconds': round(duration * share * 0.3, 4),
+                'frame_seconds': round(duration * share * 0.5, 4), 'encode_seconds': round(duration * share * 0.2, 4),
+                'tex_seconds': 0.0
+            }
+            for index, duration in enumerate(durations)
+        ]
+        return {
+            'totals': {
+                'seconds': round(seconds, 3), 'plays': len(animations), 'frames': sum(a['frames'] for a in animations),
+                'update_seconds': round(seconds * 0.3, 3), 'frame_seconds': round(seconds * 0.5, 3),
+                'encode_seconds': round(seconds * 0.2, 3), 'tex_seconds': 0.0, 'other_seconds': 0.0
+            },
+            'tex': {'expressions': 0, 'compiled': 0, 'cached': 0, 'seconds': 0.0},
+            'animations': animations,
+            'animations_truncated': False
+        }
+
+    def dry_run(self, source):
+        return (0.1 + 0.05 * len(self.animations(source))) * self.time_scale
+
+    def encode(self, size):
+        # Encoding time grows with the amount of video, which the input size tracks
+        frames_megapixels = size / self.bytes_per_pixel_frame / 1e6
+        return frames_megapixels * self.encode_per_megapixel_frame * self.time_scale
+
+
+class _ExecResult:
+    def __init__(self, exit_code, output=b''):
+        self.exit_code = exit_code
+        self.output = output
+
+
+class FakeContainer:
+    def __init__(self, client, name, volumes, labels=None):
+        self.client = client
+        self.labels = dict(labels or {})
+        self.id = uuid.uuid4().hex + uuid.uuid4().hex[:32]
+        self.name = name
+        self.status = 'running'
+        # Container path prefix -> host directory
+        self.mounts = sorted(
+            ((spec['bind'], Path(host)) for host, spec in (volumes or {}).items()),
+            key=lambda mount: -len(mount[0])
+        )
+        self.execs = 0
+
+    def reload(self):
+        pass
+
+    def stop(self):
+        self.status = 'exited'
+
+    def host_path(self, container_path):
+        for bind, host in self.mounts:
+            if container_path == bind or container_path.startswith(bind + '/'):
+                return host / container_path[len(bind):].lstrip('/')
+        return None
+
+    def exec_run(self, cmd, stdout=True, stderr=True, detach=False, **kwargs):
+        self.execs += 1
+        argv = list(cmd) if isinstance(cmd, (list, tuple)) else shlex.split(cmd)
+        if detach:
+            return _ExecResult(0)
+
+        timeout = None
+        if argv[:1] == ['timeout']:
+            timeout, argv = float(argv[3]), argv[4:]
+
+        if argv[:2] == ['python', '/manim/runtime/render_client.py']:
+            argv = argv[2:]
+            if argv[:1] == ['--timeout']:
+                timeout, argv = float(argv[1]), argv[2:]
+            if argv[:1] == ['--script']:
+                return self._script(argv[1], argv[2:])
+            return self._manim(argv, timeout)
+        if argv[:1] == ['manim']:
+            if argv[1:] == ['--version']:
+                return _ExecResult(0, b'Manim Community v0.18.1\n')
+            return self._manim(argv[1:], timeout)
+        if argv[:1] == ['python'] and len(argv) > 1 and argv[1].startswith('/manim/runtime/'):
+            return self._script(argv[1], argv[2:])
+        if argv[:1] == ['ffmpeg']:
+            return self._ffmpeg(argv[1:], timeout)
+        if argv[:2] == ['rm', '-rf']:
+            for path in argv[2:]:
+                host = self.host_path(path)
+                if host is not None:
+                    shutil.rmtree(host, ignore_errors=True)
+            return _ExecResult(0)
+        return _ExecResult(1, f"fake container: unsupported command {' '.join(argv[:3])}".encode())
+
+    def _timed(self, seconds, timeout):
+        if timeout and seconds > timeout:
+            time.sleep(timeout)
+            return False
+        time.sleep(seconds)
+        return True
+
+    def _script(self, script, args):
+        name = os.path.basename(script)
+        if name == 'kill_job.py':
+            return _ExecResult(0, b'KILLED 0\n')
+        if name == 'dry_run.py':
+            options = {}
+            while args[:1] and args[0].startswith('--'):
+                options[args[0]], args = args[1], args[2:]
+            code = self.host_path(args[0]).read_text()
+            animations = {}
+            seconds = 0.0
+            for scene in args[1:]:
+                source = CostModel.scene_source(code, scene)
+                animations[scene] = len(self.client.cost.animations(source))
+                seconds += self.client.cost.dry_run(source)
+            time.sleep(seconds)
+            report = {'ok': True, 'animations': animations, 'seconds': round(seconds, 3)}
+            return _ExecResult(0, f"DRYRUN {json.dumps(report)}\n".encode())
+        if name == 'render_profile.py':
+            return self._manim([arg for arg in args if arg != '--cprofile'], None, profile=True)
+        if name == 'tex_prewarm.py':
+            report = {'compiled': 0, 'failed': [], 'seconds': 0.0}
+            return _ExecResult(0, f"PREWARM {json.dumps(report)}\n".encode())
+        return _ExecResult(1, f"fake container: unsupported script {name}".encode())
+
+    def _manim(self, args, timeout, profile=False):
+        positional = []
+        options = {}
+        flags = set()
+        index = 0
+        while index < len(args):
+            arg = args[index]
+            if arg in ('-ql', '-qm', '-qh', '--disable_caching'):
+                flags.add(arg)
+            elif arg.startswith('-'):
+                options[arg] = args[index + 1]
+                index += 1
+            else:
+                positional.append(arg)
+            index += 1
+
+        quality = next((flag for flag in ('-ql', '-qm', '-qh') if flag in flags), '-qm')
+        fps = float(options.get('--frame_rate') or QUALITY_FPS[quality])
+        resolution = QUALITY_RESOLUTION[quality]
+        if options.get('-r'):
+            resolution = tuple(int(v) for v in options['-r'].split(','))
+        animation_range = None
+        if options.get('-n'):
+            animation_range = tuple(int(v) for v in options['-n'].split(','))
+
+        code = self.host_path(positional[0]).read_text()
+        source = CostModel.scene_source(code, positional[1] if len(positional) > 1 else None)
+        seconds, size = self.client.cost.render(source, fps, resolution, animation_range)
+        if not self._timed(seconds, timeout):
+            return _ExecResult(124, b'render timed out\n')
+
+        output = self.host_path(options['--output_file'])
+        output.parent.mkdir(parents=True, exist_ok=True)
+        with open(output, 'wb') as f:
+            f.write(os.urandom(min(size, 64 * 1024)))
+            f.truncate(size)
+        self.client.renders += 1
+        animations = len(self.client.cost.animations(source)) or 1
+        first = animation_range[0] if animation_range else 0
+        last = animation_range[1] if animation_range else animations - 1
+        output = ''.join(
+            f"\rAnimation {index}: Play(Mobject): 100%|##########| 10/10 [00:00<00:00, 99.0it/s]"
+            for index in range(first, last + 1)
+        ) + '\n'
+        output += f"File ready at {options['--output_file']}\n"
+        if profile:
+            output += f"PROFILE {json.dumps(self.client.cost.profile(source, seconds, fps))}\n"
+        return _ExecResult(0, output.encode())
+
+    def _ffmpeg(self, args, timeout):
+        inputs = [args[i + 1] for i, arg in enumerate(args) if arg == '-i']
+        output = self.host_path(args[-1])
+        source = self.host_path(inputs[0])
+        if '-f' in args and args[args.index('-f') + 1] == 'concat':
+            # Stream copy of the listed parts
+            with open(output, 'wb') as out:
+                for line in source.read_text().splitlines():
+                    part = self.host_path(line.strip()[len('file '):].strip("'"))
+                    with open(part, 'rb') as f:
+                        shutil.copyfileobj(f, out)
+            return _ExecResult(0)
+
+        size = source.stat().st_size
+        if not self._timed(self.client.cost.encode(size), timeout):
+            return _ExecResult(124, b'encode timed out\n')
+        ratio = 0.25 if 'gif' in output.suffix else 0.7
+        with open(output, 'wb') as f:
+            f.truncate(max(1024, int(size * ratio)))
+        return _ExecResult(0)
+
+
+class _Containers:
+    def __init__(self, client):
+        self.client = client
+
+    def run(self, image=None, command=None, volumes=None, name=None, labels=None, **kwargs):
+        container = FakeContainer(self.client, name, volumes, labels)
+        with self.client.lock:
+            self.client.started.append(container)
+        return container
+
+    def list(self, filters=None, **kwargs):
+        """Running containers carrying every label=value of filters['label']"""
+        wanted = dict(item.split('=', 1) for item in (filters or {}).get('label', []))
+        with self.client.lock:
+            return [
+                container for container in self.client.started
+                if container.status == 'running' and all(container.labels.get(k) == v for k, v in wanted.items())
+            ]
+
+
+class _ExecAPI:
+    """The low-level exec calls of docker.APIClient used for streamed execs"""
+
+    def __init__(self, client):
+        self.client = client
+        self.execs = {}
+
+    def exec_create(self, container_id, cmd, **kwargs):
+        exec_id = uuid.uuid4().hex
+        self.execs[exec_id] = {'container': container_id, 'cmd': cmd, 'exit_code': None}
+        return {'Id': exec_id}
+
+    def exec_start(self, exec_id, stream=False, **kwargs):
+        entry = self.execs[exec_id]
+        with self.client.lock:
+            container = next(c for c in self.client.started if c.id == entry['container'])
+        result = container.exec_run(entry['cmd'])
+        entry['exit_code'] = result.exit_code
+        if not stream:
+            return result.output
+        return iter(result.output.splitlines(keepends=True))
+
+    def exec_inspect(self, exec_id):
+        return {'Running': False, 'ExitCode': self.execs.pop(exec_id)['exit_code']}
+
+
+class _Images:
+    def pull(self, image, **kwargs):
+        return None
+
+    def get(self, image):
+        return None
+
+
+class FakeDockerClient:
+    """Drop-in for docker.from_env() (see run.py)"""
+
+    def __init__(self, cost=None):
+        self.cost = cost or CostModel()
+        self.containers = _Containers(self)
+        self.images = _Images()
+        self.api = _ExecAPI(self)
+        self.lock = threading.Lock()
+        self.started = []
+        self.renders = 0
+
+
+class FakeS3Client:
+    """
+    The parts of a boto3 S3 client the uploader uses. Transfers take
+    latency plus size / bandwidth and nothing is stored.
+    """
+
+    def __init__(self, mbps=50.0, latency=0.02):
+        self.mbps = mbps
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.objects = {}
+        self._uploads = {}
+
+    def _transfer(self, size):
+        time.sleep(self.latency + size / (self.mbps * 1024 * 1024))
+
+    def upload_file(self, file_path, bucket, key, ExtraArgs=None, Config=None):
+        size = os.path.getsize(file_path)
+        self._transfer(size)
+        with self.lock:
+            self.objects[key] = size
+
+    def create_multipart_upload(self, Bucket, Key, **kwargs):
+        upload_id = uuid.uuid4().hex
+        with self.lock:
+            self._uploads[upload_id] = 0
+        return {'UploadId': upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        self._transfer(len(Body))
+        with self.lock:
+            self._uploads[UploadId] += len(Body)
+        return {'ETag': f'"{uuid.uuid4().hex}"'}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        time.sleep(self.latency)
+        with self.lock:
+            self.objects[Key] = self._uploads.pop(UploadId, 0)
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        with self.lock:
+            self._uploads.pop(UploadId, None)
+
+
+class FakeBackend:
+    """
+    HTTP server standing in for the backend's completion webhooks (single
+    and batch routes). Records when each job's completion arrived.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0):
+        backend = self
+        self.lock = threading.Lock()
+        self.completions = {}  # job_uuid -> (arrival time, event)
+        self.requests = 0
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                try:
+                    payload = json.loads(body or b'{}')
+                except ValueError:
+                    payload = {}
+                events = payload.get('events', []) if self.path.endswith('/batch') else [payload]
+                now = time.time()
+                with backend.lock:
+                    backend.requests += 1
+                    for event in events:
+                        backend.completions.setdefault(event.get('job_uuid'), (now, event))
+                response = json.dumps({'results': [{'job_uuid': e.get('job_uuid'), 'status': 200} for e in events]})
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(response)))
+                self.end_headers()
+                self.wfile.write(response.encode())
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.url = f"http://{host}:{self.server.server_address[1]}"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True, name='fake-backend')
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
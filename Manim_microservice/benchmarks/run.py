@@ -0,0 +1,425 @@
+"""
+End-to-end throughput benchmark for the render service.
+
+Starts the service in-process in a scratch directory, drives /render with
+scenes from benchmarks/corpus at a fixed or Poisson arrival rate and waits
+for every job to finish. Docker, S3 and the backend webhook can each be a
+fake (benchmarks/fakes.py) or the real thing. Reports jobs/min, p50/p95/p99
+of every pipeline stage plus end to end, output bytes per encoding profile
+and peak RSS, and compares them with a stored baseline.
+
+Usage (from Manim_microservice/):
+  python -m benchmarks.run --jobs 60 --rate 30
+  python -m benchmarks.run --mix mathtex_heavy=3,text_only=1 --encoding-profile balanced
+  python -m benchmarks.run --docker real --jobs 10 --rate 2        # local manim container
+  python -m benchmarks.run --save-baseline                         # record the current numbers
+Any service setting can be passed with --env KEY=VALUE (e.g. --env RENDER_SHARDING=true).
+"""
+import os
+import sys
+import json
+import math
+import time
+import random
+import shutil
+import argparse
+import resource
+import tempfile
+import threading
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+SERVICE_DIR = BENCH_DIR.parent
+CORPUS_DIR = BENCH_DIR / 'corpus'
+DEFAULT_BASELINE = BENCH_DIR / 'baseline.json'
+# Metric -> True when higher is better
+COMPARED = {'jobs_per_min': True, 'peak_rss_mb': False}
+
+
+def load_corpus():
+    return {path.stem: path.read_text() for path in sorted(CORPUS_DIR.glob('*.py'))}
+
+
+def parse_mix(value, corpus):
+    """'name=weight,...' -> {name: weight}; every scene once when empty"""
+    if not value:
+        return {name: 1.0 for name in corpus}
+    mix = {}
+    for item in value.split(','):
+        name, _, weight = item.partition('=')
+        if name not in corpus:
+            raise SystemExit(f"Unknown scene {name!r}, the corpus has: {', '.join(corpus)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def percentiles(samples):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+
+    def rank(p):
+        # Nearest-rank percentile
+        return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+    return {
+        'count': len(ordered),
+        'p50': round(rank(50), 3),
+        'p95': round(rank(95), 3),
+        'p99': round(rank(99), 3),
+        'max': round(ordered[-1], 3)
+    }
+
+
+def output_sizes(results):
+    """
+    Output bytes of completed jobs per encoding profile ('default' without
+    one): percentiles, total, and total against what manim rendered before
+    encoding (ratio below 1 when the profile shrinks the video).
+    """
+    sizes = {}
+    for result in results:
+        encoding = result.get('encoding') or {}
+        output = encoding.get('bytes', result.get('file_size', 0))
+        entry = sizes.setdefault(encoding.get('profile') or 'default', ([], []))
+        entry[0].append(output)
+        entry[1].append(encoding.get('rendered_bytes', output))
+
+    report = {}
+    for profile, (output, rendered) in sorted(sizes.items()):
+        report[profile] = {
+            **percentiles(output),
+            'total': sum(output),
+            'rendered_total': sum(rendered),
+            'ratio': round(sum(output) / sum(rendered), 3) if sum(rendered) else None
+        }
+    return report
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+class StageRecorder:
+    """Keeps every STAGE_SECONDS observation so exact percentiles can be computed"""
+
+    def __init__(self, histogram):
+        self.samples = {}
+        self._lock = threading.Lock()
+        observe = histogram.observe
+
+        def recording_observe(value, **labels):
+            with self._lock:
+                self.samples.setdefault(labels.get('stage'), []).append(value)
+            observe(value, **labels)
+
+        histogram.observe = recording_observe
+
+
+def configure(args, workdir):
+    """Environment and fakes; must run before the service is imported"""
+    os.environ.update({
+        'RENDER_WORKERS': str(args.workers),
+        # Its own container pool: never adopts (or leaves behind) worker containers
+        'NODE_ID': f"benchmark-{os.getpid()}",
+        'WORKER_ADOPT': 'false',
+        'WEBHOOK_API_KEY': os.getenv('WEBHOOK_API_KEY', 'benchmark'),
+        'JOB_STORE_URL': f"sqlite:///{workdir}/data/jobs.db",
+        'WEBHOOK_OUTBOX_PATH': f"{workdir}/data/webhook_outbox.db",
+    })
+    for item in args.env:
+        key, _, value = item.partition('=')
+        os.environ[key] = value
+
+    fakes = {}
+    from benchmarks import fakes as fake_services
+    if args.docker == 'fake':
+        import docker
+        cost = fake_services.CostModel(time_scale=args.time_scale)
+        fakes['docker'] = fake_services.FakeDockerClient(cost)
+        docker.from_env = lambda **kwargs: fakes['docker']
+    if args.s3 == 'fake':
+        from services import s3_manager
+        fakes['s3'] = fake_services.FakeS3Client(mbps=args.s3_mbps)
+        s3_manager._default_uploader = s3_manager.S3Uploader(client=fakes['s3'], bucket_name='benchmark')
+    if args.backend == 'fake':
+        fakes['backend'] = fake_services.FakeBackend().start()
+        os.environ['BACKEND_URL'] = fakes['backend'].url
+    else:
+        os.environ['BACKEND_URL'] = args.backend
+    return fakes
+
+
+def make_schedule(args, corpus, mix, rng):
+    """[(offset seconds, scene name, job payload)] in arrival order"""
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    config = {'quality': args.quality}
+    if args.encoding_profile:
+        config['encoding_profile'] = args.encoding_profile
+    if args.profile:
+        config['profile'] = True
+
+    schedule = []
+    offset = 0.0
+    interval = 60.0 / args.rate
+    for index in range(args.jobs):
+        name = rng.choices(names, weights)[0] if len(names) > 1 else names[0]
+        code = corpus[name]
+        if not args.repeat_code:
+            # Unique code keeps the result cache from serving the job
+            code = f"# benchmark job {index}\n{code}"
+        payload = {'job_uuid': f"bench-{index:05d}-{name}", 'code': code, 'config': dict(config)}
+        schedule.append((offset, name, payload))
+        offset += rng.expovariate(1 / interval) if args.arrival == 'poisson' else interval
+    return schedule
+
+
+def run(args):
+    corpus = load_corpus()
+    mix = parse_mix(args.mix, corpus)
+    rng = random.Random(args.seed)
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix='manim-bench-')).resolve()
+    workdir.mkdir(parents=True, exist_ok=True)
+
+    real_stdout = sys.stdout
+    log = open(workdir / 'service.log', 'w', buffering=1)
+    sys.path.insert(0, str(SERVICE_DIR))
+    os.chdir(workdir)
+    fakes = configure(args, workdir)
+
+    from services.metrics import STAGE_SECONDS
+    recorder = StageRecorder(STAGE_SECONDS)
+
+    print(f"Benchmark workdir {workdir}, service log in service.log", file=real_stdout)
+    sys.stdout = log
+    import app as service
+    client = service.app.test_client()
+
+    finished = {}  # job_uuid -> (finish time, status)
+    finish_job = service.finish_job
+
+    def recording_finish_job(job_uuid, result):
+        finish_job(job_uuid, result)
+        finished.setdefault(job_uuid, (time.time(), service.job_store.get_status(job_uuid)))
+
+    service.finish_job = recording_finish_job
+
+    deadline = time.time() + args.startup_timeout
+    while service.worker_pool.ready_count() < service.worker_pool.size and time.time() < deadline:
+        time.sleep(0.1)
+    if service.worker_pool.ready_count() == 0:
+        sys.stdout = real_stdout
+        raise SystemExit("No render worker came up; is Docker reachable?")
+
+    schedule = make_schedule(args, corpus, mix, rng)
+    submitted = {}  # job_uuid -> (submit time, scene)
+    throttled = 0
+    rejected = []
+    print(f"Submitting {len(schedule)} jobs at {args.rate}/min ({args.arrival})", file=real_stdout)
+
+    started = time.time()
+    for offset, name, payload in schedule:
+        delay = started + offset - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        submit_time = time.time()
+        response = client.post('/render', json=payload)
+        if response.status_code == 429:
+            throttled += 1
+        elif response.status_code >= 400:
+            rejected.append((payload['job_uuid'], response.status_code, response.get_json()))
+        else:
+            submitted[payload['job_uuid']] = (submit_time, name)
+
+    deadline = time.time() + args.timeout
+    while not submitted.keys() <= finished.keys() and time.time() < deadline:
+        time.sleep(0.05)
+
+    # Let the last completions reach the (fake) backend
+    webhook_deadline = time.time() + 10
+    while 'backend' in fakes and time.time() < webhook_deadline:
+        with fakes['backend'].lock:
+            if all(job_uuid in fakes['backend'].completions for job_uuid in finished):
+                break
+        time.sleep(0.05)
+
+    report = build_report(args, mix, submitted, finished, throttled, rejected, recorder, fakes, service, started)
+    service.worker_pool.stop(keep_containers=False)
+    service.webhook_dispatcher.stop()
+    sys.stdout = real_stdout
+    log.close()
+    if not args.keep_workdir and not args.workdir:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return report
+
+
+def build_report(args, mix, submitted, finished, throttled, rejected, recorder, fakes, service, started):
+    finished = {job: finished[job] for job in submitted if job in finished}
+    completed = [job for job, (_, status) in finished.items() if status == 'completed']
+    last_finish = max((t for t, _ in finished.values()), default=time.time())
+    elapsed = max(1e-6, last_finish - started)
+
+    stages = {stage: percentiles(samples) for stage, samples in sorted(recorder.samples.items()) if stage}
+    stages['end_to_end'] = percentiles([finished[job][0] - submitted[job][0] for job in completed])
+    by_scene = {}
+    for job in completed:
+        by_scene.setdefault(submitted[job][1], []).append(finished[job][0] - submitted[job][0])
+
+    failures = {}
+    for job, (_, status) in finished.items():
+        if status != 'completed':
+            result = service.job_store.get_result(job) or {}
+            error = (result.get('error') or status).splitlines()[0][:160]
+            failures[error] = failures.get(error, 0) + 1
+
+    report = {
+        'scenario': {
+            'jobs': args.jobs, 'rate_per_min': args.rate, 'arrival': args.arrival, 'mix': mix,
+            'quality': args.quality, 'encoding_profile': args.encoding_profile, 'profile': args.profile,
+            'workers': args.workers,
+            'docker': args.docker, 's3': args.s3, 'backend': 'fake' if args.backend == 'fake' else 'real',
+            'time_scale': args.time_scale if args.docker == 'fake' else None, 'env': sorted(args.env)
+        },
+        'submitted': len(submitted),
+        'completed': len(completed),
+        'failed': len(finished) - len(completed),
+        'unfinished': len(submitted) - len(finished),
+        'throttled': throttled,
+        'rejected': len(rejected),
+        'rejected_jobs': rejected[:10],
+        'seconds': round(elapsed, 3),
+        'jobs_per_min': round(len(completed) / elapsed * 60, 2),
+        'peak_rss_mb': peak_rss_mb(),
+        'stages': stages,
+        'end_to_end_by_scene': {name: percentiles(samples) for name, samples in sorted(by_scene.items())},
+        'output_bytes': output_sizes(service.job_store.get_result(job) or {} for job in completed),
+        'failures': failures
+    }
+    if 'docker' in fakes:
+        report['fake_docker'] = {'containers': len(fakes['docker'].started), 'renders': fakes['docker'].renders}
+    if 'backend' in fakes:
+        report['webhook_requests'] = fakes['backend'].requests
+    return report
+
+
+def compare(report, baseline, tolerance):
+    """Rows of (metric, baseline, current, change, regressed)"""
+    rows = []
+
+    def add(metric, old, new, higher_is_better):
+        if old is None or new is None:
+            return
+        change = (new - old) / old if old else 0.0
+        regressed = (change < -tolerance) if higher_is_better else (change > tolerance)
+        rows.append((metric, old, new, change, regressed))
+
+    for metric, higher_is_better in COMPARED.items():
+        add(metric, baseline.get(metric), report.get(metric), higher_is_better)
+    for stage, current in report['stages'].items():
+        previous = (baseline.get('stages') or {}).get(stage)
+        if not current or not previous:
+            continue
+        for p in ('p50', 'p95', 'p99'):
+            # Sub-10ms stages are mostly noise
+            if max(previous[p], current[p]) >= 0.01:
+                add(f"{stage}.{p}", previous[p], current[p], False)
+    # Bigger output for the same scenario means a profile or encoder got worse
+    for profile, current in (report.get('output_bytes') or {}).items():
+        previous = (baseline.get('output_bytes') or {}).get(profile)
+        if not previous:
+            continue
+        for key in ('p50', 'p95', 'total'):
+            add(f"bytes.{profile}.{key}", previous[key], current[key], False)
+    return rows
+
+
+def print_report(report, rows=None, baseline_scenario=None):
+    print(f"\nCompleted {report['completed']}/{report['submitted']} jobs in {report['seconds']}s "
+          f"({report['failed']} failed, {report['unfinished']} unfinished, {report['throttled']} throttled)")
+    print(f"Throughput: {report['jobs_per_min']} jobs/min   Peak RSS: {report['peak_rss_mb']} MB")
+    print(f"\n{'stage':<16}{'count':>7}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}")
+    for stage, stats in report['stages'].items():
+        if stats:
+            print(f"{stage:<16}{stats['count']:>7}{stats['p50']:>10}{stats['p95']:>10}{stats['p99']:>10}{stats['max']:>10}")
+    if report['end_to_end_by_scene']:
+        print("\nEnd to end by scene (p50 / p95):")
+        for name, stats in report['end_to_end_by_scene'].items():
+            print(f"  {name:<18}{stats['p50']:>8} / {stats['p95']}  ({stats['count']} jobs)")
+    if report.get('output_bytes'):
+        print(f"\n{'output KB':<16}{'count':>7}{'p50':>10}{'p95':>10}{'total':>12}{'encoded':>10}")
+        for profile, stats in report['output_bytes'].items():
+            ratio = f"{stats['ratio']:.0%}" if stats['ratio'] is not None else '-'
+            print(f"{profile:<16}{stats['count']:>7}{stats['p50'] / 1024:>10.1f}{stats['p95'] / 1024:>10.1f}"
+                  f"{stats['total'] / 1024:>12.1f}{ratio:>10}")
+    for job_uuid, status_code, body in report['rejected_jobs']:
+        print(f"  ⛔ {job_uuid} rejected with {status_code}: {body}")
+    for error, count in report['failures'].items():
+        print(f"  ❌ {count}x {error}")
+
+    if rows is None:
+        return
+    if baseline_scenario is not None and baseline_scenario != report['scenario']:
+        print("\n⚠️ The baseline was recorded with a different scenario; numbers may not be comparable")
+    print(f"\n{'vs baseline':<28}{'baseline':>12}{'current':>12}{'change':>10}")
+    for metric, old, new, change, regressed in rows:
+        print(f"{metric:<28}{old:>12}{new:>12}{change:>+10.1%}{'  REGRESSION' if regressed else ''}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--jobs', type=int, default=40, help='jobs to submit')
+    parser.add_argument('--rate', type=float, default=30, help='arrival rate in jobs per minute')
+    parser.add_argument('--arrival', choices=('poisson', 'uniform'), default='poisson')
+    parser.add_argument('--mix', help='scene weights, e.g. text_only=2,three_d=1 (default: all scenes equally)')
+    parser.add_argument('--quality', choices=('low', 'medium', 'high'), default='low')
+    parser.add_argument('--encoding-profile', help='config.encoding_profile for every job')
+    parser.add_argument('--profile', action='store_true', help='render with config.profile to measure its overhead')
+    parser.add_argument('--workers', type=int, default=2, help='RENDER_WORKERS')
+    parser.add_argument('--repeat-code', action='store_true', help='submit identical code so the result cache can hit')
+    parser.add_argument('--docker', choices=('fake', 'real'), default='fake')
+    parser.add_argument('--s3', choices=('fake', 'real'), default='fake')
+    parser.add_argument('--backend', default='fake', help="'fake' or the URL of a running backend")
+    parser.add_argument('--time-scale', type=float, default=0.05, help='fake render time multiplier')
+    parser.add_argument('--s3-mbps', type=float, default=50, help='fake S3 bandwidth in MB/s')
+    parser.add_argument('--env', action='append', default=[], metavar='KEY=VALUE', help='service setting')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--timeout', type=float, default=900, help='seconds to wait for jobs after the last submission')
+    parser.add_argument('--startup-timeout', type=float, default=120)
+    parser.add_argument('--workdir', help='scratch directory for the service (kept afterwards)')
+    parser.add_argument('--keep-workdir', action='store_true')
+    parser.add_argument('--output', help='write the report as JSON')
+    parser.add_argument('--baseline', default=str(DEFAULT_BASELINE))
+    parser.add_argument('--save-baseline', action='store_true', help='store this run as the baseline')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='relative change that counts as a regression')
+    parser.add_argument('--fail-on-regression', action='store_true')
+    args = parser.parse_args(argv)
+
+    baseline_path = Path(args.baseline).resolve()
+    output_path = Path(args.output).resolve() if args.output else None
+    report = run(args)
+
+    rows = None
+    baseline = None
+    if baseline_path.exists() and not args.save_baseline:
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        rows = compare(report, baseline, args.tolerance)
+    print_report(report, rows, baseline.get('scenario') if baseline else None)
+
+    if output_path:
+        with open(output_path, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(baseline_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nBaseline saved to {baseline_path}")
+    if args.fail_on_regression and rows and any(row[4] for row in rows):
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
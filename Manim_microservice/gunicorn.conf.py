@@ -0,0 +1,27 @@
+"""
+Gunicorn settings for the request front end: gunicorn -c gunicorn.conf.py app:app
+
+Every gunicorn worker is a SERVICE_ROLE=api process that validates and
+queues jobs and never renders; rendering runs in `python worker.py`, which
+shares the job store, work queue, render cache and webhook outbox with them.
+"""
+import os
+import multiprocessing
+
+from dotenv import load_dotenv
+
+load_dotenv()
+os.environ['SERVICE_ROLE'] = 'api'
+
+bind = f"{os.getenv('API_HOST', '0.0.0.0')}:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv('API_WORKERS', '0')) or multiprocessing.cpu_count() * 2 + 1
+# Threads per worker; every open /render/<job_uuid>/events stream holds one
+worker_class = 'gthread'
+threads = int(os.getenv('API_THREADS', '16'))
+backlog = int(os.getenv('API_BACKLOG', '2048'))
+keepalive = int(os.getenv('API_KEEPALIVE_SECONDS', '5'))
+timeout = int(os.getenv('API_TIMEOUT_SECONDS', '30'))
+graceful_timeout = 10
+# An access log line per request costs about as much as answering /health
+accesslog = os.getenv('API_ACCESS_LOG') or None
+errorlog = '-'
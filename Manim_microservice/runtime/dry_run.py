@@ -0,0 +1,101 @@
+"""
+Runs scenes with every animation skipped and nothing encoded or written,
+which surfaces runtime errors (bad kwargs, undefined mobjects, LaTeX
+errors, ...) in about a second in a warm interpreter, and counts each
+scene's animations (play() and wait() calls) for sharding.
+
+Usage: python dry_run.py [--media_dir <dir>] [--tex_dir <dir>] <file.py> <SceneClass> [<SceneClass> ...]
+Prints one line "DRYRUN {json}":
+  {"ok": true, "animations": {"Scene": n, ...}, "seconds": s}
+  {"ok": false, "scene": ..., "category": ..., "line": ..., "message": ..., "seconds": s}
+"""
+import sys
+import json
+import time
+import traceback
+import importlib.util
+
+
+def classify(error):
+    """Machine-readable category of a scene failure"""
+    message = str(error).lower()
+    if isinstance(error, SyntaxError):
+        return 'syntax_error'
+    if 'latex' in message or type(error).__name__ == 'LaTeXError':
+        return 'latex_error'
+    if isinstance(error, ImportError):
+        return 'import_error'
+    if isinstance(error, NameError):
+        return 'name_error'
+    if isinstance(error, AttributeError):
+        return 'attribute_error'
+    if isinstance(error, TypeError):
+        return 'type_error'
+    if isinstance(error, (ValueError, IndexError, KeyError, ZeroDivisionError, ArithmeticError)):
+        return 'value_error'
+    if isinstance(error, (MemoryError, RecursionError)):
+        return 'resource_error'
+    return 'runtime_error'
+
+
+def offending_line(error, path):
+    """Line of the scene file closest to where the error was raised"""
+    if isinstance(error, SyntaxError) and error.filename == path:
+        return error.lineno
+    line = None
+    for frame in traceback.extract_tb(error.__traceback__):
+        if frame.filename == path:
+            line = frame.lineno
+    return line
+
+
+def dry_run(path, scene_names, media_dir=None, tex_dir=None):
+    from manim import tempconfig
+
+    started = time.time()
+    scene = None
+    try:
+        spec = importlib.util.spec_from_file_location('scene_module', path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+
+        animations = {}
+        for scene in scene_names:
+            scene_class = getattr(module, scene, None)
+            if scene_class is None:
+                return {
+                    'ok': False, 'scene': scene, 'category': 'no_scene', 'line': None,
+                    'message': f"Scene class {scene} not found", 'seconds': round(time.time() - started, 3)
+                }
+            overrides = {'dry_run': True, 'save_last_frame': True, 'disable_caching': True}
+            if media_dir:
+                overrides['media_dir'] = media_dir
+            if tex_dir:
+                # Compiled TeX lands in the shared cache's staging dir; see services/tex_cache.py
+                overrides.update(tex_dir=tex_dir, no_latex_cleanup=True)
+            with tempconfig(overrides):
+                instance = scene_class()
+                instance.render()
+                animations[scene] = instance.renderer.num_plays
+
+        return {'ok': True, 'animations': animations, 'seconds': round(time.time() - started, 3)}
+    except Exception as e:
+        return {
+            'ok': False,
+            'scene': scene,
+            'category': classify(e),
+            'line': offending_line(e, path),
+            'message': f"{type(e).__name__}: {e}",
+            'seconds': round(time.time() - started, 3)
+        }
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    options = {'--media_dir': None, '--tex_dir': None}
+    while args[:1] and args[0] in options and len(args) > 1:
+        options[args[0]], args = args[1], args[2:]
+    if len(args) < 2:
+        print(__doc__)
+        sys.exit(2)
+    print('DRYRUN ' + json.dumps(dry_run(args[0], args[1:], options['--media_dir'], options['--tex_dir'])))
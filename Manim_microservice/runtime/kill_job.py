@@ -0,0 +1,51 @@
+"""
+Kills every process in this container whose command line mentions a job
+(its scene file, config or output path all carry the job uuid), i.e. the
+render client or the manim process of a plain exec. The render daemon
+kills a job's render when its client goes away.
+
+Usage: python kill_job.py <job_uuid>
+       python kill_job.py --stale   (every render, when a restarted service adopts the container)
+Prints "KILLED <n>".
+"""
+import os
+import sys
+import signal
+
+
+# Every render's command line points into one of these (scene file, config, output)
+RENDER_PATHS = ('/manim/temp/', '/manim/output/')
+
+
+def kill_job(job_uuid):
+    """job_uuid=None kills every render client and render"""
+    killed = 0
+    for pid in os.listdir('/proc'):
+        if not pid.isdigit() or int(pid) == os.getpid():
+            continue
+        try:
+            with open(f"/proc/{pid}/cmdline", 'rb') as f:
+                cmdline = f.read().replace(b'\0', b' ').decode('utf-8', 'replace')
+        except OSError:
+            continue
+        if job_uuid is None:
+            matches = 'render_client.py' in cmdline or any(path in cmdline for path in RENDER_PATHS)
+        else:
+            matches = job_uuid in cmdline
+        if matches and 'kill_job.py' not in cmdline:
+            try:
+                os.kill(int(pid), signal.SIGKILL)
+                killed += 1
+            except OSError:
+                pass
+    return killed
+
+
+if __name__ == '__main__':
+    if sys.argv[1:] == ['--stale']:
+        print(f"KILLED {kill_job(None)}")
+        sys.exit(0)
+    if len(sys.argv) != 2 or len(sys.argv[1]) < 8:
+        print(__doc__)
+        sys.exit(2)
+    print(f"KILLED {kill_job(sys.argv[1])}")
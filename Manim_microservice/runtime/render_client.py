@@ -0,0 +1,72 @@
+"""
+Hands a manim command line to the render daemon and relays its output.
+
+Usage: python render_client.py [--timeout <s>] <manim args...>   (same arguments as `manim`)
+       python render_client.py [--timeout <s>] --script <path> <args...>
+       python render_client.py --ping
+
+Exits with manim's exit code (124 if the render hit its timeout), or 75
+when the daemon isn't reachable so the caller can fall back to running
+manim directly. Only the standard library
+is imported, which keeps this far cheaper than starting manim itself.
+"""
+import os
+import sys
+import json
+import socket
+
+SOCKET_PATH = os.getenv('RENDER_DAEMON_SOCKET', '/tmp/manim-render.sock')
+DAEMON_UNAVAILABLE = 75
+
+
+def main(argv):
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(SOCKET_PATH)
+    except OSError as e:
+        print(f"render daemon unavailable: {e}")
+        return DAEMON_UNAVAILABLE
+
+    timeout = None
+    if argv[:1] == ['--timeout'] and len(argv) > 1:
+        timeout, argv = float(argv[1]), argv[2:]
+
+    if argv == ['--ping']:
+        request = {'ping': True}
+    elif argv[:1] == ['--script'] and len(argv) > 1:
+        request = {'script': argv[1], 'argv': argv[2:]}
+    else:
+        request = {'argv': argv}
+    if timeout:
+        request['timeout'] = timeout
+    client.sendall(json.dumps(request).encode() + b'\n')
+
+    out = sys.stdout.buffer
+    pending = b''
+    while True:
+        chunk = client.recv(65536)
+        if not chunk:
+            break
+        pending += chunk
+        # Hold back what could be the exit-code trailer, relay the rest
+        marker = pending.rfind(b'\0')
+        keep = len(pending) - marker if marker != -1 else 0
+        if len(pending) - keep > 0:
+            out.write(pending[:len(pending) - keep])
+            out.flush()
+            pending = pending[len(pending) - keep:]
+    client.close()
+
+    if not pending.startswith(b'\0'):
+        out.write(pending)
+        out.flush()
+        print("render daemon: the render process exited without a status (killed?)")
+        return 1
+    try:
+        return int(pending[1:])
+    except ValueError:
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,165 @@
+"""
+Long-lived render daemon that runs inside a worker container.
+
+Importing manim (numpy, cairo, pango, av, ...) takes seconds, and a plain
+`manim` exec pays that on every job. This process imports manim once and
+listens on a Unix socket; every request is served in a forked child, so
+each scene starts from the same clean, already-imported interpreter and
+can't leak state into the next job. The child is killed when it runs
+past the request's timeout or when its client disconnects.
+
+Protocol: the client sends one JSON line {"argv": [...], "timeout": s}
+with the manim command line arguments (or {"script": path, "argv": [...]}
+to run a helper script from this directory instead), receives the
+combined output and finally a NUL byte followed by the exit code.
+"""
+import os
+import sys
+import json
+import time
+import runpy
+import select
+import signal
+import socket
+import socketserver
+
+SOCKET_PATH = os.getenv('RENDER_DAEMON_SOCKET', '/tmp/manim-render.sock')
+TIMED_OUT = 124
+
+
+def preload():
+    """Import everything a render needs so forked children start warm"""
+    import numpy  # noqa: F401
+    import manim  # noqa: F401
+    from manim import __main__ as manim_cli  # noqa: F401
+    from manim import Scene, Text, MathTex  # noqa: F401
+
+
+def run_manim(argv, script=None):
+    """Run the manim CLI (or a helper script) in this forked process; returns its exit code"""
+    try:
+        if script:
+            sys.argv = [script, *argv]
+            runpy.run_path(script, run_name='__main__')
+        else:
+            from manim.__main__ import main
+
+            sys.argv = ['manim', *argv]
+            main(prog_name='manim')
+        return 0
+    except SystemExit as e:
+        if e.code is None:
+            return 0
+        return e.code if isinstance(e.code, int) else 1
+    except BaseException as e:
+        print(f"render daemon: {type(e).__name__}: {e}", file=sys.stderr)
+        return 1
+
+
+class RenderHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return  # liveness probe that just connects
+        try:
+            request = json.loads(line)
+        except ValueError:
+            request = {}
+
+        if request.get('ping'):
+            self.wfile.write(b'\0' + b'0')
+            return
+
+        argv = request.get('argv') or []
+        timeout = request.get('timeout')
+        deadline = time.time() + timeout if timeout else None
+
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            # The render gets its own process group so it can be killed
+            # together with anything it spawned (ffmpeg, latex, ...), and
+            # sends its stdout/stderr straight down the socket
+            os.setpgid(0, 0)
+            sock_fd = self.connection.fileno()
+            os.dup2(sock_fd, 1)
+            os.dup2(sock_fd, 2)
+            # Line by line, so the service can follow progress while it renders
+            sys.stdout.reconfigure(line_buffering=True)
+            sys.stderr.reconfigure(line_buffering=True)
+            code = run_manim(argv, request.get('script'))
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(code)
+
+        code = self.supervise(pid, deadline, timeout)
+        try:
+            self.wfile.write(b'\0' + str(code).encode())
+        except OSError:
+            pass  # client is gone
+
+    def supervise(self, pid, deadline, timeout):
+        """
+        Wait for the render; kill it once it runs past its deadline (exit
+        code 124, like coreutils timeout) or when the client goes away
+        (the job was cancelled).
+        """
+        while True:
+            finished, status = os.waitpid(pid, os.WNOHANG)
+            if finished:
+                code = os.waitstatus_to_exitcode(status)
+                return code if code >= 0 else 128 - code
+
+            if deadline and time.time() > deadline:
+                self.kill(pid)
+                self.wfile.write(f"render daemon: time limit of {timeout}s exceeded, render killed\n".encode())
+                return TIMED_OUT
+
+            readable, _, _ = select.select([self.connection], [], [], 0.1)
+            if readable and not self.connection.recv(1, socket.MSG_PEEK):
+                self.kill(pid)
+                return 137
+
+    def kill(self, pid):
+        try:
+            os.killpg(pid, signal.SIGKILL)
+        except OSError:
+            pass
+        os.waitpid(pid, 0)
+
+
+class RenderServer(socketserver.ForkingMixIn, socketserver.UnixStreamServer):
+    max_children = 64
+
+
+def already_running():
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(SOCKET_PATH)
+        return True
+    except OSError:
+        return False
+    finally:
+        client.close()
+
+
+def main():
+    if already_running():
+        print(f"render daemon already listening on {SOCKET_PATH}")
+        return
+
+    preload()
+
+    if os.path.exists(SOCKET_PATH):
+        os.unlink(SOCKET_PATH)
+    # Bind under a temporary name so clients never see a half-ready daemon
+    staging_path = f"{SOCKET_PATH}.{os.getpid()}"
+    server = RenderServer(staging_path, RenderHandler)
+    os.rename(staging_path, SOCKET_PATH)
+    print(f"render daemon ready on {SOCKET_PATH} (pid {os.getpid()})", flush=True)
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
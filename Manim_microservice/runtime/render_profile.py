@@ -0,0 +1,247 @@
+"""
+Runs the manim CLI with timing hooks and reports where the render's time
+went: per play()/wait() call (with the scene line it came from), split into
+interpolation and updaters, frame rendering (cairo) and encoding (the file
+writer), plus TeX compiles, and optionally a cProfile summary.
+
+Usage: python render_profile.py [--cprofile] <manim args...>
+Prints manim's own output and finally one line "PROFILE {json}":
+  {"totals": {...}, "tex": {...}, "animations": [...], "cprofile": [...]}
+Times are exclusive: TeX compiled inside an updater counts as TeX, not as
+updater time.
+"""
+import os
+import sys
+import json
+import time
+import functools
+from pathlib import Path
+
+# Slowest play() calls kept in the report
+MAX_ANIMATIONS = 200
+CPROFILE_TOP = 25
+PHASES = ('update', 'frame', 'encode', 'tex')
+
+
+class Clock:
+    """Exclusive time per phase; nested phases pause the enclosing one"""
+
+    def __init__(self):
+        self.totals = dict.fromkeys(PHASES, 0.0)
+        self.stack = []
+        self.mark = time.perf_counter()
+
+    def enter(self, phase):
+        now = time.perf_counter()
+        if self.stack:
+            self.totals[self.stack[-1]] += now - self.mark
+        self.stack.append(phase)
+        self.mark = now
+
+    def exit(self):
+        now = time.perf_counter()
+        self.totals[self.stack.pop()] += now - self.mark
+        self.mark = now
+
+    def snapshot(self):
+        totals = dict(self.totals)
+        if self.stack:
+            totals[self.stack[-1]] += time.perf_counter() - self.mark
+        return totals
+
+
+class Profiler:
+    def __init__(self, scene_file):
+        self.scene_file = os.path.abspath(scene_file) if scene_file else None
+        self.clock = Clock()
+        self.animations = []
+        self.frames = 0
+        self.tex = {'expressions': 0, 'compiled': 0, 'cached': 0}
+        self.started = time.perf_counter()
+
+    def timed(self, phase, function):
+        clock = self.clock
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            clock.enter(phase)
+            try:
+                return function(*args, **kwargs)
+            finally:
+                clock.exit()
+
+        return wrapper
+
+    def scene_line(self):
+        """Line of the scene file the current play() was called from"""
+        frame = sys._getframe(2)
+        while frame is not None:
+            if self.scene_file and os.path.abspath(frame.f_code.co_filename) == self.scene_file:
+                return frame.f_lineno
+            frame = frame.f_back
+        return None
+
+    @staticmethod
+    def describe(animation):
+        """'Create', 'ValueTracker.animate', ... for an animation or .animate builder"""
+        name = type(animation).__name__
+        if name in ('_AnimationBuilder', '_MethodAnimation') and hasattr(animation, 'mobject'):
+            return f"{type(animation.mobject).__name__}.animate"
+        return name
+
+    @staticmethod
+    def updaters(scene):
+        """Updaters attached to the scene's mobjects by kind"""
+        kinds = {}
+        for mobject in scene.mobjects:
+            for member in mobject.get_family():
+                for updater in getattr(member, 'updaters', ()):
+                    name = getattr(updater, '__qualname__', '')
+                    kind = 'always_redraw' if 'always_redraw' in name else 'updater'
+                    kinds[kind] = kinds.get(kind, 0) + 1
+        return kinds
+
+    def install(self):
+        from manim import Scene
+        from manim.renderer.cairo_renderer import CairoRenderer
+        from manim.scene.scene_file_writer import SceneFileWriter
+        from manim.utils import tex_file_writing
+
+        profiler = self
+        Scene.update_to_time = self.timed('update', Scene.update_to_time)
+        for name in ('begin_animation', 'write_frame', 'end_animation', 'combine_to_movie'):
+            if hasattr(SceneFileWriter, name):
+                setattr(SceneFileWriter, name, self.timed('encode', getattr(SceneFileWriter, name)))
+
+        original_update_frame = CairoRenderer.update_frame
+
+        @functools.wraps(original_update_frame)
+        def update_frame(renderer, *args, **kwargs):
+            profiler.frames += 1
+            return original_update_frame(renderer, *args, **kwargs)
+
+        CairoRenderer.update_frame = self.timed('frame', update_frame)
+
+        original_play = Scene.play
+
+        @functools.wraps(original_play)
+        def play(scene, *args, **kwargs):
+            before = profiler.clock.snapshot()
+            frames = profiler.frames
+            scene_time = getattr(scene.renderer, 'time', None)
+            entry = {
+                'index': len(profiler.animations),
+                'scene': type(scene).__name__,
+                'line': profiler.scene_line(),
+                'animations': [profiler.describe(a) for a in args],
+                'updaters': profiler.updaters(scene)
+            }
+            started = time.perf_counter()
+            try:
+                return original_play(scene, *args, **kwargs)
+            finally:
+                after = profiler.clock.snapshot()
+                entry['seconds'] = round(time.perf_counter() - started, 4)
+                if scene_time is not None:
+                    # The renderer's clock advances by the animation's run time
+                    entry['run_time'] = round(scene.renderer.time - scene_time, 3)
+                entry['frames'] = profiler.frames - frames
+                for phase in PHASES:
+                    entry[f"{phase}_seconds"] = round(after[phase] - before[phase], 4)
+                entry['constructs'] = entry['animations'] + sorted(entry['updaters'])
+                profiler.animations.append(entry)
+
+        Scene.play = play
+
+        # TeX: every module that imported tex_to_svg_file by name gets the timed version
+        original_tex_to_svg = tex_file_writing.tex_to_svg_file
+
+        def tex_to_svg_file(expression, environment=None, tex_template=None, *args, **kwargs):
+            profiler.tex['expressions'] += 1
+            tex_file = None
+            try:
+                tex_file = tex_file_writing.generate_tex_file(expression, environment, tex_template)
+            except Exception:
+                pass
+            cached = tex_file is not None and Path(tex_file).with_suffix('.svg').exists()
+            profiler.tex['cached' if cached else 'compiled'] += 1
+            return original_tex_to_svg(expression, environment, tex_template, *args, **kwargs)
+
+        timed_tex_to_svg = self.timed('tex', functools.wraps(original_tex_to_svg)(tex_to_svg_file))
+        for module in list(sys.modules.values()):
+            if getattr(module, 'tex_to_svg_file', None) is original_tex_to_svg:
+                module.tex_to_svg_file = timed_tex_to_svg
+
+    def report(self):
+        totals = self.clock.snapshot()
+        seconds = time.perf_counter() - self.started
+        animations = self.animations
+        if len(animations) > MAX_ANIMATIONS:
+            slowest = sorted(animations, key=lambda a: a['seconds'], reverse=True)[:MAX_ANIMATIONS]
+            animations = sorted(slowest, key=lambda a: a['index'])
+        return {
+            'totals': {
+                'seconds': round(seconds, 3),
+                'plays': len(self.animations),
+                'frames': self.frames,
+                **{f"{phase}_seconds": round(totals[phase], 3) for phase in PHASES},
+                'other_seconds': round(max(0.0, seconds - sum(totals.values())), 3)
+            },
+            'tex': {**self.tex, 'seconds': round(totals['tex'], 3)},
+            'animations': animations,
+            'animations_truncated': len(self.animations) > MAX_ANIMATIONS
+        }
+
+
+def cprofile_summary(profile):
+    import pstats
+
+    stats = pstats.Stats(profile)
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:CPROFILE_TOP]
+    summary = []
+    for (filename, line, function), (_, calls, tottime, cumtime, _) in rows:
+        if 'site-packages/' in filename:
+            filename = filename.split('site-packages/', 1)[1]
+        summary.append({
+            'function': f"{filename}:{line}({function})",
+            'calls': calls,
+            'tottime': round(tottime, 4),
+            'cumtime': round(cumtime, 4)
+        })
+    return summary
+
+
+def main(argv):
+    use_cprofile = argv[:1] == ['--cprofile']
+    if use_cprofile:
+        argv = argv[1:]
+
+    from manim.__main__ import main as manim_main
+
+    profiler = Profiler(next((arg for arg in argv if arg.endswith('.py')), None))
+    profiler.install()
+    profile = None
+    if use_cprofile:
+        import cProfile
+        profile = cProfile.Profile()
+        profile.enable()
+
+    code = 0
+    try:
+        sys.argv = ['manim', *argv]
+        manim_main(prog_name='manim')
+    except SystemExit as e:
+        code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    finally:
+        if profile is not None:
+            profile.disable()
+        report = profiler.report()
+        if profile is not None:
+            report['cprofile'] = cprofile_summary(profile)
+        sys.stdout.flush()
+        print('PROFILE ' + json.dumps(report), flush=True)
+    return code
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
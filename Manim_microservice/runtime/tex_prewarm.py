@@ -0,0 +1,38 @@
+"""
+Compiles a list of formulas with MathTex so their SVGs end up in the shared
+TeX cache before the first job needs them.
+
+Usage: python tex_prewarm.py --tex_dir <dir> <formulas.txt>
+One formula per line; blank lines and lines starting with # are skipped.
+Prints one line "PREWARM {json}":
+  {"compiled": n, "failed": [formula, ...], "seconds": s}
+"""
+import sys
+import json
+import time
+
+
+def prewarm(tex_dir, formulas):
+    from manim import MathTex, tempconfig
+
+    started = time.time()
+    compiled = 0
+    failed = []
+    with tempconfig({'tex_dir': tex_dir, 'no_latex_cleanup': True}):
+        for formula in formulas:
+            try:
+                MathTex(formula)
+                compiled += 1
+            except Exception:
+                failed.append(formula)
+    return {'compiled': compiled, 'failed': failed, 'seconds': round(time.time() - started, 3)}
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    if len(args) != 3 or args[0] != '--tex_dir':
+        print(__doc__)
+        sys.exit(2)
+    with open(args[2]) as f:
+        formulas = [line.strip() for line in f if line.strip() and not line.lstrip().startswith('#')]
+    print('PREWARM ' + json.dumps(prewarm(args[1], formulas)))
@@ -0,0 +1,110 @@
+import os
+import math
+
+from services.metrics import JOBS_TOTAL, DOWNSHIFTS_TOTAL
+
+QUALITY_ORDER = ['low', 'medium', 'high']
+# Frame rate manim renders each quality at
+QUALITY_FRAME_RATES = {'low': 15, 'medium': 30, 'high': 60}
+
+
+class AdmissionController:
+    """
+    Load shedding for /render.
+
+    A job is refused (429 with Retry-After) when the expected backlog,
+    including the job itself, is longer than ADMISSION_MAX_BACKLOG_SECONDS;
+    by the time such a job started its user would have given up. With
+    QUALITY_DOWNSHIFT on, jobs accepted while the queue is past a watermark
+    are rendered at a lower quality and/or frame rate instead of waiting
+    behind full-quality renders.
+    """
+
+    def __init__(self, work_queue, workers_fn):
+        self.work_queue = work_queue
+        self.workers_fn = workers_fn
+        self.max_backlog_seconds = float(os.getenv('ADMISSION_MAX_BACKLOG_SECONDS', '0'))  # 0 = unlimited
+        self.max_retry_after = int(os.getenv('ADMISSION_MAX_RETRY_AFTER_SECONDS', '600'))
+
+        self.downshift = os.getenv('QUALITY_DOWNSHIFT', 'false').lower() == 'true'
+        # Queue depths at which high drops to medium, anything drops to low, and the frame rate is capped
+        self.medium_watermark = int(os.getenv('DOWNSHIFT_MEDIUM_QUEUE_DEPTH', '20'))
+        self.low_watermark = int(os.getenv('DOWNSHIFT_LOW_QUEUE_DEPTH', '50'))
+        self.frame_rate_watermark = int(os.getenv('DOWNSHIFT_FRAME_RATE_QUEUE_DEPTH', '0'))  # 0 = never
+        self.downshift_frame_rate = int(os.getenv('DOWNSHIFT_FRAME_RATE', '15'))
+
+        self.admitted = 0
+        self.rejected = 0
+        self.downshifted = 0
+
+    def admit(self, predicted_seconds):
+        """(admitted, retry_after_seconds) for a job expected to render for predicted_seconds"""
+        if self.max_backlog_seconds <= 0:
+            self.admitted += 1
+            return True, 0
+
+        workers = max(1, self.workers_fn())
+        backlog = self.work_queue.backlog_seconds(workers, predicted_seconds) + predicted_seconds / workers
+        if backlog <= self.max_backlog_seconds:
+            self.admitted += 1
+            return True, 0
+
+        self.rejected += 1
+        JOBS_TOTAL.inc(status='throttled', error_class='backlog')
+        # The backlog drains at about one second per second
+        retry_after = min(self.max_retry_after, max(1, math.ceil(backlog - self.max_backlog_seconds)))
+        return False, retry_after
+
+    def plan_downshift(self, config):
+        """
+        The config to render with under the current load, and a description
+        of the change ({'reason', 'queue_depth', 'requested', 'applied'}), or
+        (config, None) when it renders as requested.
+        """
+        config = dict(config or {})
+        if not self.downshift or config.get('allow_downshift') is False:
+            return config, None
+
+        depth = self.work_queue.qsize()
+        quality = config.get('quality', 'medium')
+        if quality not in QUALITY_ORDER:
+            return config, None
+
+        target = quality
+        if depth >= self.low_watermark:
+            target = 'low'
+        elif depth >= self.medium_watermark and quality == 'high':
+            target = 'medium'
+
+        requested = {'quality': quality}
+        applied = {}
+        if target != quality:
+            applied['quality'] = target
+
+        if self.frame_rate_watermark and depth >= self.frame_rate_watermark:
+            current = config.get('frame_rate') or QUALITY_FRAME_RATES[target]
+            if self.downshift_frame_rate < current:
+                requested['frame_rate'] = config.get('frame_rate') or QUALITY_FRAME_RATES[quality]
+                applied['frame_rate'] = self.downshift_frame_rate
+
+        if not applied:
+            return config, None
+
+        self.downshifted += 1
+        DOWNSHIFTS_TOTAL.inc(quality=applied.get('quality', quality))
+        config.update(applied)
+        return config, {
+            'reason': 'queue_depth',
+            'queue_depth': depth,
+            'requested': requested,
+            'applied': applied
+        }
+
+    def stats(self):
+        return {
+            'max_backlog_seconds': self.max_backlog_seconds or None,
+            'admitted': self.admitted,
+            'rejected': self.rejected,
+            'downshift': self.downshift,
+            'downshifted': self.downshifted
+        }
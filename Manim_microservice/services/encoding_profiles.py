@@ -0,0 +1,87 @@
+import os
+import json
+
+# Container formats a job can be delivered in: file extension -> Content-Type
+FORMATS = {
+    'mp4': 'video/mp4',
+    'webm': 'video/webm',
+    'gif': 'image/gif'
+}
+
+# resolution and frame_rate are handed to manim (-r / --frame_rate), so a
+# smaller profile also renders faster. With a codec, or a format other than
+# mp4, the rendered video goes through one ffmpeg pass; without one manim's
+# own encode is delivered as is.
+ENCODING_PROFILES = {
+    'fast-preview': {
+        'resolution': [854, 480], 'frame_rate': 15, 'format': 'mp4',
+        'codec': None, 'crf': None, 'preset': None
+    },
+    'balanced': {
+        'resolution': [1280, 720], 'frame_rate': 30, 'format': 'mp4',
+        'codec': 'libx264', 'crf': 23, 'preset': 'veryfast'
+    },
+    'archival': {
+        'resolution': [1920, 1080], 'frame_rate': 60, 'format': 'mp4',
+        'codec': 'libx264', 'crf': 18, 'preset': 'slow'
+    },
+    'web': {
+        'resolution': [1280, 720], 'frame_rate': 30, 'format': 'webm',
+        'codec': 'libvpx-vp9', 'crf': 34, 'preset': None
+    },
+    'gif': {
+        'resolution': [640, 360], 'frame_rate': 12, 'format': 'gif',
+        'codec': None, 'crf': None, 'preset': None
+    }
+}
+
+
+def load_profiles():
+    """Built-in profiles, extended or overridden by the JSON file in ENCODING_PROFILES_FILE"""
+    profiles = {name: dict(profile) for name, profile in ENCODING_PROFILES.items()}
+    path = os.getenv('ENCODING_PROFILES_FILE')
+    if path:
+        with open(path) as f:
+            for name, profile in json.load(f).items():
+                profiles[name] = {**profiles.get(name, {}), **profile}
+    for name, profile in profiles.items():
+        if profile.get('format', 'mp4') not in FORMATS:
+            raise ValueError(f"Encoding profile {name} has unsupported format {profile.get('format')}")
+    return profiles
+
+
+def needs_encode(profile):
+    """Whether the rendered mp4 has to be transcoded for this profile"""
+    return bool(profile) and (profile.get('format', 'mp4') != 'mp4' or bool(profile.get('codec')))
+
+
+def output_format(profile):
+    return profile.get('format', 'mp4') if profile else 'mp4'
+
+
+def encode_args(profile):
+    """ffmpeg output options that turn a manim mp4 into the profile's format"""
+    fmt = output_format(profile)
+    codec = profile.get('codec')
+    crf = profile.get('crf')
+
+    if fmt == 'gif':
+        # Per-video palette; a GIF has no audio
+        fps = profile.get('frame_rate') or 12
+        return [
+            '-vf', f"fps={fps},split[a][b];[a]palettegen=stats_mode=diff[p];[b][p]paletteuse=dither=bayer",
+            '-loop', '0', '-an'
+        ]
+
+    if fmt == 'webm':
+        args = ['-c:v', codec or 'libvpx-vp9', '-b:v', '0', '-row-mt', '1', '-deadline', 'good', '-cpu-used', '4']
+        if crf is not None:
+            args += ['-crf', str(crf)]
+        return args + ['-c:a', 'libopus']
+
+    args = ['-c:v', codec or 'libx264', '-pix_fmt', 'yuv420p']
+    if profile.get('preset'):
+        args += ['-preset', profile['preset']]
+    if crf is not None:
+        args += ['-crf', str(crf)]
+    return args + ['-c:a', 'copy', '-movflags', '+faststart']
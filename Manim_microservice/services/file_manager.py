@@ -2,17 +2,42 @@ import os
 from pathlib import Path
 import time
 import shutil
+import threading
+
+from services.metrics import OUTPUT_DISK_BYTES
+
+MB = 1024 * 1024
+
 
 class FileManager:
+    """
+    Keeps the node's render scratch space (output/, media/ and temp/) bounded.
+
+    A background collector removes leftovers older than OUTPUT_MAX_AGE_SECONDS
+    and, while the total is over OUTPUT_DISK_BUDGET_MB, the oldest leftovers
+    first. Files of jobs that are still rendering or uploading are never
+    touched.
+    """
+
     def __init__(self):
         self.output_dir = Path('output')
-        self.cleanup_age = 3600 * 24  # 24 hours
-    
+        self.media_dir = Path(os.getenv('MEDIA_DIR', 'media'))
+        self.temp_dir = Path('temp')
+        self.cleanup_age = int(os.getenv('OUTPUT_MAX_AGE_SECONDS', str(3600 * 24)))  # 24 hours
+        self.max_bytes = int(os.getenv('OUTPUT_DISK_BUDGET_MB', '10240')) * MB
+        # Anything this fresh may belong to a job that is just starting
+        self.grace_seconds = int(os.getenv('OUTPUT_GC_GRACE_SECONDS', '300'))
+
+        self.runs = 0
+        self.removed = 0
+        self.bytes_freed = 0
+        self.bytes_used = 0
+
     def get_download_url(self, job_uuid):
         """Get download URL for video file"""
         # Check main output directory
         video_path = self.output_dir / job_uuid / f"{job_uuid}.mp4"
-        
+
         if video_path.exists():
             file_size = video_path.stat().st_size
             return {
@@ -21,16 +46,107 @@ class FileManager:
                 'expires_in': self.cleanup_age
             }
         return None
-    
-    def cleanup_old_files(self):
+
+    def _entries(self):
+        """Removable units: top-level files and dirs, and the per-job dirs inside parts/, partials/ and tex/"""
+        for root in (self.output_dir, self.media_dir, self.temp_dir):
+            if not root.is_dir():
+                continue
+            for child in root.iterdir():
+                if root == self.output_dir and child.name in ('parts', 'partials', 'tex') and child.is_dir():
+                    yield from child.iterdir()
+                else:
+                    yield child
+
+    @staticmethod
+    def _measure(path):
+        """(bytes, newest mtime) of a file or directory tree"""
+        if not path.is_dir():
+            stat = path.stat()
+            return stat.st_size, stat.st_mtime
+        size, mtime = 0, path.stat().st_mtime
+        for dirpath, _, filenames in os.walk(path):
+            for name in filenames:
+                try:
+                    stat = os.stat(os.path.join(dirpath, name))
+                except OSError:
+                    continue
+                size += stat.st_size
+                mtime = max(mtime, stat.st_mtime)
+        return size, mtime
+
+    @staticmethod
+    def _remove(path):
+        if path.is_dir():
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            path.unlink(missing_ok=True)
+
+    def collect(self, active=()):
+        """
+        One GC pass. active holds the uuids of jobs whose files must stay.
+        Returns {'removed', 'bytes_freed', 'bytes_used'}.
+        """
+        now = time.time()
+        entries = []
+        total = 0
+        for path in self._entries():
+            try:
+                size, mtime = self._measure(path)
+            except OSError:
+                continue
+            total += size
+            if now - mtime < self.grace_seconds or any(path.name.startswith(uuid) for uuid in active):
+                continue
+            entries.append((mtime, size, path))
+
+        removed = 0
+        freed = 0
+        for mtime, size, path in sorted(entries, key=lambda entry: entry[0]):
+            if now - mtime <= self.cleanup_age and total - freed <= self.max_bytes:
+                break  # the rest is newer and the budget holds
+            self._remove(path)
+            removed += 1
+            freed += size
+
+        self.runs += 1
+        self.removed += removed
+        self.bytes_freed += freed
+        self.bytes_used = total - freed
+        OUTPUT_DISK_BYTES.set(self.bytes_used)
+        return {'removed': removed, 'bytes_freed': freed, 'bytes_used': self.bytes_used}
+
+    def cleanup_old_files(self, active=()):
         """Clean up old video files and directories"""
         try:
-            current_time = time.time()
-            for job_dir in self.output_dir.iterdir():
-                if job_dir.is_dir():
-                    dir_age = current_time - job_dir.stat().st_mtime
-                    if dir_age > self.cleanup_age:
-                        shutil.rmtree(job_dir)
-                        print(f"Cleaned up old job directory: {job_dir}")
+            result = self.collect(active)
+            if result['removed']:
+                print(
+                    f"🧹 Removed {result['removed']} leftover file(s), {result['bytes_freed'] // MB}MB freed, "
+                    f"{result['bytes_used'] // MB}MB in use"
+                )
+            return result
         except Exception as e:
             print(f"Error during cleanup: {e}")
+            return None
+
+    def start_gc(self, active_fn=None, interval=None):
+        """Run cleanup_old_files periodically on a background thread; active_fn() returns job uuids to keep"""
+        interval = interval or int(os.getenv('OUTPUT_GC_INTERVAL_SECONDS', '300'))
+
+        def gc_loop():
+            while True:
+                self.cleanup_old_files(active_fn() if active_fn else ())
+                time.sleep(interval)
+
+        threading.Thread(target=gc_loop, daemon=True, name="output-gc").start()
+
+    def stats(self):
+        return {
+            'bytes_used': self.bytes_used,
+            'budget_bytes': self.max_bytes,
+            'max_age_seconds': self.cleanup_age,
+            'gc_runs': self.runs,
+            'removed': self.removed,
+            'bytes_freed': self.bytes_freed
+        }
@@ -0,0 +1,310 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from pathlib import Path
+from collections import OrderedDict
+
+# Job states that still need a worker; anything else is final
+PENDING_STATES = ('queued', 'processing', 'uploading')
+
+
+class JobStore:
+    """
+    Where job payloads, state transitions and results live.
+
+    Queue entries are persisted on submission so interrupted work can be
+    re-enqueued at startup, and finished records are expired by age
+    (JOB_STORE_TTL_SECONDS) and count (JOB_STORE_MAX_FINISHED) so memory and
+    disk stay flat over long uptimes.
+    """
+
+    def __init__(self, ttl_seconds=None, max_finished=None):
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else int(os.getenv('JOB_STORE_TTL_SECONDS', str(7 * 24 * 3600)))
+        self.max_finished = max_finished if max_finished is not None else int(os.getenv('JOB_STORE_MAX_FINISHED', '10000'))
+
+    def enqueue(self, job_data, reset_attempts=True):
+        """Persist a queue entry; re-enqueued recovered jobs keep their attempt count"""
+        raise NotImplementedError
+
+    def set_status(self, job_uuid, status):
+        """
+        Record a state transition of a pending job; starting to process counts
+        as an attempt. Returns False, changing nothing, if the job is already
+        final (cancelled while a worker held it) or unknown.
+        """
+        raise NotImplementedError
+
+    def finish(self, job_uuid, status, result):
+        """
+        Record a job's final state and result. A cancelled job stays
+        cancelled: returns False, changing nothing, for any other status.
+        """
+        raise NotImplementedError
+
+    def set_progress(self, job_uuid, progress):
+        """Record the live progress of a running job (see services/render_progress.py)"""
+        raise NotImplementedError
+
+    def get(self, job_uuid):
+        """{'status', 'result', 'progress', 'attempts', ...} for a job, or None"""
+        raise NotImplementedError
+
+    def pending_jobs(self):
+        """Payloads and attempt counts of jobs that never finished, oldest first"""
+        raise NotImplementedError
+
+    def prune(self):
+        """Expire finished records; returns how many were removed"""
+        raise NotImplementedError
+
+    def counts(self):
+        """Number of jobs per state"""
+        raise NotImplementedError
+
+    def start_pruning(self, interval=None):
+        """Expire finished records periodically on a background thread"""
+        interval = interval or int(os.getenv('JOB_STORE_PRUNE_INTERVAL', '600'))
+
+        def prune_loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    removed = self.prune()
+                    if removed:
+                        print(f"🧹 Expired {removed} finished job record(s)")
+                except Exception as e:
+                    print(f"Error pruning job store: {e}")
+
+        threading.Thread(target=prune_loop, daemon=True, name="job-store-pruner").start()
+
+    def get_status(self, job_uuid):
+        record = self.get(job_uuid)
+        return record['status'] if record else None
+
+    def get_result(self, job_uuid):
+        record = self.get(job_uuid)
+        return record['result'] if record else None
+
+
+class MemoryJobStore(JobStore):
+    """Non-durable store for development; finished records are still bounded"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def enqueue(self, job_data, reset_attempts=True):
+        now = time.time()
+        with self._lock:
+            previous = self._jobs.get(job_data['job_uuid'])
+            self._jobs[job_data['job_uuid']] = {
+                'payload': dict(job_data), 'status': 'queued', 'result': None, 'progress': None,
+                'attempts': previous['attempts'] if previous and not reset_attempts else 0,
+                'created_at': previous['created_at'] if previous else now,
+                'updated_at': now, 'finished_at': None
+            }
+
+    def set_status(self, job_uuid, status):
+        with self._lock:
+            record = self._jobs.get(job_uuid)
+            if record is None or record['status'] not in PENDING_STATES:
+                return False
+            record['status'] = status
+            record['updated_at'] = time.time()
+            if status == 'processing':
+                record['attempts'] += 1
+            return True
+
+    def finish(self, job_uuid, status, result):
+        now = time.time()
+        with self._lock:
+            record = self._jobs.setdefault(job_uuid, {
+                'payload': {'job_uuid': job_uuid}, 'attempts': 0, 'created_at': now
+            })
+            if record.get('status') == 'cancelled' and status != 'cancelled':
+                return False
+            record.update(status=status, result=result, updated_at=now, finished_at=now)
+            self._jobs.move_to_end(job_uuid)
+        self._trim()
+        return True
+
+    def set_progress(self, job_uuid, progress):
+        with self._lock:
+            record = self._jobs.get(job_uuid)
+            if record is not None:
+                record['progress'] = progress
+
+    def get(self, job_uuid):
+        with self._lock:
+            record = self._jobs.get(job_uuid)
+            return dict(record) if record else None
+
+    def pending_jobs(self):
+        with self._lock:
+            return [
+                {'job_data': dict(r['payload']), 'attempts': r['attempts']}
+                for r in self._jobs.values() if r['status'] in PENDING_STATES
+            ]
+
+    def _trim(self):
+        with self._lock:
+            finished = [uuid for uuid, r in self._jobs.items() if r.get('finished_at')]
+            for job_uuid in finished[:max(0, len(finished) - self.max_finished)]:
+                del self._jobs[job_uuid]
+
+    def prune(self):
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            expired = [uuid for uuid, r in self._jobs.items() if r.get('finished_at') and r['finished_at'] < cutoff]
+            for job_uuid in expired:
+                del self._jobs[job_uuid]
+        before = len(self._jobs)
+        self._trim()
+        return len(expired) + before - len(self._jobs)
+
+    def counts(self):
+        with self._lock:
+            counts = {}
+            for record in self._jobs.values():
+                counts[record['status']] = counts.get(record['status'], 0) + 1
+            return counts
+
+
+class SQLiteJobStore(JobStore):
+    """Durable store on a local SQLite database in WAL mode"""
+
+    def __init__(self, path, **kwargs):
+        super().__init__(**kwargs)
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_uuid TEXT PRIMARY KEY,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    result TEXT,
+                    progress TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    finished_at REAL
+                )
+            ''')
+            columns = [row['name'] for row in self._conn.execute('PRAGMA table_info(jobs)')]
+            if 'progress' not in columns:
+                self._conn.execute('ALTER TABLE jobs ADD COLUMN progress TEXT')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS jobs_finished_at ON jobs (finished_at)')
+
+    def _execute(self, sql, params=()):
+        with self._lock, self._conn:
+            return self._conn.execute(sql, params).fetchall()
+
+    def enqueue(self, job_data, reset_attempts=True):
+        now = time.time()
+        self._execute(
+            '''INSERT INTO jobs (job_uuid, payload, status, created_at, updated_at)
+               VALUES (?, ?, 'queued', ?, ?)
+               ON CONFLICT (job_uuid) DO UPDATE SET
+                   payload = excluded.payload, status = 'queued', result = NULL, progress = NULL,
+                   attempts = CASE WHEN ? THEN 0 ELSE attempts END,
+                   updated_at = excluded.updated_at, finished_at = NULL''',
+            (job_data['job_uuid'], json.dumps(job_data), now, now, reset_attempts)
+        )
+
+    def _update(self, sql, params=()):
+        with self._lock, self._conn:
+            return self._conn.execute(sql, params).rowcount
+
+    def set_status(self, job_uuid, status):
+        attempt = 1 if status == 'processing' else 0
+        return self._update(
+            f'''UPDATE jobs SET status = ?, attempts = attempts + ?, updated_at = ?
+                WHERE job_uuid = ? AND status IN ({','.join('?' * len(PENDING_STATES))})''',
+            (status, attempt, time.time(), job_uuid, *PENDING_STATES)
+        ) > 0
+
+    def finish(self, job_uuid, status, result):
+        now = time.time()
+        return self._update(
+            '''INSERT INTO jobs (job_uuid, payload, status, result, created_at, updated_at, finished_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT (job_uuid) DO UPDATE SET
+                   status = excluded.status, result = excluded.result,
+                   updated_at = excluded.updated_at, finished_at = excluded.finished_at
+               WHERE jobs.status != 'cancelled' OR excluded.status = 'cancelled'
+            ''',
+            (job_uuid, json.dumps({'job_uuid': job_uuid}), status, json.dumps(result), now, now, now)
+        ) > 0
+
+    def set_progress(self, job_uuid, progress):
+        self._execute('UPDATE jobs SET progress = ? WHERE job_uuid = ?', (json.dumps(progress), job_uuid))
+
+    def get(self, job_uuid):
+        rows = self._execute('SELECT * FROM jobs WHERE job_uuid = ?', (job_uuid,))
+        if not rows:
+            return None
+        row = rows[0]
+        return {
+            'payload': json.loads(row['payload']),
+            'status': row['status'],
+            'result': json.loads(row['result']) if row['result'] else None,
+            'progress': json.loads(row['progress']) if row['progress'] else None,
+            'attempts': row['attempts'],
+            'created_at': row['created_at'],
+            'updated_at': row['updated_at'],
+            'finished_at': row['finished_at']
+        }
+
+    def pending_jobs(self):
+        rows = self._execute(
+            f"SELECT payload, attempts FROM jobs WHERE status IN ({','.join('?' * len(PENDING_STATES))}) ORDER BY created_at",
+            PENDING_STATES
+        )
+        return [{'job_data': json.loads(row['payload']), 'attempts': row['attempts']} for row in rows]
+
+    def prune(self):
+        with self._lock, self._conn:
+            removed = self._conn.execute(
+                'DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?',
+                (time.time() - self.ttl_seconds,)
+            ).rowcount
+            removed += self._conn.execute(
+                '''DELETE FROM jobs WHERE finished_at IS NOT NULL AND job_uuid NOT IN (
+                       SELECT job_uuid FROM jobs WHERE finished_at IS NOT NULL
+                       ORDER BY finished_at DESC LIMIT ?
+                   )''',
+                (self.max_finished,)
+            ).rowcount
+        if removed:
+            self._execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        return removed
+
+    def counts(self):
+        rows = self._execute('SELECT status, COUNT(*) AS n FROM jobs GROUP BY status')
+        return {row['status']: row['n'] for row in rows}
+
+
+def create_job_store(url=None):
+    """
+    Build the job store named by JOB_STORE_URL:
+    sqlite:///relative/path.db, sqlite:////absolute/path.db or memory://
+    """
+    url = url or os.getenv('JOB_STORE_URL', 'sqlite:///data/jobs.db')
+
+    if url.startswith('memory://'):
+        return MemoryJobStore()
+    if url.startswith('sqlite:///'):
+        return SQLiteJobStore(url[len('sqlite:///'):])
+
+    raise ValueError(f"Unsupported JOB_STORE_URL: {url}")
@@ -1,160 +1,1059 @@
 import os
+import re
+import ast
 import tempfile
 import time
 import json
 import uuid
+import socket
+import hashlib
 from pathlib import Path
 import docker
+from docker.models.containers import ExecResult
 import shutil
 import threading
 import queue
+from functools import lru_cache
+
+from services.result_cache import RenderResultCache
+from services.segment_cache import SegmentCache
+from services.tex_cache import TexCache
+from services.render_progress import OutputMonitor, ProgressReporter
+from services.worker_pool import compute_pool_size
+from services.preflight import preflight
+from services.metrics import STAGE_SECONDS
+from services.encoding_profiles import FORMATS, load_profiles, needs_encode, output_format, encode_args
+
+# Exit code of runtime/render_client.py when the daemon isn't listening
+DAEMON_UNAVAILABLE = 75
+# Seconds a freshly started daemon gets to import manim before it's restarted
+DAEMON_STARTUP_GRACE = 60
+# Exit code of a render killed at its time limit (coreutils timeout and the daemon)
+RENDER_TIMED_OUT = 124
+# Exit code of a render killed with SIGKILL (cancelled, or the container ran out of memory)
+RENDER_KILLED = 137
+# Exit code reported for a render abandoned after a fatal traceback in its output
+RENDER_ABORTED = -1
+
+# Labels of worker containers, used to adopt them after a restart
+WORKER_LABEL = 'manim-ai.role'
+POOL_LABEL = 'manim-ai.pool'
+WORKER_ID_LABEL = 'manim-ai.worker-id'
+CONFIG_LABEL = 'manim-ai.config'
+
+
+@lru_cache(maxsize=256)
+def scene_classes(code):
+    """
+    Every Scene subclass defined in the code, in source order. Bases are
+    matched by name (Scene, MovingCameraScene, ThreeDScene, ... or another
+    scene class in the file); scenes that other scenes in the file build
+    on are treated as shared bases and not rendered on their own.
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return tuple(re.findall(r'class\s+(\w+)\s*\(\s*\w*Scene\s*\)', code))
+
+    classes = {}
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef):
+            classes[node.name] = [
+                base.id if isinstance(base, ast.Name) else base.attr
+                for base in node.bases if isinstance(base, (ast.Name, ast.Attribute))
+            ]
+
+    def is_scene(name, seen=()):
+        for base in classes.get(name, []):
+            if base in classes:
+                if base not in seen and is_scene(base, (*seen, name)):
+                    return True
+            elif base.endswith('Scene'):
+                return True
+        return False
+
+    scenes = [name for name in classes if is_scene(name)]
+    shared_bases = {base for name in scenes for base in classes[name]}
+    return tuple(name for name in scenes if name not in shared_bases)
+
 
-from services.s3_manager import upload_file_to_s3
 class ManimExecutor:
-    def __init__(self):
+    def __init__(self, job_store=None):
         self.output_dir = Path('output')
         self.temp_dir = Path('temp')
-        self.jobs = {}  # In-memory job tracking
+        # Each render gets its own manim media_dir (partial movies, TeX, images) under
+        # /manim/media, a bind mount of media/ or, with MEDIA_TMPFS, a tmpfs in every
+        # worker container; it is removed as soon as the render is done
+        self.media_dir = Path(os.getenv('MEDIA_DIR', 'media'))
+        self.media_tmpfs = os.getenv('MEDIA_TMPFS', 'false').lower() == 'true'
+        self.media_tmpfs_size_mb = int(os.getenv('MEDIA_TMPFS_SIZE_MB', '512'))
+        self.jobs = {}  # In-memory tracking of running jobs only
+        self.job_store = job_store  # Final states live here
+        # A digest (manimcommunity/manim@sha256:...) pins the image and skips the pull at startup
+        self.image = os.getenv('MANIM_IMAGE', 'manimcommunity/manim:latest')
+        self._manim_version = None
+        self.manim_names = None  # What `from manim import *` provides, read from a worker container
+        # Both are published here for processes without worker containers (SERVICE_ROLE=api)
+        self.runtime_path = Path(os.getenv('MANIM_RUNTIME_PATH', 'data/manim_runtime.json'))
+        self._runtime_mtime = None
+        self._runtime_checked = 0
+        self.segment_cache = SegmentCache()
+        self.tex_cache = TexCache()
+        # Formulas (one per line) compiled into the TeX cache when the first worker starts
+        self.tex_prewarm_file = os.getenv('TEX_PREWARM_FILE') or None
+        self._tex_prewarmed = False
+
+        # Warm render daemon inside each worker container (runtime/render_daemon.py);
+        # jobs fall back to a plain `manim` exec whenever it isn't reachable
+        self.render_daemon = os.getenv('RENDER_DAEMON', 'true').lower() == 'true'
+        self.runtime_dir = Path(__file__).resolve().parent.parent / 'runtime'
+        self._daemon_started = {}  # container id -> when its daemon was (re)started
+        self.runner_counts = {'daemon': 0, 'exec': 0}
+
+        # Execute scenes with animations skipped before rendering (config.dry_run overrides)
+        self.dry_run_enabled = os.getenv('DRY_RUN', 'false').lower() == 'true'
+
+        # Split long single-scene renders into animation ranges (config.shard overrides)
+        self.sharding = os.getenv('RENDER_SHARDING', 'false').lower() == 'true'
+        self.shard_min_animations = int(os.getenv('RENDER_SHARD_MIN_ANIMATIONS', '8'))
+        self.max_shards = int(os.getenv('RENDER_MAX_SHARDS', '0')) or compute_pool_size()
+
+        # Per-container resource limits; a worker container renders one job at
+        # a time, so these are the CPU and memory limits of every job
+        self.worker_cpus = float(os.getenv('WORKER_CPUS', '1'))
+        self.worker_memory_mb = int(os.getenv('WORKER_MEMORY_MB', '1536'))
+        self.worker_pids_limit = int(os.getenv('WORKER_PIDS_LIMIT', '256'))
+
+        # Wall-clock limit per render by quality (config.timeout_seconds can only lower it)
+        self.render_timeouts = {
+            'low': int(os.getenv('RENDER_TIMEOUT_LOW_SECONDS', '120')),
+            'medium': int(os.getenv('RENDER_TIMEOUT_MEDIUM_SECONDS', '300')),
+            'high': int(os.getenv('RENDER_TIMEOUT_HIGH_SECONDS', '900'))
+        }
+        self.dry_run_timeout = int(os.getenv('DRY_RUN_TIMEOUT_SECONDS', '30'))
+
+        # Named encoding profiles (config.encoding_profile); without one manim's own output is delivered
+        self.encoding_profiles = load_profiles()
+        self.default_encoding_profile = os.getenv('ENCODING_PROFILE') or None
+
+        # Live progress parsed from the streamed output of each render; a fatal
+        # traceback ends the render right away unless EARLY_ABORT is off
+        self.progress = ProgressReporter(job_store)
+        self.early_abort = os.getenv('EARLY_ABORT', 'true').lower() == 'true'
+        self.aborted_renders = 0
+        self._aborted_jobs = set()  # jobs with a part that failed; their other parts are stopped
+
+        self._containers = {}  # container id -> running worker container
+        self.cancelled = set()  # running jobs that are being killed
         
         # Ensure directories exist
         self.output_dir.mkdir(exist_ok=True)
         self.temp_dir.mkdir(exist_ok=True)
+        if not self.media_tmpfs:
+            self.media_dir.mkdir(parents=True, exist_ok=True)
         
-        # Initialize Docker client
+        # Docker is set up in the background (see start()) so the service can
+        # answer requests right away; workers wait for `ready`
+        self.docker_client = None
+        self.image_id = None
+        self.ready = threading.Event()
+        self.startup = {'state': 'pending', 'image': self.image, 'pinned': '@sha256:' in self.image,
+                        'pulled': False, 'adopted': 0, 'discarded': 0, 'seconds': None, 'error': None}
+        self.init_retry_seconds = int(os.getenv('DOCKER_INIT_RETRY_SECONDS', '10'))
+
+        # Worker containers carry labels and outlive the process, so a restart
+        # adopts them (warm daemon, loaded fonts) instead of starting new ones
+        self.adopt_workers = os.getenv('WORKER_ADOPT', 'true').lower() == 'true'
+        self.pool_id = os.getenv('NODE_ID') or socket.gethostname()
+        self._adoptable = {}  # worker id -> adopted container not yet claimed by its worker
+
+    def start(self, pool_size=None):
+        """Connect to Docker, make sure the image is there and adopt worker containers, in the background"""
+        threading.Thread(target=self._initialize, args=(pool_size,), daemon=True, name="executor-init").start()
+
+    def _initialize(self, pool_size):
+        started = time.time()
+        self.startup['state'] = 'initializing'
+        while True:
+            try:
+                client = docker.from_env()
+                self.image_id = self.ensure_image(client)
+                self.docker_client = client
+                break
+            except Exception as e:
+                self.startup['error'] = str(e)
+                print(f"⚠️ Docker initialization failed, retrying in {self.init_retry_seconds}s: {e}")
+                time.sleep(self.init_retry_seconds)
+
+        if self.adopt_workers:
+            try:
+                self.adopt_containers(pool_size)
+            except Exception as e:
+                print(f"⚠️ Could not adopt worker containers: {e}")
+        else:
+            self.discard_containers()
+
+        self.startup.update(state='ready', error=None, seconds=round(time.time() - started, 2))
+        self.ready.set()
+        print(f"Docker client initialized successfully in {self.startup['seconds']}s")
+
+    def ensure_image(self, client):
+        """
+        Make the manim image available and return its id. A pinned digest
+        (MANIM_IMAGE=repo@sha256:...) that is already present is never pulled;
+        a tag is pulled, falling back to the local copy if the pull fails.
+        """
+        if self.startup['pinned']:
+            try:
+                image = client.images.get(self.image)
+                print(f"Image {self.image} already present, skipping pull")
+                return getattr(image, 'id', None)
+            except docker.errors.ImageNotFound:
+                pass
+
         try:
-            self.docker_client = docker.from_env()
-            self.container = None
-            self._start_persistent_container()
-            print("Persistent Docker container initialized successfully")
+            print(f"Pulling {self.image}")
+            image = client.images.pull(self.image)
+            self.startup['pulled'] = True
+            return getattr(image, 'id', None)
         except Exception as e:
-            print(f"Failed to initialize Docker client: {e}")
-            self.docker_client = None
-            self.container = None
-    
-    def _start_persistent_container(self):
+            try:
+                image = client.images.get(self.image)
+            except docker.errors.ImageNotFound:
+                raise e
+            print(f"⚠️ Pull of {self.image} failed ({e}), using the local image")
+            return getattr(image, 'id', None)
+
+    def container_config(self):
+        """Mounts and limits of a worker container; adopted containers must match"""
+        container_temp_dir = "/manim/temp"
+        container_output_dir = "/manim/output"
+        volumes = {
+            str(self.temp_dir.absolute()): {'bind': container_temp_dir, 'mode': 'rw'},
+            str(self.output_dir.absolute()): {'bind': container_output_dir, 'mode': 'rw'}
+        }
+        if self.segment_cache.enabled:
+            # Only needed when job dirs can't hard-link into the store
+            volumes[str(self.segment_cache.root.absolute())] = {
+                'bind': SegmentCache.container_mount, 'mode': 'ro'
+            }
+        if self.tex_cache.enabled:
+            volumes[str(self.tex_cache.root.absolute())] = {
+                'bind': TexCache.container_mount, 'mode': 'ro'
+            }
+        # Render daemon and helper scripts
+        volumes[str(self.runtime_dir)] = {'bind': '/manim/runtime', 'mode': 'ro'}
+        tmpfs = {}
+        if self.media_tmpfs:
+            # Counts against the container's memory limit
+            tmpfs['/manim/media'] = f"size={self.media_tmpfs_size_mb}m,mode=1777"
+        else:
+            volumes[str(self.media_dir.absolute())] = {'bind': '/manim/media', 'mode': 'rw'}
+
+        config = {
+            'volumes': volumes,
+            'tmpfs': tmpfs,
+            'nano_cpus': int(self.worker_cpus * 1e9),
+            'mem_limit': f"{self.worker_memory_mb}m",
+            'memswap_limit': f"{self.worker_memory_mb}m",  # no swap
+            'pids_limit': self.worker_pids_limit
+        }
+        digest = hashlib.sha256(json.dumps([self.image, config], sort_keys=True).encode('utf-8')).hexdigest()
+        return config, digest[:16]
+
+    def _labeled_containers(self):
+        return self.docker_client.containers.list(filters={
+            'label': [f"{WORKER_LABEL}=worker", f"{POOL_LABEL}={self.pool_id}"]
+        })
+
+    def adopt_containers(self, pool_size=None):
+        """
+        Take over the running worker containers a previous process of this
+        node left behind. Containers built from another image or config, or
+        beyond the pool size, are stopped; renders still running in adopted
+        ones (their jobs are re-queued) are killed.
+        """
+        _, config_hash = self.container_config()
+        for container in self._labeled_containers():
+            labels = container.labels or {}
+            try:
+                worker_id = int(labels.get(WORKER_ID_LABEL, ''))
+            except ValueError:
+                worker_id = None
+            image_id = getattr(getattr(container, 'image', None), 'id', None)
+            reason = None
+            if labels.get(CONFIG_LABEL) != config_hash:
+                reason = 'different config'
+            elif self.image_id and image_id and image_id != self.image_id:
+                reason = 'different image'
+            elif worker_id is None or (pool_size is not None and worker_id >= pool_size):
+                reason = 'outside the pool'
+            elif worker_id in self._adoptable:
+                reason = 'duplicate worker id'
+            elif not self.is_container_running(container):
+                reason = 'not running'
+
+            if reason:
+                print(f"Discarding worker container {container.id[:12]} ({reason})")
+                self.startup['discarded'] += 1
+                self.stop_container(container)
+                continue
+
+            try:
+                result = container.exec_run(['python', '/manim/runtime/kill_job.py', '--stale'])
+                print(f"♻️ Adopted worker container {container.id[:12]} for worker {worker_id} "
+                      f"({result.output.decode('utf-8').strip()})")
+            except Exception as e:
+                print(f"⚠️ Could not clean up adopted container {container.id[:12]}: {e}")
+            self._adoptable[worker_id] = container
+            self.startup['adopted'] += 1
+
+    def discard_containers(self):
+        """Stop the worker containers a previous process of this node left behind"""
+        try:
+            for container in self._labeled_containers():
+                print(f"Discarding worker container {container.id[:12]}")
+                self.startup['discarded'] += 1
+                self.stop_container(container)
+        except Exception as e:
+            print(f"⚠️ Could not list leftover worker containers: {e}")
+
+    def claim_container(self, worker_id):
+        """The adopted container of a worker, if there is one (once)"""
+        container = self._adoptable.pop(worker_id, None)
+        if container is None or not self.is_container_running(container):
+            return None
+        self._containers[container.id] = container
+        # Its daemon is most likely still up; a dead one is restarted on the first job
+        self._container_ready(container)
+        return container
+
+    def _container_ready(self, container):
+        if self.manim_names is None:
+            threading.Thread(target=self.load_manim_names, args=(container,), daemon=True).start()
+        if self.tex_prewarm_file and self.tex_cache.enabled and not self._tex_prewarmed:
+            self._tex_prewarmed = True
+            threading.Thread(target=self.prewarm_tex, args=(container,), daemon=True, name="tex-prewarm").start()
+
+    def start_container(self, container_name=None, worker_id=None):
         """Start a persistent Docker container for Manim execution"""
+        if not self.docker_client:
+            return None
+
         try:
-            # Pull latest manim image if needed
-            self.docker_client.images.pull("manimcommunity/manim:latest")
-            
-            # Create volumes for persistent container
-            container_temp_dir = "/manim/temp"
-            container_output_dir = "/manim/output"
+            container_name = container_name or f"manim-worker-{uuid.uuid4().hex[:8]}"
+            config, config_hash = self.container_config()
+            labels = {WORKER_LABEL: 'worker', POOL_LABEL: self.pool_id, CONFIG_LABEL: config_hash}
+            if worker_id is not None:
+                labels[WORKER_ID_LABEL] = str(worker_id)
 
-            container_name = f"manim-worker-{uuid.uuid4().hex[:8]}"
-            
             # Start persistent container with sleep to keep it running
-            self.container = self.docker_client.containers.run(
-                image="manimcommunity/manim:latest",
+            container = self.docker_client.containers.run(
+                image=self.image,
                 command="sleep infinity",  # Keep container alive
-                volumes={
-                    str(self.temp_dir.absolute()): {'bind': container_temp_dir, 'mode': 'rw'},
-                    str(self.output_dir.absolute()): {'bind': container_output_dir, 'mode': 'rw'}
-                },
+                labels=labels,
                 detach=True,
                 name=container_name,
-                remove=True  # Auto-remove when stopped
+                remove=True,  # Auto-remove when stopped
+                **config
             )
             
-            print(f"Started persistent container: {self.container.id[:12]}")
+            print(f"Started persistent container: {container.id[:12]}")
+            self._containers[container.id] = container
+            if self.render_daemon:
+                self.start_render_daemon(container)
+            self._container_ready(container)
+            return container
             
         except Exception as e:
             print(f"Failed to start persistent container: {e}")
-            self.container = None
+            return None
+
+    def start_render_daemon(self, container):
+        """
+        Launch the render daemon in the background; it imports manim once and
+        forks a child per job. Until its socket is up jobs run via plain exec.
+        """
+        try:
+            container.exec_run(['python', '/manim/runtime/render_daemon.py'], detach=True)
+            self._daemon_started[container.id] = time.time()
+            print(f"🔥 Render daemon starting in container {container.id[:12]}")
+        except Exception as e:
+            print(f"⚠️ Could not start render daemon in {container.id[:12]}: {e}")
+
+    def timeout_for(self, config):
+        """Wall-clock seconds a render of this quality may take"""
+        limit = self.render_timeouts.get((config or {}).get('quality', 'medium'), self.render_timeouts['medium'])
+        requested = (config or {}).get('timeout_seconds')
+        if isinstance(requested, (int, float)) and requested > 0:
+            return min(limit, int(requested))
+        return limit
+
+    def cancel(self, job_uuid):
+        """
+        Kill a job that is rendering on this node: its processes in every
+        worker container are killed and the render returns as cancelled.
+        Returns False if the job isn't rendering here.
+        """
+        job = self.jobs.get(job_uuid)
+        if not job or job['status'] != 'running':
+            return False
+
+        self.cancelled.add(job_uuid)
+        for container in list(self._containers.values()):
+            try:
+                result = container.exec_run(['python', '/manim/runtime/kill_job.py', job_uuid])
+                print(f"🛑 Cancel {job_uuid} in {container.id[:12]}: {result.output.decode('utf-8').strip()}")
+            except Exception as e:
+                print(f"⚠️ Failed to kill job {job_uuid} in {container.id[:12]}: {e}")
+        return True
+
+    def render_daemon_stats(self):
+        return {
+            'enabled': self.render_daemon,
+            'jobs_by_runner': dict(self.runner_counts)
+        }
+
+    def is_container_running(self, container):
+        """Check whether a worker container is still up"""
+        try:
+            container.reload()
+            return container.status == 'running'
+        except Exception:
+            return False
     
-    def get_manim_version(self):
-        """Get Manim version from Docker container"""
-        if not self.container:
+    def get_manim_version(self, container=None):
+        """Get Manim version from a worker container (cached after first success)"""
+        if self._manim_version:
+            return self._manim_version
+
+        if not container:
             return "Container not available"
         
         try:
-            result = self.container.exec_run("manim --version")
-            return result.output.decode('utf-8').strip()
+            result = container.exec_run("manim --version")
+            version = result.output.decode('utf-8').strip()
+            if result.exit_code == 0:
+                self._manim_version = version
+            return version
         except Exception as e:
             return f"Container error: {str(e)}"
     
-    def process_job(self, job_uuid, code, config):
+    def load_manim_names(self, container):
+        """Read the manim namespace from a worker container for preflight name checks"""
+        try:
+            result = container.exec_run([
+                'python', '-c',
+                "import manim; print('\\n'.join(n for n in dir(manim) if not n.startswith('_')))"
+            ])
+            if result.exit_code == 0:
+                self.manim_names = frozenset(result.output.decode('utf-8').split())
+                print(f"Loaded {len(self.manim_names)} manim names for preflight checks")
+                self.get_manim_version(container)
+                self.publish_runtime()
+        except Exception as e:
+            print(f"⚠️ Could not read the manim namespace: {e}")
+
+    def publish_runtime(self):
+        """Write the manim version and namespace to MANIM_RUNTIME_PATH for the front-end processes"""
+        try:
+            self.runtime_path.parent.mkdir(parents=True, exist_ok=True)
+            partial = self.runtime_path.with_suffix('.tmp')
+            partial.write_text(json.dumps({
+                'image': self.image,
+                'version': self._manim_version,
+                'names': sorted(self.manim_names or ())
+            }))
+            partial.replace(self.runtime_path)
+        except OSError as e:
+            print(f"⚠️ Could not publish the manim runtime info: {e}")
+
+    def refresh_runtime(self, interval=5):
+        """Pick up the manim version and namespace published by the render process, when it changed"""
+        now = time.time()
+        if now - self._runtime_checked < interval:
+            return
+        self._runtime_checked = now
+        try:
+            mtime = self.runtime_path.stat().st_mtime
+            if mtime == self._runtime_mtime:
+                return
+            info = json.loads(self.runtime_path.read_text())
+        except (OSError, ValueError):
+            return
+        self._runtime_mtime = mtime
+        if info.get('version'):
+            self._manim_version = info['version']
+        if info.get('names'):
+            self.manim_names = frozenset(info['names'])
+
+    def prewarm_tex(self, container):
+        """Compile the formulas in TEX_PREWARM_FILE into the TeX cache (runtime/tex_prewarm.py)"""
+        run_id = f"prewarm-{uuid.uuid4().hex[:8]}"
+        formulas_path = self.temp_dir / f"{run_id}.txt"
+        tex_dir = self.output_dir / 'tex' / run_id
+        linked = None
+        try:
+            shutil.copyfile(self.tex_prewarm_file, formulas_path)
+            linked = self.tex_cache.prepare(tex_dir)
+            result, _ = self._exec_manim(
+                container,
+                ['--tex_dir', f"/manim/output/tex/{run_id}", f"/manim/temp/{formulas_path.name}"],
+                script='/manim/runtime/tex_prewarm.py',
+                timeout=600
+            )
+            stats = self.tex_cache.collect(tex_dir, linked, success=result.exit_code == 0, count=False)
+            linked = None
+            output = result.output.decode('utf-8') if result.output else ''
+            match = re.search(r'^PREWARM (\{.*\})$', output, re.MULTILINE)
+            if result.exit_code != 0 or not match:
+                print(f"⚠️ TeX prewarm did not finish: {output[-500:]}")
+                return None
+            report = json.loads(match.group(1))
+            print(
+                f"🧮 Prewarmed TeX cache: {stats['compiled']} new, {stats['hits']} already cached, "
+                f"{len(report['failed'])} failed in {report['seconds']}s"
+            )
+            return report
+        except Exception as e:
+            print(f"⚠️ TeX prewarm failed: {e}")
+            return None
+        finally:
+            if linked is not None:
+                self.tex_cache.collect(tex_dir, linked, success=False, count=False)
+            formulas_path.unlink(missing_ok=True)
+            shutil.rmtree(tex_dir, ignore_errors=True)
+
+    def preflight(self, code, config=None):
+        """
+        Static checks run on the request thread before a job is queued, so
+        code that can never render doesn't take a worker (see services/preflight.py).
+        """
+        self.refresh_runtime()
+        normalized = code.replace('\\n', '\n')
+        cleaned_code = self._clean_code(code)
+        line_offset = cleaned_code.count('\n') - normalized.count('\n')
+
+        report = preflight(cleaned_code, self.manim_names, line_offset)
+        if report['errors'] and report['errors'][0]['type'] == 'syntax_error':
+            return report
+
+        scenes = self._extract_scene_classes(cleaned_code)
+        report['hints']['scenes'] = scenes
+        if not scenes:
+            report['errors'].insert(0, {
+                'type': 'no_scene', 'message': 'No Scene class found in the provided code', 'line': None, 'col': None
+            })
+            report['ok'] = False
+        return report
+
+    def output_path_for(self, job_uuid, fmt='mp4'):
+        """Where the finished video of a job lands on the host"""
+        return self.output_dir / f"{job_uuid}.{fmt}"
+
+    def object_name_for(self, job_uuid, fmt='mp4'):
+        return f"videos/{job_uuid}.{fmt}"  # ✅ Use job_uuid as filename
+
+    def encoding_profile(self, config):
+        """(name, profile) of a job's encoding profile, or (None, None); unknown names raise ValueError"""
+        name = (config or {}).get('encoding_profile') or self.default_encoding_profile
+        if not name:
+            return None, None
+        if name not in self.encoding_profiles:
+            raise ValueError(
+                f"Unknown encoding profile '{name}', available: {', '.join(sorted(self.encoding_profiles))}"
+            )
+        return name, self.encoding_profiles[name]
+
+    def profile_options(self, config):
+        """
+        Profiling requested by config.profile (True, 'cprofile' or
+        {'cprofile': bool}) as {'cprofile': bool}, or None
         """
-        Main job processing function with your S3 upload
+        requested = (config or {}).get('profile')
+        if not requested:
+            return None
+        if isinstance(requested, dict):
+            return {'cprofile': bool(requested.get('cprofile'))}
+        return {'cprofile': requested == 'cprofile'}
+
+    def encoding_for(self, config):
+        """How a job's video is delivered: {'profile', 'format', 'content_type', 'encode'}"""
+        name, profile = self.encoding_profile(config)
+        fmt = output_format(profile)
+        return {'profile': name, 'format': fmt, 'content_type': FORMATS[fmt], 'encode': needs_encode(profile)}
+
+    def media_dir_for(self, run_id):
+        """A render's own manim media_dir inside the worker container"""
+        return f"/manim/media/{run_id}"
+
+    def _remove_media_dir(self, container, run_id):
+        if not self.media_tmpfs:
+            shutil.rmtree(self.media_dir / run_id, ignore_errors=True)
+            return
+        try:
+            container.exec_run(['rm', '-rf', self.media_dir_for(run_id)])
+        except Exception as e:
+            print(f"⚠️ Could not remove media dir of {run_id}: {e}")
+
+    def part_path_for(self, job_uuid, part):
+        """Where one part (scene or animation range) of a job is rendered on the host"""
+        return self.output_dir / 'parts' / job_uuid / f"{part}.mp4"
+
+    def render_job(self, job_uuid, code, config, container, render_done=None, run_parts=None):
+        """
+        Step 1 of a job: execute the Manim code in the worker's container.
+
+        render_done (a threading.Event) is set as soon as the output file is
+        final, so a streaming upload can complete while this returns.
+        run_parts(fns) renders independent parts of the job on several
+        workers (see PartBoard); without it parts render one after another.
         """
         try:
             self.jobs[job_uuid] = {'status': 'running', 'start_time': time.time()}
+            self.progress.start(job_uuid)
             
             print(f"PROMPT: Starting job {job_uuid}")
             
             # Step 1: Execute Manim code in persistent container  
             print("EXECUTING IN PERSISTENT DOCKER CONTAINER")
-            result = self._run_code_in_persistent_container(job_uuid, code, config)
+            try:
+                result = self._render(job_uuid, code, config, container, run_parts)
+                profile_name, profile = self.encoding_profile(config)
+                if result['status'] == 'success' and needs_encode(profile):
+                    result = self._encode_output(job_uuid, result, profile_name, profile, config, container)
+                elif result['status'] == 'success' and profile_name:
+                    result['encoding'] = {'profile': profile_name, 'format': 'mp4', 'bytes': result.get('file_size', 0)}
+            finally:
+                self.cancelled.discard(job_uuid)
+                self._aborted_jobs.discard(job_uuid)
+                self.progress.finish(job_uuid)
+                if render_done is not None:
+                    render_done.set()
             
             if result["status"] == "success":
                 print(f"VIDEO PATH = {result['video_path']}")
-                
-                # Step 2: Upload to S3 using your function
-                print("UPLOADING TO S3")
-                s3_result = upload_file_to_s3(
-                    result['video_path'], 
-                    object_name=f"videos/{job_uuid}.mp4"  # ✅ Use job_uuid as filename
-                )
-                
-                print(s3_result)
-                if s3_result["status"] == "success":
-                    # Step 3: Clean up local file after successful upload
-
-                    if os.path.exists(result['video_path']):
-                        os.remove(result['video_path'])
-                        print(f"Cleaned up local file: {result['video_path']}")
-                    
-                    self.jobs[job_uuid] = {
-                        'status': 'completed',
-                        'video_url': s3_result['url'],  # ✅ S3 URL from your function
-                        'file_size': result.get('file_size', 0),
-                        'completion_time': time.time()
-                    }
-                    print("SUCCESS")
-                    return {
-                        'success': True,
-                        'video_path': s3_result['url'],  # ✅ S3 URL returned
-                        'file_size': result.get('file_size', 0)
-                    }
-                else:
-                    # S3 Upload failed
-                    error_msg = f"S3 Upload Error: {s3_result['message']}"
-                    self.jobs[job_uuid] = {'status': 'failed', 'error': error_msg}
-                    return {'success': False, 'error': error_msg}
+                self.jobs[job_uuid] = {'status': 'uploading', 'start_time': self.jobs[job_uuid]['start_time']}
+                return {
+                    'success': True,
+                    'video_path': result['video_path'],
+                    'file_size': result.get('file_size', 0),
+                    'segment_cache': result.get('segment_cache'),
+                    'tex_cache': result.get('tex_cache'),
+                    'runner': result.get('runner'),
+                    'encoding': result.get('encoding'),
+                    'profile': result.get('profile')
+                }
             else:
                 # Manim execution failed
                 error_msg = result.get("error", "Unknown error during execution")
-                self.jobs[job_uuid] = {'status': 'failed', 'error': error_msg}
-                return {'success': False, 'error': error_msg}
+                self.jobs.pop(job_uuid, None)
+                failure = {'success': False, 'error': error_msg}
+                if result['status'] in ('cancelled', 'timed_out'):
+                    failure['status'] = result['status']
+                if result.get('error_category'):
+                    failure.update(error_category=result['error_category'], error_line=result.get('error_line'))
+                return failure
+                
+        except Exception as e:
+            error_msg = f"Exception: {str(e)}"
+            self.jobs.pop(job_uuid, None)
+            return {'success': False, 'error': error_msg}
+
+    def finish_upload(self, job_uuid, render, s3_result):
+        """Step 2 of a job: turn the S3 upload result into the job result"""
+        try:
+            print(s3_result)
+            if s3_result["status"] == "success":
+                # Step 3: Clean up local file after successful upload
+
+                if os.path.exists(render['video_path']):
+                    os.remove(render['video_path'])
+                    print(f"Cleaned up local file: {render['video_path']}")
                 
+                self.jobs.pop(job_uuid, None)
+                print("SUCCESS")
+                return {
+                    'success': True,
+                    'video_path': s3_result['url'],  # ✅ S3 URL returned
+                    'file_size': render.get('file_size', 0),
+                    'segment_cache': render.get('segment_cache'),
+                    'tex_cache': render.get('tex_cache'),
+                    'profile': render.get('profile'),
+                    'encoding': render.get('encoding'),
+                    'upload_metrics': s3_result.get('metrics')
+                }
+            else:
+                # S3 Upload failed
+                error_msg = f"S3 Upload Error: {s3_result['message']}"
+                self.jobs.pop(job_uuid, None)
+                return {'success': False, 'error': error_msg}
+
         except Exception as e:
             error_msg = f"Exception: {str(e)}"
-            self.jobs[job_uuid] = {'status': 'failed', 'error': error_msg}
+            self.jobs.pop(job_uuid, None)
             return {'success': False, 'error': error_msg}
     
-    def _run_code_in_persistent_container(self, job_uuid, code, config):
+    def _render(self, job_uuid, code, config, container, run_parts=None):
+        """Render a job's video; every Scene in the code becomes one part of it"""
+        scenes = self._extract_scene_classes(self._clean_code(code))
+        shard = len(scenes) == 1 and config.get('shard', self.sharding)
+
+        # The dry run also counts the animations sharding needs
+        check = None
+        if scenes and (shard or config.get('dry_run', self.dry_run_enabled)):
+            self.progress.stage(job_uuid, 'dry_run')
+            check = self.dry_run(job_uuid, code, scenes, container)
+            if check and check.get('category') == 'cancelled':
+                return {'status': 'cancelled', 'error': 'Job was cancelled'}
+            if check and not check['ok']:
+                return {
+                    'status': 'failed',
+                    'error': self.format_dry_run_error(check),
+                    'error_category': check['category'],
+                    'error_line': check['line']
+                }
+
+        self.progress.stage(job_uuid, 'rendering')
+        if shard and check:
+            ranges = self.plan_shards(check['animations'].get(scenes[0]))
+            if len(ranges) > 1:
+                self.progress.set_totals(job_uuid, {part: end - start + 1 for part, (start, end) in enumerate(ranges)})
+                return self._render_shards(job_uuid, code, config, container, scenes[0], ranges, run_parts)
+        if check and check.get('animations'):
+            self.progress.set_totals(job_uuid, {part: check['animations'].get(scene, 0) for part, scene in enumerate(scenes)})
+        if len(scenes) <= 1:
+            return self._run_code_in_persistent_container(job_uuid, code, config, container)
+
+        print(f"🎬 Job {job_uuid} has {len(scenes)} scenes, rendering them in parallel: {', '.join(scenes)}")
+        tasks = [
+            lambda worker_container, part=part, scene=scene: self._run_code_in_persistent_container(
+                job_uuid, code, config, worker_container, part=part, scene_class=scene
+            )
+            for part, scene in enumerate(scenes)
+        ]
+        return self._render_parts(job_uuid, tasks, scenes, container, run_parts)
+
+    def dry_run(self, job_uuid, code, scenes, container):
+        """
+        Execute the scenes with every animation skipped and nothing encoded
+        (runtime/dry_run.py) to catch runtime errors in about a second instead
+        of a full render. Returns the script's report with lines relative to
+        the submitted code, or None if the dry run itself couldn't run.
+        """
+        python_file_path = self.temp_dir / f"{job_uuid}-dryrun.py"
+        tex_dir = None
+        linked_tex = None
+        try:
+            if not container or not self.is_container_running(container):
+                return None
+            cleaned_code = self._clean_code(code)
+            with open(python_file_path, 'w') as f:
+                f.write(cleaned_code)
+
+            # TeX the dry run compiles warms the cache for the render that follows
+            tex_args = []
+            if self.tex_cache.enabled:
+                tex_dir = self.output_dir / 'tex' / f"{job_uuid}-dryrun"
+                linked_tex = self.tex_cache.prepare(tex_dir)
+                tex_args = ['--tex_dir', f"/manim/output/tex/{job_uuid}-dryrun"]
+
+            result, _ = self._exec_manim(
+                container,
+                ['--media_dir', self.media_dir_for(f"{job_uuid}-dryrun"), *tex_args,
+                 f"/manim/temp/{python_file_path.name}", *scenes],
+                script='/manim/runtime/dry_run.py',
+                timeout=self.dry_run_timeout
+            )
+            if linked_tex is not None:
+                self.tex_cache.collect(tex_dir, linked_tex, success=result.exit_code == 0, count=False)
+                linked_tex = None
+            if job_uuid in self.cancelled:
+                return {'ok': False, 'category': 'cancelled', 'line': None, 'message': 'Job was cancelled', 'seconds': 0}
+            if result.exit_code == RENDER_TIMED_OUT:
+                return {
+                    'ok': False, 'category': 'timeout', 'line': None, 'seconds': self.dry_run_timeout,
+                    'message': f"The scene did not finish within {self.dry_run_timeout}s with animations skipped (endless loop?)"
+                }
+            output = result.output.decode('utf-8') if result.output else ''
+            match = re.search(r'^DRYRUN (\{.*\})$', output, re.MULTILINE)
+            if result.exit_code != 0 or not match:
+                print(f"⚠️ Dry run could not run for job {job_uuid}, going ahead with the render")
+                return None
+
+            report = json.loads(match.group(1))
+            if report.get('line'):
+                report['line'] -= cleaned_code.count('\n') - code.replace('\\n', '\n').count('\n')
+            print(f"🧪 Dry run for job {job_uuid}: {'ok' if report['ok'] else report['category']} in {report['seconds']}s")
+            STAGE_SECONDS.observe(report['seconds'], stage='dry_run')
+            return report
+        except Exception as e:
+            print(f"⚠️ Dry run failed to start for job {job_uuid}: {str(e)}")
+            return None
+        finally:
+            if python_file_path.exists():
+                python_file_path.unlink()
+            if container:
+                self._remove_media_dir(container, f"{job_uuid}-dryrun")
+            if tex_dir is not None:
+                if linked_tex is not None:
+                    self.tex_cache.collect(tex_dir, linked_tex, success=False, count=False)
+                shutil.rmtree(tex_dir, ignore_errors=True)
+
+    def format_dry_run_error(self, report):
+        location = f"Line {report['line']}: " if report.get('line') else ''
+        scene = f" in {report['scene']}" if report.get('scene') else ''
+        return f"Dry run failed{scene} ({report['category']}): {location}{report['message']}"
+
+    def plan_shards(self, animation_count):
+        """Contiguous, inclusive (start, end) animation ranges of similar size"""
+        if not animation_count:
+            return []
+        shards = min(self.max_shards, animation_count // max(1, self.shard_min_animations))
+        if shards <= 1:
+            return [(0, animation_count - 1)]
+
+        size, extra = divmod(animation_count, shards)
+        ranges = []
+        start = 0
+        for index in range(shards):
+            end = start + size + (1 if index < extra else 0) - 1
+            ranges.append((start, end))
+            start = end + 1
+        return ranges
+
+    def _render_shards(self, job_uuid, code, config, container, scene_class, ranges, run_parts=None):
+        """Render one scene as animation ranges (manim -n start,end) and join them"""
+        print(f"🔪 Job {job_uuid}: splitting {scene_class} into {len(ranges)} shards {ranges}")
+        tasks = [
+            lambda worker_container, part=part, start=start, end=end: self._run_code_in_persistent_container(
+                job_uuid, code, config, worker_container, part=part, scene_class=scene_class,
+                extra_args=('-n', f"{start},{end}")
+            )
+            for part, (start, end) in enumerate(ranges)
+        ]
+        labels = [f"{scene_class} animations {start}-{end}" for start, end in ranges]
+        return self._render_parts(job_uuid, tasks, labels, container, run_parts)
+
+    def _render_parts(self, job_uuid, tasks, labels, container, run_parts=None):
+        """Render the parts of a job and join them into its output file"""
+        try:
+            if run_parts:
+                results = run_parts(tasks, label=job_uuid)
+            else:
+                results = [task(container) for task in tasks]
+
+            for label, result in zip(labels, results):
+                if result.get('status') in ('cancelled', 'timed_out'):
+                    return result
+            # Parts stopped because another one failed come last
+            for label, result in sorted(zip(labels, results), key=lambda item: bool(item[1].get('stopped'))):
+                if result.get('status') != 'success':
+                    return {
+                        'status': 'failed',
+                        'error': f"{label}: {result.get('error', 'Unknown error')}",
+                        'error_category': result.get('error_category'),
+                        'error_line': result.get('error_line')
+                    }
+
+            output_file = self._concat_parts(job_uuid, [Path(r['video_path']) for r in results], container)
+            return {
+                'status': 'success',
+                'video_path': str(output_file),
+                'file_size': output_file.stat().st_size,
+                'segment_cache': self._merge_segment_stats([r.get('segment_cache') for r in results]),
+                'tex_cache': self._merge_tex_stats([r.get('tex_cache') for r in results]),
+                'profile': self._merge_profiles([r.get('profile') for r in results]),
+                'runner': results[0].get('runner'),
+                'parts': len(results)
+            }
+        except Exception as e:
+            return {'status': 'failed', 'error': str(e)}
+        finally:
+            shutil.rmtree(self.output_dir / 'parts' / job_uuid, ignore_errors=True)
+
+    def _concat_parts(self, job_uuid, part_files, container):
+        """
+        Join rendered parts into the job's output with ffmpeg's concat demuxer.
+        Parts share codec settings, so streams are copied, not re-encoded.
+        """
+        if not container or not self.is_container_running(container):
+            raise Exception("Worker container is not running")
+
+        list_file = self.output_dir / 'parts' / job_uuid / 'concat.txt'
+        with open(list_file, 'w') as f:
+            for part_file in part_files:
+                f.write(f"file '/manim/output/{part_file.relative_to(self.output_dir).as_posix()}'\n")
+
+        output_file = self.output_path_for(job_uuid)
+        cmd_string = ' '.join([
+            'ffmpeg', '-y', '-loglevel', 'error',
+            '-f', 'concat', '-safe', '0',
+            '-i', f"/manim/output/{list_file.relative_to(self.output_dir).as_posix()}",
+            '-c', 'copy',
+            f"/manim/output/{output_file.name}"
+        ])
+        print(f"Joining {len(part_files)} parts: {cmd_string}")
+        result = container.exec_run(cmd_string, stdout=True, stderr=True)
+        if result.exit_code != 0 or not output_file.exists():
+            error_output = result.output.decode('utf-8') if result.output else "Unknown error"
+            raise Exception(f"Joining rendered parts failed: {error_output}")
+        return output_file
+
+    def _encode_output(self, job_uuid, result, profile_name, profile, config, container):
+        """
+        Transcode the rendered mp4 with the job's encoding profile in one
+        ffmpeg pass in the worker container. The result gains an 'encoding'
+        entry with the pass's time and the size before and after.
+        """
+        source = Path(result['video_path'])
+        fmt = output_format(profile)
+        target = self.output_path_for(job_uuid, fmt)
+        staging = target.with_name(f"{job_uuid}.encoding.{fmt}")
+        started = time.time()
+        try:
+            if not container or not self.is_container_running(container):
+                raise Exception("Worker container is not running")
+
+            timeout = self.timeout_for(config)
+            command = [
+                'timeout', '-k', '5', str(timeout),
+                'ffmpeg', '-y', '-loglevel', 'error',
+                '-i', f"/manim/output/{source.relative_to(self.output_dir).as_posix()}",
+                *encode_args(profile),
+                f"/manim/output/{staging.name}"
+            ]
+            print(f"🎞️ Encoding job {job_uuid} with profile {profile_name}")
+            self.progress.stage(job_uuid, 'encoding')
+            exec_result = container.exec_run(command, stdout=True, stderr=True)
+
+            if job_uuid in self.cancelled:
+                return {'status': 'cancelled', 'error': 'Job was cancelled'}
+            if exec_result.exit_code == RENDER_TIMED_OUT:
+                return {
+                    'status': 'timed_out',
+                    'error': f"Encoding exceeded the {timeout}s time limit",
+                    'error_category': 'timeout'
+                }
+            if exec_result.exit_code != 0 or not staging.exists():
+                error_output = exec_result.output.decode('utf-8') if exec_result.output else "Unknown error"
+                raise Exception(f"Encoding with profile {profile_name} failed: {error_output}")
+
+            os.replace(staging, target)
+            if source != target and source.exists():
+                source.unlink()
+        except Exception as e:
+            return {'status': 'failed', 'error': str(e)}
+        finally:
+            if staging.exists():
+                staging.unlink()
+
+        seconds = time.time() - started
+        STAGE_SECONDS.observe(seconds, stage='encode')
+        file_size = target.stat().st_size
+        print(f"🎞️ Encoded job {job_uuid} ({profile_name}): {result.get('file_size', 0)} -> {file_size} bytes in {seconds:.1f}s")
+        return {
+            **result,
+            'video_path': str(target),
+            'file_size': file_size,
+            'encoding': {
+                'profile': profile_name,
+                'format': fmt,
+                'seconds': round(seconds, 3),
+                'rendered_bytes': result.get('file_size', 0),
+                'bytes': file_size
+            }
+        }
+
+    def _merge_segment_stats(self, stats):
+        stats = [s for s in stats if s]
+        if not stats:
+            return None
+        return {key: sum(s.get(key, 0) for s in stats) for key in stats[0]}
+
+    def _merge_profiles(self, profiles):
+        """One profile for a job rendered in parts; animations are tagged with their part"""
+        if not any(profiles):
+            return None
+        merged = {'totals': {}, 'tex': {}, 'animations': [], 'animations_truncated': False}
+        cprofile = {}
+        for part, profile in enumerate(profiles):
+            if not profile:
+                continue
+            for section in ('totals', 'tex'):
+                for key, value in (profile.get(section) or {}).items():
+                    merged[section][key] = round(merged[section].get(key, 0) + value, 4)
+            merged['animations'] += [{**animation, 'part': part} for animation in profile.get('animations') or []]
+            merged['animations_truncated'] |= bool(profile.get('animations_truncated'))
+            for row in profile.get('cprofile') or []:
+                entry = cprofile.setdefault(row['function'], {**row, 'calls': 0, 'tottime': 0.0, 'cumtime': 0.0})
+                for key in ('calls', 'tottime', 'cumtime'):
+                    entry[key] = round(entry[key] + row[key], 4)
+        if cprofile:
+            merged['cprofile'] = sorted(cprofile.values(), key=lambda row: row['cumtime'], reverse=True)[:25]
+        return merged
+
+    def _split_profile(self, output):
+        """(profile, remaining output) from the output of runtime/render_profile.py"""
+        text = output.decode('utf-8', 'replace') if output else ''
+        match = re.search(r'^PROFILE (\{.*\})$', text, re.MULTILINE)
+        if not match:
+            return None, output
+        try:
+            profile = json.loads(match.group(1))
+        except ValueError:
+            profile = None
+        return profile, (text[:match.start()] + text[match.end():]).encode('utf-8')
+
+    def _merge_tex_stats(self, stats):
+        merged = self._merge_segment_stats([
+            {key: s[key] for key in ('lookups', 'hits', 'compiled')} for s in stats if s
+        ])
+        if merged:
+            merged['hit_ratio'] = round(merged['hits'] / merged['lookups'], 3) if merged['lookups'] else None
+        return merged
+
+    def _run_code_in_persistent_container(self, job_uuid, code, config, container,
+                                          part=None, scene_class=None, extra_args=()):
         """
-        Execute Manim code in the persistent Docker container
+        Execute Manim code in the worker's persistent Docker container.
+
+        With part set, only scene_class is rendered (with any extra manim
+        arguments) into the job's part directory instead of the final output.
         """
+        run_id = job_uuid if part is None else f"{job_uuid}-part{part}"
+        output_file = self.output_path_for(job_uuid) if part is None else self.part_path_for(job_uuid, part)
+        segment_bucket = None
+        segment_dir = None
+        segment_hint = None
+        linked_segments = None
+        segment_stats = None
+        tex_dir = None
+        linked_tex = None
+        tex_stats = None
+        render_profile = None
         try:
-            if not self.container:
+            if job_uuid in self.cancelled:
+                return {'status': 'cancelled', 'error': 'Job was cancelled'}
+            if job_uuid in self._aborted_jobs:
+                return {'status': 'failed', 'error': 'Stopped after another part of the job failed', 'stopped': True}
+
+            if not container:
                 raise Exception("Persistent container not available")
             
-            # Check if container is still running
-            self.container.reload()
-            if self.container.status != 'running':
-                print("Container stopped, restarting...")
-                self._start_persistent_container()
+            # The worker replaces its container on the next health check
+            if not self.is_container_running(container):
+                raise Exception("Worker container is not running")
             
             # Clean and validate code
             cleaned_code = self._clean_code(code)
-            scene_class = self._extract_scene_class(cleaned_code)
+            scene_class = scene_class or self._extract_scene_class(cleaned_code)
             
             if not scene_class:
                 raise Exception("No Scene class found in the provided code")
             
             # Create job-specific temp file
-            python_file_path = self.temp_dir / f"{job_uuid}.py"
+            python_file_path = self.temp_dir / f"{run_id}.py"
             with open(python_file_path, 'w') as f:
                 f.write(cleaned_code)
             
@@ -165,70 +1064,161 @@ class ManimExecutor:
                 'high': '-qh'
             }
             quality_flag = quality_map.get(config.get('quality', 'medium'), '-qm')
+            profile_name, profile = self.encoding_profile(config)
+            profile = profile or {}
+            frame_rate = config.get('frame_rate') or profile.get('frame_rate')
+            output_args = ['--frame_rate', str(int(frame_rate))] if frame_rate else []
+            if profile.get('resolution'):
+                output_args += ['-r', ','.join(str(int(v)) for v in profile['resolution'])]
             
             # Container paths
-            container_python_file = f"/manim/temp/{job_uuid}.py"
-            container_output_file = f"/manim/output/{job_uuid}.mp4"
+            container_python_file = f"/manim/temp/{run_id}.py"
+            container_output_file = f"/manim/output/{output_file.relative_to(self.output_dir).as_posix()}"
+            output_file.parent.mkdir(parents=True, exist_ok=True)
+            
+            cfg_lines = []
+            profiling = self.profile_options(config)
+            # Reuse partial movies rendered by earlier jobs when the segment cache is on;
+            # a profiled render renders every animation so all of them get timed
+            if self.segment_cache.enabled and not profiling:
+                segment_bucket = SegmentCache.bucket_for(quality_flag) + (f"-{int(frame_rate)}fps" if frame_rate else '')
+                if profile.get('resolution'):
+                    segment_bucket += '-' + 'x'.join(str(int(v)) for v in profile['resolution'])
+                segment_dir = self.output_dir / 'partials' / run_id
+                # A retry of the job renders the same scene again: its segments are linked first
+                segment_hint = f"{job_uuid}/{scene_class}"
+                linked_segments = self.segment_cache.prepare(segment_bucket, segment_dir, hint=segment_hint)
+                cfg_lines += [f'partial_movie_dir = /manim/output/partials/{run_id}', 'max_files_cached = -1']
+
+            # Reuse TeX compiled by earlier jobs; latex cleanup stays off so lookups can be counted
+            if self.tex_cache.enabled:
+                tex_dir = self.output_dir / 'tex' / run_id
+                linked_tex = self.tex_cache.prepare(tex_dir)
+                cfg_lines += [f'tex_dir = /manim/output/tex/{run_id}', 'no_latex_cleanup = True']
+
+            cache_args = [] if linked_segments is not None else ['--disable_caching']
+            if cfg_lines:
+                config_file_path = self.temp_dir / f"{run_id}.cfg"
+                with open(config_file_path, 'w') as f:
+                    f.write('[CLI]\n')
+                    f.write(''.join(f'{line}\n' for line in cfg_lines))
+                cache_args += ['--config_file', f"/manim/temp/{run_id}.cfg"]
             
             # Build command for execution inside container
-            manim_cmd = [
-                'manim',
+            manim_args = [
                 container_python_file,
                 scene_class,
                 quality_flag,
-                '--disable_caching',
+                *output_args,
+                '--media_dir', self.media_dir_for(run_id),
+                *cache_args,
+                *extra_args,
                 '--output_file', container_output_file
             ]
             
-            cmd_string = ' '.join(manim_cmd)
-            print(f"Executing in container: {cmd_string}")
-            
-            # Execute command in persistent container
-            result = self.container.exec_run(
-                cmd_string,
-                stdout=True,
-                stderr=True
+            timeout = self.timeout_for(config)
+            # Progress and the first traceback are read from the output as it streams
+            monitor = OutputMonitor(
+                container_python_file,
+                on_progress=lambda m: self.progress.update(job_uuid, 0 if part is None else part, m)
             )
+            on_output = (lambda chunk: monitor.feed(chunk) and self.early_abort)
+            if profiling:
+                profile_args = ['--cprofile'] if profiling['cprofile'] else []
+                result, runner = self._exec_manim(
+                    container, [*profile_args, *manim_args], script='/manim/runtime/render_profile.py',
+                    timeout=timeout, on_output=on_output
+                )
+                render_profile, output = self._split_profile(result.output)
+            else:
+                result, runner = self._exec_manim(container, manim_args, timeout=timeout, on_output=on_output)
+                output = result.output
+            self.runner_counts[runner] += 1
+            if result.exit_code == RENDER_ABORTED:
+                # Free the worker now instead of waiting for manim to wind down
+                self.aborted_renders += 1
+                self._kill_render(container, container_python_file)
+                print(f"🛑 Aborted job {run_id} on {monitor.fatal['exception']}: {monitor.fatal['message']}")
+                if part is not None:
+                    # The job can't succeed any more: stop its other parts as well
+                    self._aborted_jobs.add(job_uuid)
+                    for other in list(self._containers.values()):
+                        self._kill_render(other, f"/manim/temp/{job_uuid}-part")
+            if render_profile:
+                totals = render_profile['totals']
+                print(
+                    f"⏱️ Profile for job {run_id}: {totals['seconds']}s, {totals['plays']} plays, {totals['frames']} frames "
+                    f"(updaters {totals['update_seconds']}s, frames {totals['frame_seconds']}s, "
+                    f"encoding {totals['encode_seconds']}s, TeX {totals['tex_seconds']}s)"
+                )
+
+            if linked_segments is not None:
+                segment_stats = self.segment_cache.collect(
+                    segment_bucket, segment_dir, linked_segments, success=result.exit_code == 0, hint=segment_hint
+                )
+                linked_segments = None
+                print(
+                    f"🎞️ Segment cache for job {run_id}: reused {segment_stats['segments_reused']}"
+                    f"/{segment_stats['segments_total']} segments ({segment_stats['bytes_reused']} bytes)"
+                )
+            if linked_tex is not None:
+                tex_stats = self.tex_cache.collect(tex_dir, linked_tex, success=result.exit_code == 0)
+                linked_tex = None
+                if tex_stats['lookups']:
+                    print(
+                        f"🧮 TeX cache for job {run_id}: {tex_stats['hits']}/{tex_stats['lookups']} "
+                        f"expressions cached, {tex_stats['compiled']} compiled"
+                    )
             
+            if job_uuid in self.cancelled:
+                return {'status': 'cancelled', 'error': 'Job was cancelled'}
+            if job_uuid in self._aborted_jobs and not monitor.fatal:
+                return {'status': 'failed', 'error': 'Stopped after another part of the job failed', 'stopped': True}
+            if result.exit_code == RENDER_TIMED_OUT:
+                return {
+                    'status': 'timed_out',
+                    'error': f"Render exceeded the {timeout}s time limit for {config.get('quality', 'medium')} quality",
+                    'error_category': 'timeout'
+                }
+            if result.exit_code == RENDER_KILLED:
+                return {
+                    'status': 'failed',
+                    'error': f"Render was killed, most likely for exceeding the {self.worker_memory_mb}MB memory limit",
+                    'error_category': 'resource_error'
+                }
+
             # Check execution result
             if result.exit_code == 0:
-                # Success - check if file was created
-                output_file = self.output_dir / f"{job_uuid}.mp4"
-                
-                if output_file.exists():
-                    file_size = output_file.stat().st_size
-                    print(f"VIDEO PATH = {output_file}")
-                    
-                    return {
-                        'status': 'success',
-                        'video_path': str(output_file),
-                        'file_size': file_size
-                    }
-                else:
-                    # Check for video in subdirectories (Manim's default structure)
-                    possible_paths = [
-                        self.output_dir / "videos" / f"{job_uuid}" / "1080p60" / f"{scene_class}.mp4",
-                        self.output_dir / "videos" / f"{job_uuid}" / "720p30" / f"{scene_class}.mp4",
-                        self.output_dir / "videos" / f"{job_uuid}" / "480p15" / f"{scene_class}.mp4"
-                    ]
-                    
-                    for path in possible_paths:
-                        if path.exists():
-                            # Move to expected location
-                            final_path = self.output_dir / f"{job_uuid}.mp4"
-                            shutil.move(str(path), str(final_path))
-                            file_size = final_path.stat().st_size
-                            print(f"VIDEO PATH = {final_path}")
-                            return {
-                                'status': 'success',
-                                'video_path': str(final_path),
-                                'file_size': file_size
-                            }
-                    
-                    raise Exception("Manim completed but no video file was found")
+                # --output_file pins the video's path, nothing to search for
+                discovery_started = time.time()
+                if not output_file.exists():
+                    raise Exception(f"Manim completed but did not write {container_output_file}")
+                file_size = output_file.stat().st_size
+                print(f"VIDEO PATH = {output_file}")
+                STAGE_SECONDS.observe(time.time() - discovery_started, stage='file_discovery')
+                return {
+                    'status': 'success',
+                    'video_path': str(output_file),
+                    'file_size': file_size,
+                    'segment_cache': segment_stats,
+                    'tex_cache': tex_stats,
+                    'runner': runner,
+                    'profile': render_profile
+                }
+            elif monitor.fatal:
+                # The traceback names the error and the scene line that raised it
+                line = monitor.fatal['line']
+                if line:
+                    line -= cleaned_code.count('\n') - code.replace('\\n', '\n').count('\n')
+                return {
+                    'status': 'failed',
+                    'error': f"Manim execution failed: {monitor.error_text()}",
+                    'error_category': monitor.fatal['category'],
+                    'error_line': line
+                }
             else:
                 # Execution failed
-                error_output = result.output.decode('utf-8') if result.output else "Unknown error"
+                error_output = output.decode('utf-8') if output else "Unknown error"
                 raise Exception(f"Manim execution failed: {error_output}")
                 
         except Exception as e:
@@ -240,6 +1230,124 @@ class ManimExecutor:
             # Clean up temporary Python file
             if 'python_file_path' in locals() and python_file_path.exists():
                 python_file_path.unlink()
+            if 'config_file_path' in locals() and config_file_path.exists():
+                config_file_path.unlink()
+            if container:
+                self._remove_media_dir(container, run_id)
+            if segment_dir is not None:
+                if linked_segments is not None:
+                    self.segment_cache.collect(segment_bucket, segment_dir, linked_segments, success=False, hint=segment_hint)
+                shutil.rmtree(segment_dir, ignore_errors=True)
+            if tex_dir is not None:
+                if linked_tex is not None:
+                    self.tex_cache.collect(tex_dir, linked_tex, success=False)
+                shutil.rmtree(tex_dir, ignore_errors=True)
+    
+    def _exec_manim(self, container, manim_args, script=None, timeout=None, on_output=None):
+        """
+        Run manim (or a helper script from runtime/) with the given arguments
+        in the worker's container, through the warm render daemon when it is
+        up. A run that passes timeout seconds is killed and exits with
+        RENDER_TIMED_OUT. With on_output the output is streamed to it chunk
+        by chunk (see _exec_stream). Returns (exec result, runner).
+        """
+        command = ['python', script] if script else ['manim']
+        if timeout:
+            command = ['timeout', '-k', '5', str(timeout), *command]
+        if self.render_daemon:
+            client_args = ['--timeout', str(timeout)] if timeout else []
+            client_args += ['--script', script] if script else []
+            cmd_string = ' '.join(['python', '/manim/runtime/render_client.py', *client_args, *manim_args])
+            print(f"Executing via render daemon: {cmd_string}")
+            if on_output:
+                result = self._exec_stream(container, cmd_string, on_output)
+            else:
+                result = container.exec_run(cmd_string, stdout=True, stderr=True)
+            if result.exit_code != DAEMON_UNAVAILABLE:
+                return result, 'daemon'
+
+            # Still importing manim right after start, or it died: restart it
+            # if it had plenty of time to come up, and run this job directly
+            started = self._daemon_started.get(container.id)
+            if started is None or time.time() - started > DAEMON_STARTUP_GRACE:
+                self.start_render_daemon(container)
+
+        cmd_string = ' '.join([*command, *manim_args])
+        print(f"Executing in container: {cmd_string}")
+        
+        # Execute command in persistent container
+        if on_output:
+            return self._exec_stream(container, cmd_string, on_output), 'exec'
+        result = container.exec_run(
+            cmd_string,
+            stdout=True,
+            stderr=True
+        )
+        return result, 'exec'
+
+    def _exec_stream(self, container, cmd, on_output):
+        """
+        exec_run that hands every chunk of output to on_output as it
+        arrives. When on_output returns True the exec is abandoned (the
+        caller kills what is left of it) and the result's exit code is
+        RENDER_ABORTED.
+        """
+        api = container.client.api
+        exec_id = api.exec_create(
+            container.id, cmd, stdout=True, stderr=True, environment={'PYTHONUNBUFFERED': '1'}
+        )['Id']
+        chunks = []
+        stream = api.exec_start(exec_id, stream=True)
+        try:
+            for chunk in stream:
+                chunks.append(chunk)
+                if on_output(chunk):
+                    return ExecResult(RENDER_ABORTED, b''.join(chunks))
+        finally:
+            if hasattr(stream, 'close'):
+                stream.close()
+
+        # The stream ends as the process exits; its exit code can lag a moment behind
+        for _ in range(50):
+            inspect = api.exec_inspect(exec_id)
+            if not inspect.get('Running') and inspect.get('ExitCode') is not None:
+                return ExecResult(inspect['ExitCode'], b''.join(chunks))
+            time.sleep(0.02)
+        return ExecResult(inspect.get('ExitCode') or 1, b''.join(chunks))
+
+    def _kill_render(self, container, container_python_file):
+        """Kill the processes of one render (matched by its scene file, see runtime/kill_job.py)"""
+        try:
+            container.exec_run(['python', '/manim/runtime/kill_job.py', container_python_file])
+        except Exception as e:
+            print(f"⚠️ Could not kill aborted render {container_python_file}: {e}")
+
+    def render_cache_key(self, code, config):
+        """
+        Content hash identifying a render for the result cache, or None while
+        the manim version is not known yet (such renders bypass the cache)
+        """
+        self.refresh_runtime()
+        if not self._manim_version:
+            return None
+        cleaned_code = self._clean_code(code)
+        config = config or {}
+        quality = config.get('quality', 'medium')
+        if config.get('frame_rate'):
+            quality = f"{quality}@{int(config['frame_rate'])}fps"
+        profile_name, _ = self.encoding_profile(config)
+        if profile_name:
+            quality = f"{quality}#{profile_name}"
+        profiling = self.profile_options(config)
+        if profiling:
+            # Profiled jobs only share renders (and results) with identically profiled ones
+            quality = f"{quality}+{'cprofile' if profiling['cprofile'] else 'profile'}"
+        return RenderResultCache.make_key(
+            cleaned_code,
+            self._extract_scene_class(cleaned_code),
+            quality,
+            self._manim_version
+        )
     
     def _clean_code(self, code):
         """Clean and validate Python code"""
@@ -252,40 +1360,39 @@ class ManimExecutor:
         
         return cleaned
     
+    def _extract_scene_classes(self, code):
+        """Every Scene subclass to render, in source order (see scene_classes)"""
+        return list(scene_classes(code))
+
     def _extract_scene_class(self, code):
-        """Extract the Scene class name from code"""
-        import re
-        
-        # Look for class that inherits from Scene
-        pattern = r'class\s+(\w+)\s*\(\s*Scene\s*\)'
-        match = re.search(pattern, code)
-        if match:
-            return match.group(1)
-        
-        # Fallback: look for any class
-        pattern = r'class\s+(\w+)'
-        match = re.search(pattern, code)
-        if match:
-            return match.group(1)
-        
-        return None
+        """The first Scene class to render (see scene_classes), or None"""
+        scenes = self._extract_scene_classes(code)
+        return scenes[0] if scenes else None
     
     def get_job_status(self, job_uuid):
         """Get job status"""
         if job_uuid in self.jobs:
             return self.jobs[job_uuid]
+        record = self.job_store.get(job_uuid) if self.job_store else None
+        if record:
+            return {'status': record['status'], **(record['result'] or {})}
         else:
             return {'status': 'not_found', 'error': 'Job not found'}
     
-    def stop_container(self):
-        """Stop the persistent container"""
-        if self.container:
+    def release_container(self, container):
+        """Leave a worker container running for the next process to adopt"""
+        if container:
+            self._daemon_started.pop(container.id, None)
+            self._containers.pop(container.id, None)
+            print(f"Persistent container {container.id[:12]} left running for adoption")
+
+    def stop_container(self, container):
+        """Stop a persistent worker container"""
+        if container:
+            self._daemon_started.pop(container.id, None)
+            self._containers.pop(container.id, None)
             try:
-                self.container.stop()
-                print("Persistent container stopped")
+                container.stop()
+                print(f"Persistent container {container.id[:12]} stopped")
             except Exception as e:
                 print(f"Error stopping container: {e}")
-    
-    def __del__(self):
-        """Cleanup when service shuts down"""
-        self.stop_container()
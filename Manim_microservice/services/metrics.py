@@ -0,0 +1,208 @@
+import threading
+
+# Seconds; covers everything from a preflight (milliseconds) to a long high-quality render
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + (list(extra.items()) if extra else [])
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        if not self.labelnames and self.kind != 'histogram':
+            self._values[()] = 0
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, None, value) for key, value in self._values.items()]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for name, key, extra, value in self.samples():
+            lines.append(f"{name}{_format_labels(self.labelnames, key, extra)} {_format_value(value)}")
+        return '\n'.join(lines)
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """A value that goes up and down, set directly or read from a callback at scrape time"""
+
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._function = None
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def get(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def set_function(self, function):
+        """function() returns a number (None while there is none), or {label values tuple: number} for labelled gauges"""
+        self._function = function
+
+    def samples(self):
+        if self._function is None:
+            return super().samples()
+        try:
+            value = self._function()
+        except Exception:
+            return []
+        if value is None:
+            return []
+        if isinstance(value, dict):
+            return [(self.name, tuple(str(v) for v in key), None, v) for key, v in value.items()]
+        return [(self.name, (), None, value)]
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=STAGE_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state['counts'][index] += 1
+                    break
+            state['sum'] += value
+            state['count'] += 1
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            for key, state in self._values.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets, state['counts']):
+                    cumulative += count
+                    samples.append((f"{self.name}_bucket", key, {'le': _format_value(bound)}, cumulative))
+                samples.append((f"{self.name}_sum", key, None, state['sum']))
+                samples.append((f"{self.name}_count", key, None, state['count']))
+        return samples
+
+
+class Registry:
+    """Metrics of this process, rendered in the Prometheus text exposition format"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        return '\n'.join(metric.render() for metric in self._metrics) + '\n'
+
+
+registry = Registry()
+
+STAGE_SECONDS = registry.register(Histogram(
+    'manim_job_stage_seconds',
+    'Duration of each job stage (queue_wait, preflight, dry_run, render, file_discovery, encode, upload, webhook)',
+    ['stage']
+))
+JOBS_TOTAL = registry.register(Counter(
+    'manim_jobs_total',
+    'Finished jobs by final status and error class',
+    ['status', 'error_class']
+))
+WEBHOOKS_TOTAL = registry.register(Counter(
+    'manim_webhook_deliveries_total',
+    'Completion webhook deliveries by outcome',
+    ['outcome']
+))
+ACTIVE_JOBS = registry.register(Gauge(
+    'manim_active_jobs',
+    'Jobs currently rendering or uploading on this node'
+))
+QUEUE_DEPTH = registry.register(Gauge(
+    'manim_queue_depth',
+    'Jobs waiting in the work queue'
+))
+WORKERS = registry.register(Gauge(
+    'manim_render_workers',
+    'Render workers by state',
+    ['state']
+))
+WORKER_UTILIZATION = registry.register(Gauge(
+    'manim_render_worker_utilization',
+    'Fraction of render workers busy with a job'
+))
+WEBHOOK_OUTBOX = registry.register(Gauge(
+    'manim_webhook_outbox_pending',
+    'Completion webhooks waiting in the outbox for (re)delivery'
+))
+DOWNSHIFTS_TOTAL = registry.register(Counter(
+    'manim_quality_downshifts_total',
+    'Jobs rendered below their requested quality or frame rate because of load, by rendered quality',
+    ['quality']
+))
+OUTPUT_DISK_BYTES = registry.register(Gauge(
+    'manim_output_disk_bytes',
+    'Bytes of render scratch space (output, media, temp) in use after the last GC pass'
+))
+TEX_CACHE_LOOKUPS = registry.register(Counter(
+    'manim_tex_cache_lookups_total',
+    'TeX expressions looked up in the shared TeX cache by renders, by result',
+    ['result']
+))
+PREDICTION_MAE = registry.register(Gauge(
+    'manim_render_prediction_mae_seconds',
+    'Mean absolute error of the predicted render durations over the recent window'
+))
+PREDICTION_MAPE = registry.register(Gauge(
+    'manim_render_prediction_mape',
+    'Mean absolute percentage error (as a fraction) of the predicted render durations over the recent window'
+))
@@ -0,0 +1,154 @@
+import os
+import ast
+import builtins
+
+from services.render_predictor import extract_features
+
+# Top-level modules generated scenes have no business importing
+FORBIDDEN_MODULES = {
+    'os', 'sys', 'subprocess', 'socket', 'shutil', 'pathlib', 'io', 'glob', 'tempfile',
+    'requests', 'urllib', 'urllib3', 'http', 'httpx', 'aiohttp', 'ftplib', 'smtplib', 'telnetlib', 'ssl',
+    'asyncio', 'ctypes', 'multiprocessing', 'threading', 'signal', 'pty', 'resource',
+    'importlib', 'pickle', 'marshal', 'shelve', 'builtins', 'webbrowser', 'code', 'runpy'
+}
+
+FORBIDDEN_CALLS = {'open', 'exec', 'eval', 'compile', '__import__', 'input', 'breakpoint', 'globals', 'locals'}
+
+FORBIDDEN_ATTRIBUTES = {
+    '__subclasses__', '__globals__', '__builtins__', '__code__', '__bases__', '__mro__',
+    '__getattribute__', '__reduce__', '__reduce_ex__', '__loader__', '__spec__'
+}
+
+# Mobjects that load a file when given a path, and numpy's file I/O
+FILE_MOBJECTS = {'SVGMobject', 'ImageMobject'}
+NUMPY_FILE_FUNCTIONS = {'load', 'save', 'savez', 'savez_compressed', 'loadtxt', 'savetxt', 'genfromtxt', 'fromfile', 'tofile', 'memmap'}
+
+
+def _forbidden_modules():
+    extra = os.getenv('PREFLIGHT_FORBIDDEN_MODULES', '')
+    return FORBIDDEN_MODULES | {name.strip() for name in extra.split(',') if name.strip()}
+
+
+def _issue(kind, message, node=None, line_offset=0):
+    line = getattr(node, 'lineno', None)
+    return {
+        'type': kind,
+        'message': message,
+        'line': line - line_offset if line is not None else None,
+        'col': getattr(node, 'col_offset', None)
+    }
+
+
+def _bound_names(tree):
+    """Every name the code binds anywhere (scopes are not told apart)"""
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and isinstance(node.ctx, (ast.Store, ast.Del)):
+            names.add(node.id)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(node.name)
+        elif isinstance(node, ast.arg):
+            names.add(node.arg)
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            for alias in node.names:
+                names.add(alias.asname or alias.name.split('.')[0])
+        elif isinstance(node, (ast.Global, ast.Nonlocal)):
+            names.update(node.names)
+        elif isinstance(node, ast.ExceptHandler) and node.name:
+            names.add(node.name)
+        elif type(node).__name__ in ('MatchAs', 'MatchStar') and getattr(node, 'name', None):
+            names.add(node.name)
+        elif type(node).__name__ == 'MatchMapping' and getattr(node, 'rest', None):
+            names.add(node.rest)
+    return names
+
+
+def preflight(code, manim_names=None, line_offset=0):
+    """
+    Static checks on (cleaned) scene code before it is queued.
+
+    Returns {'ok', 'errors', 'warnings', 'hints'}; every issue carries a
+    type, message and line. manim_names is the namespace `from manim import *`
+    provides; without it undefined names can't be checked and are skipped.
+    line_offset is subtracted from reported lines (for prepended imports).
+    """
+    errors = []
+    warnings = []
+
+    try:
+        tree = ast.parse(code)
+    except SyntaxError as e:
+        errors.append({
+            'type': 'syntax_error',
+            'message': f"{e.msg}: {(e.text or '').strip()}" if e.text else e.msg,
+            'line': e.lineno - line_offset if e.lineno else None,
+            'col': e.offset
+        })
+        return {'ok': False, 'errors': errors, 'warnings': warnings, 'hints': {}}
+
+    forbidden_modules = _forbidden_modules()
+    star_modules = set()
+
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                if alias.name.split('.')[0] in forbidden_modules:
+                    errors.append(_issue('forbidden_import', f"Importing {alias.name} is not allowed", node, line_offset))
+        elif isinstance(node, ast.ImportFrom):
+            module = (node.module or '').split('.')[0]
+            if node.level == 0 and module in forbidden_modules:
+                errors.append(_issue('forbidden_import', f"Importing from {node.module} is not allowed", node, line_offset))
+            if any(alias.name == '*' for alias in node.names):
+                star_modules.add(module)
+        elif isinstance(node, ast.Attribute) and node.attr in FORBIDDEN_ATTRIBUTES:
+            errors.append(_issue('forbidden_attribute', f"Accessing {node.attr} is not allowed", node, line_offset))
+        elif isinstance(node, ast.Call):
+            func = node.func
+            if isinstance(func, ast.Name) and func.id in FORBIDDEN_CALLS:
+                errors.append(_issue('forbidden_call', f"Calling {func.id}() is not allowed", node, line_offset))
+            elif isinstance(func, ast.Name) and func.id in FILE_MOBJECTS and node.args and \
+                    isinstance(node.args[0], ast.Constant) and isinstance(node.args[0].value, str):
+                errors.append(_issue(
+                    'file_access',
+                    f"{func.id}({node.args[0].value!r}) reads a file, which is not available to renders",
+                    node, line_offset
+                ))
+            elif isinstance(func, ast.Attribute) and func.attr in NUMPY_FILE_FUNCTIONS and \
+                    isinstance(func.value, ast.Name) and func.value.id in ('np', 'numpy'):
+                errors.append(_issue('file_access', f"{func.value.id}.{func.attr}() accesses files", node, line_offset))
+
+    # Names have to come from the code itself, builtins or manim. Any other
+    # star import makes the namespace unknowable, so the check is skipped.
+    if manim_names is not None and star_modules <= {'manim'}:
+        known = _bound_names(tree) | set(dir(builtins))
+        if 'manim' in star_modules:
+            known |= set(manim_names)
+        reported = set()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load) and \
+                    node.id not in known and node.id not in reported:
+                reported.add(node.id)
+                errors.append(_issue('undefined_name', f"Name '{node.id}' is not defined", node, line_offset))
+
+    features = extract_features(code, tree=tree)
+    hints = {
+        'play_count': features['play_count'],
+        'tex_count': features['tex_count'],
+        'estimated_video_seconds': round(features['run_time_seconds'] + features['wait_seconds'], 2)
+    }
+    if features['play_count'] == 0 and features['wait_seconds'] == 0:
+        warnings.append({'type': 'no_animations', 'message': 'The scene never calls play() or wait()', 'line': None, 'col': None})
+
+    errors.sort(key=lambda issue: issue['line'] or 0)
+    return {'ok': not errors, 'errors': errors, 'warnings': warnings, 'hints': hints}
+
+
+def format_errors(errors, limit=5):
+    """One human (and LLM) readable message for a list of issues"""
+    lines = [
+        f"Line {issue['line']}: {issue['message']}" if issue.get('line') else issue['message']
+        for issue in errors[:limit]
+    ]
+    if len(errors) > limit:
+        lines.append(f"... and {len(errors) - limit} more")
+    return '\n'.join(lines)
@@ -0,0 +1,273 @@
+import os
+import re
+import ast
+import json
+import time
+import sqlite3
+import threading
+from pathlib import Path
+from collections import deque
+
+TEX_CLASSES = {'MathTex', 'Tex', 'SingleStringMathTex', 'BulletedList', 'Title', 'DecimalNumber', 'Integer'}
+
+# Starting weights per quality for [intercept, play() calls, animated seconds, TeX objects]
+PRIOR_WEIGHTS = {
+    'low': [8.0, 0.3, 0.5, 1.5],
+    'medium': [10.0, 0.5, 1.5, 1.5],
+    'high': [15.0, 1.0, 4.0, 1.5]
+}
+
+
+def _number(node, default):
+    try:
+        value = ast.literal_eval(node)
+        return float(value) if isinstance(value, (int, float)) else default
+    except (ValueError, SyntaxError, TypeError):
+        return default
+
+
+def extract_features(code, config=None, tree=None):
+    """
+    Static features of a scene that drive render time: play() calls, the
+    seconds of animation they add up to (run_time and wait() values) and
+    the number of TeX objects that need a LaTeX compile. tree is the code
+    already parsed, if the caller has it.
+    """
+    config = config or {}
+    features = {
+        'quality': config.get('quality', 'medium'),
+        'play_count': 0,
+        'wait_seconds': 0.0,
+        'run_time_seconds': 0.0,
+        'tex_count': 0
+    }
+
+    try:
+        tree = tree or ast.parse((code or '').replace('\\n', '\n'))
+    except SyntaxError:
+        # Fall back to counting call sites textually
+        features['play_count'] = len(re.findall(r'\.play\s*\(', code or ''))
+        features['run_time_seconds'] = float(features['play_count'])
+        features['wait_seconds'] = float(len(re.findall(r'\.wait\s*\(', code or '')))
+        features['tex_count'] = len(re.findall(r'\b(?:MathTex|Tex)\s*\(', code or ''))
+        return features
+
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Call):
+            continue
+        func = node.func
+        name = func.attr if isinstance(func, ast.Attribute) else func.id if isinstance(func, ast.Name) else None
+
+        if name == 'play' and isinstance(func, ast.Attribute):
+            features['play_count'] += 1
+            run_time = next((kw.value for kw in node.keywords if kw.arg == 'run_time'), None)
+            features['run_time_seconds'] += _number(run_time, 1.0) if run_time is not None else 1.0
+        elif name == 'wait' and isinstance(func, ast.Attribute):
+            duration = node.args[0] if node.args else next(
+                (kw.value for kw in node.keywords if kw.arg == 'duration'), None
+            )
+            features['wait_seconds'] += _number(duration, 1.0) if duration is not None else 1.0
+        elif name in TEX_CLASSES:
+            features['tex_count'] += 1
+
+    return features
+
+
+def _vector(features):
+    return [
+        1.0,
+        float(features['play_count']),
+        features['run_time_seconds'] + features['wait_seconds'],
+        float(features['tex_count'])
+    ]
+
+
+class _RecursiveLeastSquares:
+    """
+    Online linear regression with exponential forgetting.
+
+    Forgetting inflates the covariance of features that rarely vary (most
+    jobs have no TeX), which would let one sample move their weight without
+    bound; every variance is therefore capped at max_variance. Residuals
+    beyond huber times the running residual scale are clipped, so one
+    outlier render nudges the model instead of rewriting it.
+    """
+
+    def __init__(self, weights, forgetting=0.995, prior_variance=100.0, max_variance=None, huber=3.0,
+                 residual_scale=10.0):
+        self.weights = list(weights)
+        self.forgetting = forgetting
+        self.max_variance = max_variance or prior_variance
+        self.huber = huber
+        self.residual_scale = residual_scale  # running mean absolute residual, seconds
+        size = len(weights)
+        self.p = [[prior_variance if i == j else 0.0 for j in range(size)] for i in range(size)]
+
+    def predict(self, x):
+        return sum(w * xi for w, xi in zip(self.weights, x))
+
+    def update(self, x, y):
+        size = len(x)
+        px = [sum(self.p[i][j] * x[j] for j in range(size)) for i in range(size)]
+        denominator = self.forgetting + sum(x[i] * px[i] for i in range(size))
+        gain = [v / denominator for v in px]
+        error = y - self.predict(x)
+        limit = self.huber * self.residual_scale
+        clipped = max(-limit, min(limit, error))
+        # The scale may grow, but only by a bounded step per sample
+        self.residual_scale = 0.98 * self.residual_scale + 0.02 * min(abs(error), 2 * limit)
+        self.weights = [w + g * clipped for w, g in zip(self.weights, gain)]
+        self.p = [
+            [(self.p[i][j] - gain[i] * px[j]) / self.forgetting for j in range(size)]
+            for i in range(size)
+        ]
+        # Scale row and column i by the same factor: P stays symmetric positive definite
+        scale = [min(1.0, (self.max_variance / self.p[i][i]) ** 0.5) if self.p[i][i] > 0 else 1.0
+                 for i in range(size)]
+        self.p = [[self.p[i][j] * scale[i] * scale[j] for j in range(size)] for i in range(size)]
+
+
+class RenderPredictor:
+    """
+    Predicts how long a job will occupy a render worker.
+
+    Every finished render is recorded with its per-stage durations and code
+    features in a small SQLite database; a per-quality online linear model
+    is updated from each sample (and rebuilt from the recorded history at
+    startup). Prediction error over recent jobs is tracked for /health and
+    /metrics.
+    """
+
+    def __init__(self, path=None, history=None, max_samples=None):
+        self.path = Path(path or os.getenv('RENDER_STATS_PATH', 'data/render_stats.db'))
+        self.history = history or int(os.getenv('RENDER_PREDICTOR_HISTORY', '5000'))
+        self.max_samples = max_samples or int(os.getenv('RENDER_STATS_MAX_SAMPLES', '50000'))
+
+        self._models = {quality: _RecursiveLeastSquares(weights) for quality, weights in PRIOR_WEIGHTS.items()}
+        self._errors = deque(maxlen=200)  # (predicted, actual) of recent jobs
+        self._lock = threading.Lock()
+        self.samples = 0
+        self._last_id = 0  # newest sample the models have seen
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        with self._lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS render_samples (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    job_uuid TEXT NOT NULL,
+                    quality TEXT NOT NULL,
+                    features TEXT NOT NULL,
+                    stages TEXT NOT NULL,
+                    predicted_seconds REAL,
+                    render_seconds REAL NOT NULL,
+                    success INTEGER NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            ''')
+        self._replay()
+
+    def _replay(self):
+        """Rebuild the models from recorded history"""
+        with self._lock:
+            rows = self._conn.execute(
+                '''SELECT id, features, render_seconds FROM (
+                       SELECT id, features, render_seconds FROM render_samples
+                       WHERE success = 1 AND id > ? ORDER BY id DESC LIMIT ?
+                   ) ORDER BY id''',
+                (self._last_id, self.history)
+            ).fetchall()
+            for sample_id, features, render_seconds in rows:
+                self._train(json.loads(features), render_seconds)
+                self._last_id = sample_id
+
+    def start_following(self, interval=None):
+        """
+        Keep learning from the samples another process records (the render
+        process of SERVICE_ROLE=worker), for processes that only predict.
+        """
+        interval = interval or float(os.getenv('RENDER_PREDICTOR_FOLLOW_SECONDS', '30'))
+
+        def follow_loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    self._replay()
+                except Exception as e:
+                    print(f"⚠️ Could not read new render samples: {e}")
+
+        threading.Thread(target=follow_loop, daemon=True, name="render-predictor-follow").start()
+
+    def _model(self, quality):
+        return self._models.get(quality) or self._models['medium']
+
+    def _train(self, features, render_seconds):
+        self._model(features['quality']).update(_vector(features), render_seconds)
+        self.samples += 1
+
+    def predict(self, code, config=None):
+        """Expected render seconds for a job"""
+        features = extract_features(code, config)
+        with self._lock:
+            predicted = self._model(features['quality']).predict(_vector(features))
+        return max(1.0, predicted)
+
+    def predict_job(self, job_data):
+        if job_data.get('predicted_render_seconds') is not None:
+            return job_data['predicted_render_seconds']
+        return self.predict(job_data.get('code'), job_data.get('config'))
+
+    def record(self, job_data, stages, success):
+        """
+        Store a finished job's stage durations (seconds per stage, with the
+        worker-occupying 'render' stage required) and learn from it.
+        """
+        render_seconds = stages.get('render')
+        if render_seconds is None:
+            return
+
+        features = extract_features(job_data.get('code'), job_data.get('config'))
+        predicted = job_data.get('predicted_render_seconds')
+
+        with self._lock:
+            if success:
+                self._train(features, render_seconds)
+                if predicted is not None:
+                    self._errors.append((predicted, render_seconds))
+
+            with self._conn:
+                cursor = self._conn.execute(
+                    '''INSERT INTO render_samples
+                       (job_uuid, quality, features, stages, predicted_seconds, render_seconds, success, created_at)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
+                    (job_data.get('job_uuid'), features['quality'], json.dumps(features), json.dumps(stages),
+                     predicted, render_seconds, 1 if success else 0, time.time())
+                )
+                if cursor.lastrowid % 1000 == 0:
+                    self._conn.execute(
+                        'DELETE FROM render_samples WHERE id <= ?', (cursor.lastrowid - self.max_samples,)
+                    )
+
+    def error_stats(self):
+        with self._lock:
+            errors = list(self._errors)
+        if not errors:
+            return {'mae_seconds': None, 'mape': None, 'window': 0}
+
+        absolute = [abs(predicted - actual) for predicted, actual in errors]
+        relative = [abs(predicted - actual) / actual for predicted, actual in errors if actual > 0]
+        return {
+            'mae_seconds': round(sum(absolute) / len(absolute), 2),
+            'mape': round(sum(relative) / len(relative), 3) if relative else None,
+            'window': len(errors)
+        }
+
+    def stats(self):
+        with self._lock:
+            weights = {quality: [round(w, 3) for w in model.weights] for quality, model in self._models.items()}
+        return {
+            'samples': self.samples,
+            'weights': weights,
+            **self.error_stats()
+        }
@@ -0,0 +1,151 @@
+import os
+import time
+import sqlite3
+import threading
+from pathlib import Path
+
+# sort -> (filter, order) for slowest()
+SORT_KEYS = {
+    'total': ('1', 'seconds DESC'),
+    'per_play': ('plays > 0', 'seconds / plays DESC'),
+    'per_frame': ('frames > 0', 'seconds / frames DESC')
+}
+
+
+class RenderProfileStore:
+    """
+    Aggregates the profiles of profiled renders (config.profile) by
+    construct: every play() call is charged to each animation type in it
+    ('Create', 'ValueTracker.animate', ...) and to the kinds of updaters
+    ('always_redraw', 'updater') that were running, so the constructs that
+    dominate render time across generated code can be listed.
+    """
+
+    def __init__(self, path=None):
+        self.path = Path(path or os.getenv('RENDER_PROFILES_PATH', 'data/render_profiles.db'))
+        self._lock = threading.Lock()
+        self.profiles = 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        with self._lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS construct_stats (
+                    construct TEXT PRIMARY KEY,
+                    jobs INTEGER NOT NULL DEFAULT 0,
+                    plays INTEGER NOT NULL DEFAULT 0,
+                    frames INTEGER NOT NULL DEFAULT 0,
+                    seconds REAL NOT NULL DEFAULT 0,
+                    update_seconds REAL NOT NULL DEFAULT 0,
+                    frame_seconds REAL NOT NULL DEFAULT 0,
+                    encode_seconds REAL NOT NULL DEFAULT 0,
+                    max_seconds REAL NOT NULL DEFAULT 0,
+                    slowest_job TEXT,
+                    slowest_line INTEGER,
+                    updated_at REAL NOT NULL
+                )
+            ''')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS profiled_jobs (
+                    job_uuid TEXT PRIMARY KEY,
+                    seconds REAL NOT NULL,
+                    frames INTEGER NOT NULL,
+                    tex_seconds REAL NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            ''')
+            self.profiles = self._conn.execute('SELECT COUNT(*) FROM profiled_jobs').fetchone()[0]
+
+    def record(self, job_uuid, profile):
+        """Add one job's profile (as returned by runtime/render_profile.py) to the aggregates"""
+        totals = {}
+        for animation in profile.get('animations') or []:
+            for construct in set(animation.get('constructs') or ()):
+                entry = totals.setdefault(construct, {
+                    'plays': 0, 'frames': 0, 'seconds': 0.0, 'update_seconds': 0.0,
+                    'frame_seconds': 0.0, 'encode_seconds': 0.0, 'max_seconds': 0.0, 'max_line': None
+                })
+                entry['plays'] += 1
+                entry['frames'] += animation.get('frames') or 0
+                for key in ('seconds', 'update_seconds', 'frame_seconds', 'encode_seconds'):
+                    entry[key] += animation.get(key) or 0.0
+                if (animation.get('seconds') or 0.0) > entry['max_seconds']:
+                    entry['max_seconds'] = animation['seconds']
+                    entry['max_line'] = animation.get('line')
+        tex = profile.get('tex') or {}
+        if tex.get('expressions'):
+            totals['TeX'] = {
+                'plays': tex['expressions'], 'frames': 0, 'seconds': tex.get('seconds') or 0.0,
+                'update_seconds': 0.0, 'frame_seconds': 0.0, 'encode_seconds': 0.0,
+                'max_seconds': tex.get('seconds') or 0.0, 'max_line': None
+            }
+
+        now = time.time()
+        job_totals = profile.get('totals') or {}
+        with self._lock, self._conn:
+            inserted = self._conn.execute(
+                'INSERT OR IGNORE INTO profiled_jobs (job_uuid, seconds, frames, tex_seconds, created_at) VALUES (?, ?, ?, ?, ?)',
+                (job_uuid, job_totals.get('seconds') or 0.0, job_totals.get('frames') or 0,
+                 job_totals.get('tex_seconds') or 0.0, now)
+            ).rowcount
+            if not inserted:
+                return  # already counted (a redelivered job)
+            for construct, entry in totals.items():
+                self._conn.execute(
+                    '''INSERT INTO construct_stats
+                       (construct, jobs, plays, frames, seconds, update_seconds, frame_seconds, encode_seconds,
+                        max_seconds, slowest_job, slowest_line, updated_at)
+                       VALUES (?, 1, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                       ON CONFLICT(construct) DO UPDATE SET
+                           jobs = jobs + 1,
+                           plays = plays + excluded.plays,
+                           frames = frames + excluded.frames,
+                           seconds = seconds + excluded.seconds,
+                           update_seconds = update_seconds + excluded.update_seconds,
+                           frame_seconds = frame_seconds + excluded.frame_seconds,
+                           encode_seconds = encode_seconds + excluded.encode_seconds,
+                           slowest_job = CASE WHEN excluded.max_seconds > max_seconds
+                                              THEN excluded.slowest_job ELSE slowest_job END,
+                           slowest_line = CASE WHEN excluded.max_seconds > max_seconds
+                                               THEN excluded.slowest_line ELSE slowest_line END,
+                           max_seconds = MAX(max_seconds, excluded.max_seconds),
+                           updated_at = excluded.updated_at''',
+                    (construct, entry['plays'], entry['frames'], entry['seconds'], entry['update_seconds'],
+                     entry['frame_seconds'], entry['encode_seconds'], entry['max_seconds'], job_uuid,
+                     entry['max_line'], now)
+                )
+            self.profiles += 1
+
+    def slowest(self, limit=20, sort='total'):
+        """The constructs that cost the most render time, by total, per play() call or per frame"""
+        where, order = SORT_KEYS.get(sort, SORT_KEYS['total'])
+        with self._lock:
+            rows = self._conn.execute(
+                f'''SELECT construct, jobs, plays, frames, seconds, update_seconds, frame_seconds,
+                           encode_seconds, max_seconds, slowest_job, slowest_line
+                    FROM construct_stats WHERE {where} ORDER BY {order} LIMIT ?''',
+                (limit,)
+            ).fetchall()
+
+        constructs = []
+        for (construct, jobs, plays, frames, seconds, update_seconds, frame_seconds,
+             encode_seconds, max_seconds, slowest_job, slowest_line) in rows:
+            constructs.append({
+                'construct': construct,
+                'jobs': jobs,
+                'plays': plays,
+                'seconds': round(seconds, 3),
+                'seconds_per_play': round(seconds / plays, 4) if plays else None,
+                'ms_per_frame': round(seconds / frames * 1000, 2) if frames else None,
+                'update_share': round(update_seconds / seconds, 3) if seconds else None,
+                'frame_share': round(frame_seconds / seconds, 3) if seconds else None,
+                'encode_share': round(encode_seconds / seconds, 3) if seconds else None,
+                'slowest': {'seconds': round(max_seconds, 3), 'job_uuid': slowest_job, 'line': slowest_line}
+            })
+        return constructs
+
+    def stats(self):
+        with self._lock:
+            constructs = self._conn.execute('SELECT COUNT(*) FROM construct_stats').fetchone()[0]
+        return {'profiled_jobs': self.profiles, 'constructs': constructs}
@@ -0,0 +1,271 @@
+import os
+import re
+import time
+import threading
+
+import requests
+
+PROGRESS_PATH = '/webhooks/job-progress'
+
+ANSI_RE = re.compile(r'\x1b\[[0-9;?]*[A-Za-z]')
+# tqdm bar of one play(): "Animation 3: Create(Circle):  45%|████▌     | 27/60 [00:00<00:00, 80.1it/s]"
+BAR_RE = re.compile(r'Animation (\d+)\s*:\s*(.*?):\s+(\d+)%\|[^|]*\|\s*(\d+)/(\d+)')
+CACHED_RE = re.compile(r'Animation (\d+)\s*:\s*Using cached data')
+TRACEBACK_RE = re.compile(r'Traceback \(most recent call last\)')
+# Last line of a traceback, plain or after rich's box: "ValueError: ..."
+EXCEPTION_RE = re.compile(r'^([A-Za-z_][\w.]*(?:Error|Exception|Exit|Interrupt))(?::\s*(.*))?$')
+# Frames in the scene file: 'File "/manim/temp/x.py", line 12' (plain) or "/manim/temp/x.py:12 in construct" (rich)
+FRAME_RES = (
+    re.compile(r'File "(/manim/temp/[^"]+\.py)", line (\d+)'),
+    re.compile(r'(/manim/temp/\S+\.py):(\d+)')
+)
+
+# Exception name -> error category (the categories of runtime/dry_run.py)
+CATEGORIES = {
+    'SyntaxError': 'syntax_error', 'IndentationError': 'syntax_error',
+    'LaTeXError': 'latex_error',
+    'ImportError': 'import_error', 'ModuleNotFoundError': 'import_error',
+    'NameError': 'name_error', 'UnboundLocalError': 'name_error',
+    'AttributeError': 'attribute_error',
+    'TypeError': 'type_error',
+    'ValueError': 'value_error', 'IndexError': 'value_error', 'KeyError': 'value_error',
+    'ZeroDivisionError': 'value_error', 'ArithmeticError': 'value_error', 'OverflowError': 'value_error',
+    'MemoryError': 'resource_error', 'RecursionError': 'resource_error'
+}
+
+
+class OutputMonitor:
+    """
+    Parses manim's output while it streams out of a render: the progress
+    bar of the current play() call, and the first traceback, which is
+    fatal: once its exception line is in, feed() returns True and the
+    render can be killed instead of waiting for manim to wind down.
+    """
+
+    def __init__(self, scene_file=None, on_progress=None):
+        self.scene_file = scene_file
+        self.on_progress = on_progress
+        self.pending = ''
+        self.animation = None
+        self.description = None
+        self.percent = 0
+        self.animations_done = 0
+        self.traceback = None  # lines since "Traceback (most recent call last)"
+        self.fatal = None  # {'exception', 'message', 'category', 'line'} once the traceback is complete
+
+    def feed(self, chunk):
+        """Parse a chunk of output; True once a fatal error was seen"""
+        if self.fatal:
+            return True
+        text = self.pending + ANSI_RE.sub('', chunk.decode('utf-8', 'replace'))
+        lines = re.split(r'[\r\n]', text)
+        self.pending = lines.pop()
+        for line in lines:
+            self._line(line)
+            if self.fatal:
+                return True
+        # A progress bar is redrawn after a \r and stays unterminated until the next redraw
+        self._progress(self.pending)
+        return False
+
+    def _line(self, line):
+        if self.traceback is not None:
+            self.traceback.append(line)
+            match = EXCEPTION_RE.match(line)
+            if match:
+                self.fatal = self._describe(match.group(1), match.group(2) or '')
+            return
+        match = TRACEBACK_RE.search(line)
+        if match:
+            # Drop an unterminated progress bar in front of it (rich draws the traceback in a box)
+            box = line.rfind('╭', 0, match.start())
+            self.traceback = [line[box if box != -1 else match.start():]]
+            return
+        self._progress(line)
+
+    def _progress(self, line):
+        match = BAR_RE.search(line)
+        cached = None if match else CACHED_RE.search(line)
+        if not match and not cached:
+            return
+        animation = int((match or cached).group(1))
+        if self.animation is not None and animation != self.animation:
+            self.animations_done += 1
+        if cached:
+            description, percent = 'cached', 100
+        else:
+            description, percent = match.group(2).strip(), int(match.group(3))
+        if (animation, description, percent) == (self.animation, self.description, self.percent):
+            return
+        self.animation, self.description, self.percent = animation, description, percent
+        if self.on_progress:
+            self.on_progress(self)
+
+    def _describe(self, exception, message):
+        name = exception.rsplit('.', 1)[-1]
+        line = None
+        for text in self.traceback:
+            for frame_re in FRAME_RES:
+                for path, number in frame_re.findall(text):
+                    if self.scene_file is None or path == self.scene_file:
+                        line = int(number)
+        category = CATEGORIES.get(name, 'runtime_error')
+        if 'latex' in message.lower():
+            category = 'latex_error'
+        return {'exception': name, 'message': message.strip(), 'category': category, 'line': line}
+
+    def error_text(self):
+        """The traceback as manim printed it"""
+        return '\n'.join(line for line in (self.traceback or []) if line.strip())
+
+
+class ProgressReporter:
+    """
+    Live progress of rendering jobs. Every part of a job (scene or
+    animation range) reports the play() call it is on; the combined
+    snapshot is written to the job store at most every
+    PROGRESS_INTERVAL_SECONDS, where GET /render/<job_uuid>/events picks it
+    up, and with PROGRESS_WEBHOOKS it is POSTed to the backend's progress
+    webhook at most every PROGRESS_WEBHOOK_INTERVAL_SECONDS. Progress is
+    best effort: a lost update is superseded by the next one.
+    """
+
+    def __init__(self, job_store=None, backend_url=None, api_key=None):
+        self.job_store = job_store
+        self.interval = float(os.getenv('PROGRESS_INTERVAL_SECONDS', '0.5'))
+        self.webhooks = os.getenv('PROGRESS_WEBHOOKS', 'false').lower() == 'true'
+        self.webhook_interval = float(os.getenv('PROGRESS_WEBHOOK_INTERVAL_SECONDS', '5'))
+        self.backend_url = (backend_url or os.getenv('BACKEND_URL', 'http://localhost:5000')).rstrip('/')
+        self.api_key = api_key or os.getenv('WEBHOOK_API_KEY')
+
+        self._lock = threading.Lock()
+        self._jobs = {}  # job_uuid -> {'parts', 'stage', 'totals', 'written_at', 'sent_at'}
+        self._outbox = {}  # job_uuid -> latest snapshot waiting for the webhook thread
+        self._wake = threading.Event()
+        self.webhooks_sent = 0
+        self.webhooks_failed = 0
+        if self.webhooks:
+            self.session = requests.Session()
+            self.session.headers.update({'Content-Type': 'application/json', 'X-Webhook-Key': self.api_key or ''})
+            threading.Thread(target=self._send_loop, daemon=True, name='progress-webhooks').start()
+
+    def start(self, job_uuid):
+        with self._lock:
+            self._jobs[job_uuid] = {'parts': {}, 'stage': 'starting', 'totals': {}, 'written_at': 0, 'sent_at': 0}
+
+    def set_totals(self, job_uuid, totals):
+        """Animations per part key, once the dry run has counted them"""
+        with self._lock:
+            job = self._jobs.get(job_uuid)
+            if job is not None:
+                job['totals'].update(totals)
+
+    def stage(self, job_uuid, stage):
+        """'dry_run', 'rendering', 'encoding', ...; always published"""
+        with self._lock:
+            job = self._jobs.get(job_uuid)
+            if job is None:
+                return
+            job['stage'] = stage
+        self._publish(job_uuid, force=True)
+
+    def update(self, job_uuid, part, monitor):
+        """Progress of one part from its OutputMonitor"""
+        with self._lock:
+            job = self._jobs.get(job_uuid)
+            if job is None:
+                return
+            job['stage'] = 'rendering'
+            job['parts'][part] = {
+                'animation': monitor.animation,
+                'description': monitor.description,
+                'percent': monitor.percent,
+                'done': monitor.animations_done
+            }
+        self._publish(job_uuid)
+
+    def finish(self, job_uuid):
+        with self._lock:
+            self._jobs.pop(job_uuid, None)
+            self._outbox.pop(job_uuid, None)
+
+    def snapshot(self, job_uuid):
+        with self._lock:
+            job = self._jobs.get(job_uuid)
+            if job is None:
+                return None
+            parts = job['parts']
+            snapshot = {'stage': job['stage'], 'updated_at': round(time.time(), 3)}
+            if parts:
+                current = max(parts.values(), key=lambda p: p['animation'] or 0)
+                snapshot.update(
+                    animation=current['animation'], description=current['description'], percent=current['percent'],
+                    animations_done=sum(p['done'] for p in parts.values())
+                )
+                if len(parts) > 1:
+                    snapshot['parts'] = {str(key): {k: p[k] for k in ('animation', 'description', 'percent')}
+                                         for key, p in sorted(parts.items())}
+            totals = job['totals']
+            if totals and all(key in totals for key in parts):
+                total = sum(totals.values())
+                done = sum(p['done'] + p['percent'] / 100 for p in parts.values())
+                snapshot['animations_total'] = total
+                snapshot['job_percent'] = round(min(100.0, 100 * done / total), 1) if total else None
+            return snapshot
+
+    def _publish(self, job_uuid, force=False):
+        now = time.time()
+        with self._lock:
+            job = self._jobs.get(job_uuid)
+            if job is None:
+                return
+            write = force or now - job['written_at'] >= self.interval
+            send = self.webhooks and (force or now - job['sent_at'] >= self.webhook_interval)
+            if write:
+                job['written_at'] = now
+            if send:
+                job['sent_at'] = now
+        if not write and not send:
+            return
+        snapshot = self.snapshot(job_uuid)
+        if snapshot is None:
+            return
+        if write and self.job_store is not None:
+            try:
+                self.job_store.set_progress(job_uuid, snapshot)
+            except Exception as e:
+                print(f"⚠️ Could not record progress of job {job_uuid}: {e}")
+        if send:
+            with self._lock:
+                self._outbox[job_uuid] = snapshot
+            self._wake.set()
+
+    def _send_loop(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            with self._lock:
+                outbox, self._outbox = self._outbox, {}
+            for job_uuid, snapshot in outbox.items():
+                try:
+                    response = self.session.post(
+                        f"{self.backend_url}{PROGRESS_PATH}",
+                        json={'job_uuid': job_uuid, 'status': 'processing', 'progress': snapshot},
+                        timeout=5
+                    )
+                    if response.status_code < 300:
+                        self.webhooks_sent += 1
+                    else:
+                        self.webhooks_failed += 1
+                except requests.RequestException:
+                    self.webhooks_failed += 1
+
+    def stats(self):
+        with self._lock:
+            running = len(self._jobs)
+        return {
+            'running_jobs': running,
+            'webhooks': self.webhooks,
+            'webhooks_sent': self.webhooks_sent,
+            'webhooks_failed': self.webhooks_failed
+        }
@@ -0,0 +1,354 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from collections import OrderedDict
+
+
+class RenderResultCache:
+    """
+    Content-addressed cache of finished renders.
+
+    Entries are keyed by a hash of the cleaned code, scene class, quality and
+    manim version, and map to the uploaded video of the render that produced
+    them. Eviction is LRU bounded by max_entries, plus a TTL so we never hand
+    out URLs to objects that may have been lifecycled out of the bucket.
+
+    The cache also tracks renders that are queued or in progress so identical
+    submissions attach to the running render instead of starting a new one.
+    A render in flight for longer than flight_ttl_seconds (its job was lost)
+    is taken over by the next identical job. With coalesce off, identical
+    jobs always render on their own.
+    """
+
+    def __init__(self, max_entries=None, ttl_seconds=None, flight_ttl_seconds=None, coalesce=True):
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv('RENDER_CACHE_MAX_ENTRIES', '1000'))
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else int(os.getenv('RENDER_CACHE_TTL_SECONDS', str(7 * 24 * 3600)))
+        self.flight_ttl_seconds = flight_ttl_seconds or int(os.getenv('RENDER_CACHE_FLIGHT_TTL_SECONDS', str(6 * 3600)))
+        self.coalesce = coalesce
+
+        self._entries = OrderedDict()  # key -> (stored_at, result)
+        self._in_flight = {}  # key -> {'leader': job_uuid, 'followers': [job_uuid, ...], 'started_at': time}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(cleaned_code, scene_class, quality, manim_version):
+        digest = hashlib.sha256()
+        for part in (cleaned_code, scene_class, quality, manim_version):
+            digest.update(str(part or '').encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def get(self, key):
+        """Return the cached result for key, or None"""
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and time.time() - entry[0] > self.ttl_seconds:
+                del self._entries[key]
+                self.evictions += 1
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(entry[1])
+
+    def put(self, key, result):
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self._entries[key] = (time.time(), dict(result))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def attach(self, key, job_uuid):
+        """
+        Register job_uuid as a render of key.
+
+        Returns None if job_uuid is now the leader (it must be rendered), or
+        the uuid of the job already rendering the same content, in which case
+        job_uuid will be completed together with it.
+        """
+        if not self.coalesce:
+            return None
+        with self._lock:
+            flight = self._in_flight.get(key)
+            if flight is None or flight['leader'] == job_uuid or \
+                    time.time() - flight['started_at'] > self.flight_ttl_seconds:
+                # A re-queued leader keeps the jobs waiting on it
+                followers = flight['followers'] if flight and flight['leader'] == job_uuid else []
+                self._in_flight[key] = {'leader': job_uuid, 'followers': followers, 'started_at': time.time()}
+                return None
+
+            if job_uuid not in flight['followers']:
+                flight['followers'].append(job_uuid)
+                self.coalesced += 1
+            return flight['leader']
+
+    def finish(self, key, leader=None):
+        """
+        Mark the render of key as done and return the jobs that were waiting
+        on it. With leader given, only that job's render is finished.
+        """
+        if not self.coalesce:
+            return []
+        with self._lock:
+            flight = self._in_flight.get(key)
+            if flight is None or (leader is not None and flight['leader'] != leader):
+                return []
+            del self._in_flight[key]
+        return flight['followers']
+
+    def detach(self, key, job_uuid):
+        """
+        Take a cancelled job out of the render of key. Returns (role, leader):
+        role is 'follower' if it was waiting on another job's render, 'shared'
+        if it leads a render other jobs still wait on (the render must go on),
+        'leader' if nothing else needs its render any more, or None if it
+        wasn't in flight.
+        """
+        if not self.coalesce:
+            return None, None
+        with self._lock:
+            flight = self._in_flight.get(key)
+            if flight is None:
+                return None, None
+            if job_uuid in flight['followers']:
+                flight['followers'].remove(job_uuid)
+                return 'follower', flight['leader']
+            if flight['leader'] != job_uuid:
+                return None, None
+            if flight['followers']:
+                return 'shared', job_uuid
+            del self._in_flight[key]
+            return 'leader', job_uuid
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'in_flight': len(self._in_flight),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'coalesced': self.coalesced,
+                'coalescing': self.coalesce,
+                'evictions': self.evictions
+            }
+
+
+class SQLiteRenderResultCache(RenderResultCache):
+    """
+    The render result cache in a SQLite database, shared by every process
+    that takes /render requests and the render process that fills it (see
+    SERVICE_ROLE). Attaching to and finishing an in-flight render are single
+    transactions, so identical jobs submitted to different front-end
+    processes (and render nodes sharing a work queue) still coalesce.
+    Recency is tracked to the minute.
+    """
+
+    def __init__(self, path, **kwargs):
+        super().__init__(**kwargs)
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30, isolation_level=None)
+        with self._lock:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS render_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    result TEXT NOT NULL,
+                    stored_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            ''')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS render_cache_accessed ON render_cache (accessed_at)')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS render_flights (
+                    cache_key TEXT PRIMARY KEY,
+                    leader TEXT NOT NULL,
+                    followers TEXT NOT NULL,
+                    started_at REAL NOT NULL
+                )
+            ''')
+
+    def _transaction(self, fn):
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                result = fn()
+                self._conn.execute('COMMIT')
+                return result
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT result, stored_at, accessed_at FROM render_cache WHERE cache_key = ?', (key,)
+            ).fetchone()
+            if row and now - row[1] > self.ttl_seconds:
+                self._conn.execute('DELETE FROM render_cache WHERE cache_key = ?', (key,))
+                self.evictions += 1
+                row = None
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            if now - row[2] > 60:
+                self._conn.execute('UPDATE render_cache SET accessed_at = ? WHERE cache_key = ?', (now, key))
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key, result):
+        if not self.enabled:
+            return
+
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO render_cache (cache_key, result, stored_at, accessed_at) VALUES (?, ?, ?, ?)',
+                (key, json.dumps(result), now, now)
+            )
+            self.evictions += self._conn.execute(
+                '''DELETE FROM render_cache WHERE cache_key IN (
+                       SELECT cache_key FROM render_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                   )''',
+                (self.max_entries,)
+            ).rowcount
+
+    def _flight(self, key):
+        row = self._conn.execute(
+            'SELECT leader, followers, started_at FROM render_flights WHERE cache_key = ?', (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {'leader': row[0], 'followers': json.loads(row[1]), 'started_at': row[2]}
+
+    def _save_flight(self, key, flight):
+        self._conn.execute(
+            'UPDATE render_flights SET followers = ? WHERE cache_key = ?', (json.dumps(flight['followers']), key)
+        )
+
+    def attach(self, key, job_uuid):
+        if not self.coalesce:
+            return None
+
+        def attach():
+            flight = self._flight(key)
+            if flight is None or flight['leader'] == job_uuid or \
+                    time.time() - flight['started_at'] > self.flight_ttl_seconds:
+                self._conn.execute(
+                    '''INSERT OR REPLACE INTO render_flights (cache_key, leader, followers, started_at)
+                       VALUES (?, ?, ?, ?)''',
+                    (key, job_uuid, json.dumps(flight['followers'] if flight and flight['leader'] == job_uuid else []),
+                     time.time())
+                )
+                return None
+
+            if job_uuid not in flight['followers']:
+                flight['followers'].append(job_uuid)
+                self._save_flight(key, flight)
+                self.coalesced += 1
+            return flight['leader']
+
+        return self._transaction(attach)
+
+    def finish(self, key, leader=None):
+        if not self.coalesce:
+            return []
+
+        def finish():
+            flight = self._flight(key)
+            if flight is None or (leader is not None and flight['leader'] != leader):
+                return []
+            self._conn.execute('DELETE FROM render_flights WHERE cache_key = ?', (key,))
+            return flight['followers']
+
+        return self._transaction(finish)
+
+    def detach(self, key, job_uuid):
+        if not self.coalesce:
+            return None, None
+
+        def detach():
+            flight = self._flight(key)
+            if flight is None:
+                return None, None
+            if job_uuid in flight['followers']:
+                flight['followers'].remove(job_uuid)
+                self._save_flight(key, flight)
+                return 'follower', flight['leader']
+            if flight['leader'] != job_uuid:
+                return None, None
+            if flight['followers']:
+                return 'shared', job_uuid
+            self._conn.execute('DELETE FROM render_flights WHERE cache_key = ?', (key,))
+            return 'leader', job_uuid
+
+        return self._transaction(detach)
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute('SELECT COUNT(*) FROM render_cache').fetchone()[0]
+            in_flight = self._conn.execute('SELECT COUNT(*) FROM render_flights').fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                'backend': 'sqlite',
+                'entries': entries,
+                'max_entries': self.max_entries,
+                'in_flight': in_flight,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'coalesced': self.coalesced,
+                'coalescing': self.coalesce,
+                'evictions': self.evictions
+            }
+
+
+def create_render_cache(url=None, shared=False, coalesce=True):
+    """
+    Build the render result cache named by RENDER_CACHE_URL: memory:// (this
+    process only) or sqlite:///path.db. Without one, processes that share
+    their jobs with others (shared=True) get sqlite:///data/render_cache.db.
+    """
+    url = url or os.getenv('RENDER_CACHE_URL') or ('sqlite:///data/render_cache.db' if shared else 'memory://')
+
+    if url.startswith('memory://'):
+        return RenderResultCache(coalesce=coalesce)
+    if url.startswith('sqlite:///'):
+        return SQLiteRenderResultCache(url[len('sqlite:///'):], coalesce=coalesce)
+
+    raise ValueError(f"Unsupported RENDER_CACHE_URL: {url}")
@@ -3,9 +3,284 @@ load_dotenv()
 
 import boto3
 import os
+import time
+import threading
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 from botocore.exceptions import BotoCoreError, NoCredentialsError
 from uuid import uuid4
 
+MB = 1024 * 1024
+# S3 rejects multipart parts smaller than this (except the last one)
+MIN_PART_SIZE = 5 * MB
+
+
+class S3Uploader:
+    """
+    Long-lived S3 / MinIO uploader.
+
+    Reads its settings once and keeps a single client (and its connection
+    pool) for the lifetime of the process. Multipart concurrency and part
+    size are tunable through the environment. A pre-built client can be
+    passed in to run against moto or a local MinIO.
+    """
+
+    def __init__(self, client=None, bucket_name=None, endpoint_url=None):
+        self.access_key_id = os.getenv("AWS_ACCESS_KEY_ID")
+        self.secret_access_key = os.getenv("AWS_SECRET_ACCESS_KEY")
+        self.bucket_name = bucket_name or os.getenv("AWS_BUCKET_NAME")
+        self.region = os.getenv("AWS_REGION", "us-east-1")
+        self.endpoint_url = endpoint_url or os.getenv("S3_ENDPOINT_URL")  # Optional for MinIO
+
+        self.part_size = max(MIN_PART_SIZE, int(os.getenv("S3_PART_SIZE_MB", "8")) * MB)
+        self.max_concurrency = int(os.getenv("S3_MAX_CONCURRENCY", "8"))
+        self.max_pool_connections = int(os.getenv("S3_MAX_POOL_CONNECTIONS", "32"))
+
+        self.transfer_config = TransferConfig(
+            multipart_threshold=self.part_size,
+            multipart_chunksize=self.part_size,
+            max_concurrency=self.max_concurrency,
+            use_threads=True
+        )
+
+        self._client = client
+        self._client_lock = threading.Lock()
+
+        # Aggregate throughput metrics
+        self._stats_lock = threading.Lock()
+        self.uploads = 0
+        self.failures = 0
+        self.bytes_uploaded = 0
+        self.seconds_uploading = 0.0
+
+    def missing_vars(self):
+        if self._client is not None:
+            return [] if self.bucket_name else ["AWS_BUCKET_NAME"]
+
+        missing_vars = []
+        if not self.access_key_id:
+            missing_vars.append("AWS_ACCESS_KEY_ID")
+        if not self.secret_access_key:
+            missing_vars.append("AWS_SECRET_ACCESS_KEY")
+        if not self.bucket_name:
+            missing_vars.append("AWS_BUCKET_NAME")
+        if not self.region:
+            missing_vars.append("AWS_REGION")
+        return missing_vars
+
+    @property
+    def client(self):
+        """The shared S3 client, created on first use"""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    s3_config = {
+                        "region_name": self.region,
+                        "aws_access_key_id": self.access_key_id,
+                        "aws_secret_access_key": self.secret_access_key,
+                        "config": Config(
+                            max_pool_connections=self.max_pool_connections,
+                            retries={"max_attempts": 5, "mode": "adaptive"},
+                            tcp_keepalive=True
+                        )
+                    }
+                    if self.endpoint_url:
+                        s3_config["endpoint_url"] = self.endpoint_url
+                    self._client = boto3.client("s3", **s3_config)
+        return self._client
+
+    def object_url(self, object_name):
+        if self.endpoint_url:
+            return f"{self.endpoint_url}/{self.bucket_name}/{object_name}"
+        return f"https://{self.bucket_name}.s3.{self.region}.amazonaws.com/{object_name}"
+
+    def _missing_vars_error(self):
+        missing_vars = self.missing_vars()
+        if missing_vars:
+            return {
+                "status": "error",
+                "message": f"Missing required AWS environment variables: {', '.join(missing_vars)}"
+            }
+        return None
+
+    def _record(self, object_name, size, started, success):
+        elapsed = time.time() - started
+        with self._stats_lock:
+            if success:
+                self.uploads += 1
+                self.bytes_uploaded += size
+                self.seconds_uploading += elapsed
+            else:
+                self.failures += 1
+
+        metrics = {
+            "bytes": size,
+            "seconds": round(elapsed, 3),
+            "throughput_mbps": round(size / MB / elapsed, 2) if elapsed > 0 else 0.0
+        }
+        if success:
+            print(f"☁️ Uploaded {object_name}: {size} bytes in {metrics['seconds']}s ({metrics['throughput_mbps']} MB/s)")
+        return metrics
+
+    def upload_file(self, file_path, object_name=None, content_type="video/mp4"):
+        """Upload a finished file, using parallel multipart for large files"""
+        error = self._missing_vars_error()
+        if error:
+            return error
+
+        # Default S3 object name if not provided
+        if not object_name:
+            object_name = f"videos/{uuid4()}.mp4"
+
+        started = time.time()
+        try:
+            size = os.path.getsize(file_path)
+            self.client.upload_file(
+                file_path,
+                self.bucket_name,
+                object_name,
+                ExtraArgs={"ContentType": content_type},
+                Config=self.transfer_config
+            )
+            metrics = self._record(object_name, size, started, True)
+            return {"status": "success", "url": self.object_url(object_name), "metrics": metrics}
+
+        except (BotoCoreError, NoCredentialsError) as e:
+            self._record(object_name, 0, started, False)
+            return {"status": "error", "message": str(e)}
+        except Exception as e:
+            self._record(object_name, 0, started, False)
+            return {"status": "error", "message": str(e)}
+
+    def upload_growing_file(self, file_path, object_name, done_event, content_type="video/mp4",
+                            poll_interval=0.5, cancel_event=None):
+        """
+        Stream a file to S3 while it is still being written.
+
+        Full parts are uploaded as soon as they are on disk; done_event must be
+        set once the writer has finished, and cancel_event (if given) when the
+        file should be discarded instead. The first part is held back until
+        the end because MP4 muxers seek back to patch the header. If the file
+        is replaced or truncated while streaming, the multipart upload is
+        aborted and the finished file is uploaded normally.
+        """
+        error = self._missing_vars_error()
+        if error:
+            return error
+
+        started = time.time()
+        upload_id = None
+        try:
+            while not os.path.exists(file_path):
+                if done_event.wait(poll_interval):
+                    if not os.path.exists(file_path) or (cancel_event is not None and cancel_event.is_set()):
+                        return {"status": "error", "message": f"File was never written: {file_path}"}
+                    break
+
+            inode = os.stat(file_path).st_ino
+            upload_id = self.client.create_multipart_upload(
+                Bucket=self.bucket_name, Key=object_name, ContentType=content_type
+            )["UploadId"]
+
+            parts = {}
+            offset = self.part_size  # Part 1 (the header) is uploaded last
+            with open(file_path, "rb") as f:
+                while True:
+                    if cancel_event is not None and cancel_event.is_set():
+                        raise _UploadCancelled()
+                    done = done_event.is_set()
+                    stat = os.stat(file_path)
+                    if stat.st_ino != inode or (offset > self.part_size and stat.st_size < offset):
+                        raise _FileReplaced()
+
+                    while stat.st_size - offset >= self.part_size or (done and stat.st_size > offset):
+                        length = min(self.part_size, stat.st_size - offset)
+                        f.seek(offset)
+                        part_number = offset // self.part_size + 1
+                        response = self.client.upload_part(
+                            Bucket=self.bucket_name, Key=object_name, UploadId=upload_id,
+                            PartNumber=part_number, Body=f.read(length)
+                        )
+                        parts[part_number] = response["ETag"]
+                        offset += length
+
+                    if done:
+                        break
+                    done_event.wait(poll_interval)
+
+                if cancel_event is not None and cancel_event.is_set():
+                    raise _UploadCancelled()
+                f.seek(0)
+                response = self.client.upload_part(
+                    Bucket=self.bucket_name, Key=object_name, UploadId=upload_id,
+                    PartNumber=1, Body=f.read(min(self.part_size, stat.st_size))
+                )
+                parts[1] = response["ETag"]
+
+            self.client.complete_multipart_upload(
+                Bucket=self.bucket_name, Key=object_name, UploadId=upload_id,
+                MultipartUpload={"Parts": [
+                    {"PartNumber": number, "ETag": parts[number]} for number in sorted(parts)
+                ]}
+            )
+            metrics = self._record(object_name, stat.st_size, started, True)
+            return {"status": "success", "url": self.object_url(object_name), "metrics": metrics}
+
+        except _UploadCancelled:
+            self._abort_multipart(object_name, upload_id)
+            return {"status": "error", "message": "Upload cancelled"}
+        except _FileReplaced:
+            self._abort_multipart(object_name, upload_id)
+            print(f"⚠️ {file_path} was rewritten while streaming, uploading the finished file instead")
+            done_event.wait()
+            if cancel_event is not None and cancel_event.is_set():
+                return {"status": "error", "message": "Upload cancelled"}
+            return self.upload_file(file_path, object_name, content_type)
+        except Exception as e:
+            self._abort_multipart(object_name, upload_id)
+            self._record(object_name, 0, started, False)
+            return {"status": "error", "message": str(e)}
+
+    def _abort_multipart(self, object_name, upload_id):
+        if not upload_id:
+            return
+        try:
+            self.client.abort_multipart_upload(Bucket=self.bucket_name, Key=object_name, UploadId=upload_id)
+        except Exception:
+            pass
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "uploads": self.uploads,
+                "failures": self.failures,
+                "bytes_uploaded": self.bytes_uploaded,
+                "avg_throughput_mbps": round(self.bytes_uploaded / MB / self.seconds_uploading, 2)
+                if self.seconds_uploading else 0.0
+            }
+
+
+class _FileReplaced(Exception):
+    pass
+
+
+class _UploadCancelled(Exception):
+    pass
+
+
+_default_uploader = None
+_default_uploader_lock = threading.Lock()
+
+
+def get_uploader():
+    """The process-wide S3 uploader"""
+    global _default_uploader
+    if _default_uploader is None:
+        with _default_uploader_lock:
+            if _default_uploader is None:
+                _default_uploader = S3Uploader()
+    return _default_uploader
+
 
 def upload_file_to_s3(file_path, object_name=None):
     """
@@ -14,58 +289,7 @@ def upload_file_to_s3(file_path, object_name=None):
     Reads AWS credentials from environment variables (.env).
     Validates them at runtime instead of import time.
     """
-    AWS_ACCESS_KEY_ID = os.getenv("AWS_ACCESS_KEY_ID")
-    AWS_SECRET_ACCESS_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
-    AWS_BUCKET_NAME = os.getenv("AWS_BUCKET_NAME")
-    AWS_REGION = os.getenv("AWS_REGION", "us-east-1")
-    S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL")  # Optional for MinIO
-
-    # Validate required vars
-    missing_vars = []
-    if not AWS_ACCESS_KEY_ID:
-        missing_vars.append("AWS_ACCESS_KEY_ID")
-    if not AWS_SECRET_ACCESS_KEY:
-        missing_vars.append("AWS_SECRET_ACCESS_KEY")
-    if not AWS_BUCKET_NAME:
-        missing_vars.append("AWS_BUCKET_NAME")
-    if not AWS_REGION:
-        missing_vars.append("AWS_REGION")
-
-    if missing_vars:
-        return {
-            "status": "error",
-            "message": f"Missing required AWS environment variables: {', '.join(missing_vars)}"
-        }
-
-    # Default S3 object name if not provided
-    if not object_name:
-        object_name = f"videos/{uuid4()}.mp4"
-
-    # Build S3 config
-    s3_config = {
-        "region_name": AWS_REGION,
-        "aws_access_key_id": AWS_ACCESS_KEY_ID,
-        "aws_secret_access_key": AWS_SECRET_ACCESS_KEY
-    }
-    if S3_ENDPOINT_URL:
-        s3_config["endpoint_url"] = S3_ENDPOINT_URL
-
-    # Create S3 client
-    s3 = boto3.client("s3", **s3_config)
-
-    try:
-        s3.upload_file(file_path, AWS_BUCKET_NAME, object_name, ExtraArgs={"ContentType": "video/mp4"})
-        if S3_ENDPOINT_URL:
-            s3_url = f"{S3_ENDPOINT_URL}/{AWS_BUCKET_NAME}/{object_name}"
-        else:
-            s3_url = f"https://{AWS_BUCKET_NAME}.s3.{AWS_REGION}.amazonaws.com/{object_name}"
-
-        return {"status": "success", "url": s3_url}
-
-    except (BotoCoreError, NoCredentialsError) as e:
-        return {"status": "error", "message": str(e)}
-    except Exception as e:
-        return {"status": "error", "message": str(e)}
+    return get_uploader().upload_file(file_path, object_name)
 
 
 # def generate_presigned_url(video_url: str):
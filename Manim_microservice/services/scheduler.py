@@ -0,0 +1,215 @@
+import os
+import re
+import time
+import uuid
+import threading
+
+from services.work_queue import WorkQueue, Lease
+
+# Lower rank is served first
+PRIORITY_CLASSES = {
+    'interactive': 0,
+    'standard': 1,
+    'batch': 2
+}
+
+# Rough render seconds per quality before any per-job estimate is available
+QUALITY_BASE_SECONDS = {
+    'low': 10,
+    'medium': 30,
+    'high': 90
+}
+
+
+def priority_class_for(job_data):
+    """Explicit config.priority, otherwise low-quality previews are interactive"""
+    config = job_data.get('config') or {}
+    priority = config.get('priority')
+    if priority in PRIORITY_CLASSES:
+        return priority
+    return 'interactive' if config.get('quality') == 'low' else 'standard'
+
+
+def static_job_estimate(job_data):
+    """Expected render seconds from the quality flag and the number of animations"""
+    config = job_data.get('config') or {}
+    base = QUALITY_BASE_SECONDS.get(config.get('quality', 'medium'), QUALITY_BASE_SECONDS['medium'])
+    plays = len(re.findall(r'\.(?:play|wait)\s*\(', job_data.get('code') or ''))
+    return base * (1 + plays / 10)
+
+
+class _Entry:
+    def __init__(self, job_data, cost, seq):
+        self.job_data = job_data
+        self.job_uuid = job_data['job_uuid']
+        self.user = str(job_data.get('user_id') or 'anonymous')
+        self.priority = priority_class_for(job_data)
+        self.cost = cost
+        self.seq = seq
+        self.enqueued_at = time.time()
+
+
+class FairScheduler(WorkQueue):
+    """
+    In-process work queue that decides which job a free worker gets next.
+
+    - Priority classes: interactive before standard before batch. Jobs age
+      one class up every SCHEDULER_AGING_SECONDS so batch work never starves.
+    - Fair share: within a class, the user who has received the least render
+      time (start-time fair queueing on expected seconds) goes next, so one
+      user's burst can't hold everyone else behind it.
+    - Shortest expected job first within a user's own queue.
+
+    The same ordering is simulated to report queue position and expected
+    wait for a job.
+    """
+
+    def __init__(self, cost_fn=None, aging_seconds=None, **kwargs):
+        super().__init__(**kwargs)
+        self.cost_fn = cost_fn or static_job_estimate
+        self.aging_seconds = aging_seconds or int(os.getenv('SCHEDULER_AGING_SECONDS', '300'))
+
+        self._entries = {}  # job_uuid -> _Entry
+        self._virtual_time = {}  # user -> render seconds received (fair-share tags)
+        self._clock = 0.0  # start tag of the job handed out last
+        self._running = {}  # lease_id -> _Entry
+        self._seq = 0
+        self._cond = threading.Condition()
+
+    # -- WorkQueue interface -------------------------------------------------
+
+    def put(self, job_data):
+        cost = self.cost_fn(job_data)
+        with self._cond:
+            if job_data['job_uuid'] in self._entries:
+                return
+            self._seq += 1
+            entry = _Entry(job_data, cost, self._seq)
+            self._entries[entry.job_uuid] = entry
+            # Users that were idle start at the current clock, so they don't
+            # get to cash in on render time they didn't use
+            self._virtual_time.setdefault(entry.user, self._clock)
+            self._cond.notify()
+
+    def lease(self, worker_id, timeout=1):
+        # Nothing to heartbeat for an in-process queue
+        return self._lease(worker_id, timeout)
+
+    def _lease(self, worker_id, timeout):
+        with self._cond:
+            if not self._entries:
+                self._cond.wait(timeout)
+            if not self._entries:
+                return None
+
+            entry = self._pick(self._entries.values(), self._virtual_time, time.time())
+            del self._entries[entry.job_uuid]
+            self._clock = self._charge(self._virtual_time, entry)
+
+            lease = Lease(entry.job_data, uuid.uuid4().hex, worker_id)
+            self._running[lease.lease_id] = entry
+            return lease
+
+    def ack(self, lease):
+        with self._cond:
+            entry = self._running.pop(lease.lease_id, None)
+            if entry:
+                self._forget_idle_user(entry.user)
+
+    def release(self, lease):
+        with self._cond:
+            entry = self._running.pop(lease.lease_id, None)
+            if entry:
+                self._entries[entry.job_uuid] = entry
+                self._cond.notify()
+
+    def qsize(self):
+        with self._cond:
+            return len(self._entries)
+
+    def remove(self, job_uuid):
+        with self._cond:
+            entry = self._entries.pop(job_uuid, None)
+            if entry:
+                self._forget_idle_user(entry.user)
+            return entry is not None
+
+    # -- Scheduling policy -----------------------------------------------------
+
+    def _rank(self, entry, now):
+        aged = int((now - entry.enqueued_at) // self.aging_seconds) if self.aging_seconds else 0
+        return max(0, PRIORITY_CLASSES[entry.priority] - aged)
+
+    def _pick(self, entries, virtual_time, now):
+        entries = list(entries)
+        best_rank = min(self._rank(e, now) for e in entries)
+        candidates = [e for e in entries if self._rank(e, now) == best_rank]
+
+        # The user who has received the least render time goes next
+        user = min(candidates, key=lambda e: (virtual_time.get(e.user, 0), e.seq)).user
+        return min(
+            (e for e in candidates if e.user == user),
+            key=lambda e: (e.cost, e.seq)
+        )
+
+    def _charge(self, virtual_time, entry):
+        """Charge entry's expected cost to its user; returns the entry's start tag"""
+        start = virtual_time.get(entry.user, 0)
+        virtual_time[entry.user] = start + entry.cost
+        return start
+
+    def _forget_idle_user(self, user):
+        """Idle users re-enter at the fair-share clock, so their history can go"""
+        busy = any(e.user == user for e in self._entries.values()) or \
+            any(e.user == user for e in self._running.values())
+        if not busy:
+            self._virtual_time.pop(user, None)
+
+    def _order(self):
+        """The order the currently queued jobs would be handed out in"""
+        entries = dict(self._entries)
+        virtual_time = dict(self._virtual_time)
+        now = time.time()
+        order = []
+        while entries:
+            entry = self._pick(entries.values(), virtual_time, now)
+            del entries[entry.job_uuid]
+            self._charge(virtual_time, entry)
+            order.append(entry)
+        return order
+
+    def estimate(self, job_uuid, workers=1, job_seconds=None):
+        """
+        (queue_position, estimated_wait_seconds) for a queued job: the expected
+        work ahead of it, including what is running now, spread over the workers.
+        """
+        with self._cond:
+            order = self._order()
+            running = sum(entry.cost for entry in self._running.values())
+
+        ahead = running
+        for position, entry in enumerate(order, start=1):
+            if entry.job_uuid == job_uuid:
+                return position, int(ahead / max(1, workers))
+            ahead += entry.cost
+        return 0, 0
+
+    def backlog_seconds(self, workers=1, job_seconds=None):
+        """Expected seconds until the queued and running work drains"""
+        with self._cond:
+            total = sum(e.cost for e in self._entries.values()) + sum(e.cost for e in self._running.values())
+        return total / max(1, workers)
+
+    def stats(self):
+        stats = super().stats()
+        with self._cond:
+            by_class = {}
+            for entry in self._entries.values():
+                by_class[entry.priority] = by_class.get(entry.priority, 0) + 1
+            stats.update(
+                queued_by_priority=by_class,
+                queued_users=len({e.user for e in self._entries.values()}),
+                running=len(self._running),
+                expected_backlog_seconds=int(sum(e.cost for e in self._entries.values()))
+            )
+        return stats
@@ -0,0 +1,241 @@
+import os
+import time
+import errno
+import shutil
+import threading
+from pathlib import Path
+from collections import OrderedDict
+
+
+class SegmentCache:
+    """
+    Shared, size-bounded store of manim partial movie files.
+
+    Manim names every partial movie after a hash of the animation, the
+    mobjects involved and the camera config, and skips rendering a play()
+    call when a file with that hash already exists in the scene's partial
+    movie directory. Each job gets its own partial movie directory (manim
+    writes a file list there, so it can't be shared between concurrent
+    renders); before the render it is populated with links to up to
+    max_links candidate segments, and afterwards newly rendered segments are
+    harvested back into the store. Candidates are the segments the last
+    render with the same hint (a retry of the job's scene) used, then the
+    most recently used segments of the bucket, so the work per render is
+    bounded however large the store grows.
+
+    Segments are bucketed by quality flag and evicted least-recently-used
+    once the store exceeds its byte budget. A hard link keeps its segment
+    alive when the store evicts it, so only symlinked segments are pinned
+    against eviction while a job uses them.
+    """
+
+    container_mount = '/manim/segments'
+    file_list_name = 'partial_movie_file_list.txt'
+    max_hints = 1024
+
+    def __init__(self, root=None, max_bytes=None, max_links=None):
+        self.root = Path(root or os.getenv('SEGMENT_CACHE_DIR', 'cache/segments'))
+        self.max_bytes = max_bytes if max_bytes is not None else int(os.getenv('SEGMENT_CACHE_MAX_MB', '2048')) * 1024 * 1024
+        self.max_links = max_links or int(os.getenv('SEGMENT_CACHE_MAX_LINKS', '1000'))
+
+        self._index = {}  # (bucket, name) -> [size, last_used]
+        self._pinned = {}  # (bucket, name) -> number of jobs currently symlinking it
+        self._job_pins = {}  # job partial dir -> names it pinned
+        self._hints = OrderedDict()  # (bucket, hint) -> names the last render with that hint used
+        self._lock = threading.Lock()
+        self.total_bytes = 0
+
+        if self.enabled:
+            self.root.mkdir(parents=True, exist_ok=True)
+            self._load_index()
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def _load_index(self):
+        for bucket_dir in self.root.iterdir():
+            if not bucket_dir.is_dir():
+                continue
+            for segment in bucket_dir.iterdir():
+                stat = segment.stat()
+                self._index[(bucket_dir.name, segment.name)] = [stat.st_size, stat.st_mtime]
+                self.total_bytes += stat.st_size
+
+    @staticmethod
+    def bucket_for(quality_flag):
+        return quality_flag.lstrip('-') or 'default'
+
+    def _store_path(self, bucket, name):
+        return self.root / bucket / name
+
+    def _candidates(self, bucket, hint):
+        """Up to max_links segment names: the hint's previous segments, then the most recently used"""
+        names = [name for name in self._hints.get((bucket, hint), ()) if (bucket, name) in self._index]
+        if len(names) < self.max_links:
+            chosen = set(names)
+            recent = sorted(
+                (entry[1], name) for (b, name), entry in self._index.items() if b == bucket and name not in chosen
+            )
+            names += [name for _, name in recent[::-1][:self.max_links - len(names)]]
+        return names[:self.max_links]
+
+    def prepare(self, bucket, job_partial_dir, hint=None):
+        """
+        Populate a job's partial movie directory with cached segments.
+
+        Segments are hard-linked when the store and the job directory share a
+        filesystem; otherwise they are symlinked to the store's mount inside
+        the render container. Returns the set of linked segment names, which
+        must be handed back to collect() along with the same hint.
+        """
+        job_partial_dir = Path(job_partial_dir)
+        job_partial_dir.mkdir(parents=True, exist_ok=True)
+
+        with self._lock:
+            names = self._candidates(bucket, hint)
+
+        linked = set()
+        for i, name in enumerate(names):
+            try:
+                os.link(self._store_path(bucket, name), job_partial_dir / name)
+                linked.add(name)
+            except OSError as e:
+                if e.errno == errno.EXDEV:  # Store is on another filesystem
+                    linked |= self._symlink(bucket, names[i:], job_partial_dir)
+                    break
+                # Evicted since the listing
+        return linked
+
+    def _symlink(self, bucket, names, job_partial_dir):
+        """Symlink segments into a job directory, pinned until collect()"""
+        with self._lock:
+            # Skip segments evicted since the listing; the rest stay until the job is collected
+            names = [name for name in names if (bucket, name) in self._index]
+            for name in names:
+                self._pinned[(bucket, name)] = self._pinned.get((bucket, name), 0) + 1
+            self._job_pins[str(job_partial_dir)] = names
+
+        linked = set()
+        for name in names:
+            try:
+                os.symlink(f"{self.container_mount}/{bucket}/{name}", job_partial_dir / name)
+                linked.add(name)
+            except OSError:
+                continue
+        return linked
+
+    def collect(self, bucket, job_partial_dir, linked, success=True, hint=None):
+        """
+        Harvest newly rendered segments from a finished job into the store,
+        refresh the segments it reused, and evict down to the byte budget.
+
+        Returns reuse stats for the job.
+        """
+        job_partial_dir = Path(job_partial_dir)
+        used = self._read_file_list(job_partial_dir)
+
+        reused = [name for name in used if name in linked]
+        rendered = [name for name in used if name not in linked]
+        bytes_reused = 0
+
+        with self._lock:
+            now = time.time()
+            for name in self._job_pins.pop(str(job_partial_dir), ()):
+                key = (bucket, name)
+                self._pinned[key] = self._pinned.get(key, 1) - 1
+                if self._pinned[key] <= 0:
+                    del self._pinned[key]
+
+            for name in reused:
+                entry = self._index.get((bucket, name))
+                if entry:
+                    entry[1] = now
+                    bytes_reused += entry[0]
+                    try:
+                        os.utime(self._store_path(bucket, name))
+                    except OSError:
+                        pass
+
+            if success:
+                (self.root / bucket).mkdir(exist_ok=True)
+                for name in rendered:
+                    self._harvest(bucket, job_partial_dir / name, now)
+
+            if hint is not None and used:
+                # Parts of one scene (shards) add to the hint's candidates
+                previous = self._hints.pop((bucket, hint), ())
+                self._hints[(bucket, hint)] = tuple(dict.fromkeys([*used, *previous]))[:self.max_links]
+                while len(self._hints) > self.max_hints:
+                    self._hints.popitem(last=False)
+
+            self._evict()
+
+        return {
+            'segments_total': len(used),
+            'segments_reused': len(reused),
+            'segments_rendered': len(rendered),
+            'reuse_ratio': round(len(reused) / len(used), 3) if used else 0.0,
+            'bytes_reused': bytes_reused
+        }
+
+    def _read_file_list(self, job_partial_dir):
+        """Names of the partial movies manim concatenated for the final video"""
+        file_list = job_partial_dir / self.file_list_name
+        if not file_list.exists():
+            return []
+
+        names = []
+        with open(file_list) as f:
+            for line in f:
+                line = line.strip()
+                if line.startswith('file '):
+                    names.append(os.path.basename(line[len('file '):].strip("'")))
+        return names
+
+    def _harvest(self, bucket, segment, now):
+        key = (bucket, segment.name)
+        if key in self._index or not segment.is_file() or segment.is_symlink():
+            return
+
+        destination = self._store_path(bucket, segment.name)
+        try:
+            try:
+                os.link(segment, destination)
+            except OSError:
+                # Different filesystem: fall back to a copy
+                shutil.copy2(segment, destination)
+            size = destination.stat().st_size
+        except OSError as e:
+            print(f"⚠️ Could not cache segment {segment.name}: {e}")
+            return
+
+        self._index[key] = [size, now]
+        self.total_bytes += size
+
+    def _evict(self):
+        if self.total_bytes <= self.max_bytes:
+            return
+
+        for key, (size, _) in sorted(self._index.items(), key=lambda item: item[1][1]):
+            if self.total_bytes <= self.max_bytes:
+                break
+            if key in self._pinned:
+                continue
+            try:
+                self._store_path(*key).unlink()
+            except FileNotFoundError:
+                pass
+            except OSError:
+                continue
+            del self._index[key]
+            self.total_bytes -= size
+
+    def stats(self):
+        with self._lock:
+            return {
+                'segments': len(self._index),
+                'bytes': self.total_bytes,
+                'max_bytes': self.max_bytes,
+                'max_links': self.max_links
+            }
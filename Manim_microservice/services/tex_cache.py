@@ -0,0 +1,94 @@
+import os
+import time
+import threading
+from pathlib import Path
+
+from services.segment_cache import SegmentCache
+from services.metrics import TEX_CACHE_LOOKUPS
+
+
+class TexCache(SegmentCache):
+    """
+    Shared, size-bounded store of compiled TeX SVGs.
+
+    Manim names each compiled expression after a hash of the full .tex file
+    (expression, environment and template) and skips latex/dvisvgm when the
+    SVG already sits in its tex_dir. Each run gets its own tex_dir (manim
+    deletes every non-SVG file there after a compile, so it can't be shared
+    by concurrent renders) populated with links to every cached SVG; newly
+    compiled SVGs are harvested back afterwards. With latex cleanup off,
+    manim writes a .tex file for every expression it looks up, which gives
+    the per-run hit rate.
+    """
+
+    container_mount = '/manim/tex-cache'
+    bucket = 'svg'
+
+    def __init__(self, root=None, max_bytes=None):
+        super().__init__(
+            root=root or os.getenv('TEX_CACHE_DIR', 'cache/tex'),
+            max_bytes=max_bytes if max_bytes is not None else int(os.getenv('TEX_CACHE_MAX_MB', '512')) * 1024 * 1024
+        )
+        self._counts_lock = threading.Lock()
+        self.lookups = 0
+        self.hits = 0
+
+    def prepare(self, job_tex_dir):
+        """Link every cached SVG into a run's tex_dir; returns the linked names for collect()"""
+        return super().prepare(self.bucket, job_tex_dir)
+
+    def collect(self, job_tex_dir, linked, success=True, count=True):
+        """
+        Harvest the SVGs a run compiled into the store and evict down to the
+        byte budget. Returns the run's {'lookups', 'hits', 'compiled', 'hit_ratio'};
+        count=False keeps them out of the cache-wide hit rate (dry runs, prewarming).
+        """
+        job_tex_dir = Path(job_tex_dir)
+        looked_up = {path.stem + '.svg' for path in job_tex_dir.glob('*.tex')}
+        compiled = [path for path in job_tex_dir.glob('*.svg') if path.name not in linked]
+        hits = [name for name in looked_up if name in linked]
+
+        with self._lock:
+            now = time.time()
+            for name in linked:
+                key = (self.bucket, name)
+                self._pinned[key] = self._pinned.get(key, 1) - 1
+                if self._pinned[key] <= 0:
+                    del self._pinned[key]
+
+            for name in hits:
+                entry = self._index.get((self.bucket, name))
+                if entry:
+                    entry[1] = now
+
+            if success:
+                (self.root / self.bucket).mkdir(parents=True, exist_ok=True)
+                for svg in compiled:
+                    self._harvest(self.bucket, svg, now)
+
+            self._evict()
+
+        lookups = max(len(looked_up), len(hits) + len(compiled))
+        if count:
+            with self._counts_lock:
+                self.lookups += lookups
+                self.hits += len(hits)
+            TEX_CACHE_LOOKUPS.inc(len(hits), result='hit')
+            TEX_CACHE_LOOKUPS.inc(lookups - len(hits), result='miss')
+        return {
+            'lookups': lookups,
+            'hits': len(hits),
+            'compiled': len(compiled),
+            'hit_ratio': round(len(hits) / lookups, 3) if lookups else None
+        }
+
+    def stats(self):
+        with self._lock:
+            stats = {'svgs': len(self._index), 'bytes': self.total_bytes, 'max_bytes': self.max_bytes}
+        with self._counts_lock:
+            stats.update(
+                lookups=self.lookups,
+                hits=self.hits,
+                hit_ratio=round(self.hits / self.lookups, 3) if self.lookups else None
+            )
+        return stats
@@ -0,0 +1,101 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from services.s3_manager import get_uploader
+
+
+class StreamingUpload:
+    """Handle for an upload that started before the render finished writing"""
+
+    def __init__(self, job_uuid, file_path, object_name):
+        self.job_uuid = job_uuid
+        self.file_path = file_path
+        self.object_name = object_name
+        self.done_event = threading.Event()
+        self.cancel_event = threading.Event()
+        self.future = None
+
+
+class UploadStage:
+    """
+    Uploads finished renders on a dedicated thread pool so a render worker
+    can start its next job while the previous video is still uploading.
+
+    Streaming uploads hold their thread for the whole render, so they run on
+    a pool of their own (one thread per render worker) and never queue
+    finished uploads behind them.
+    """
+
+    def __init__(self, uploader=None, max_workers=None, streaming=None, stream_workers=None):
+        self.uploader = uploader or get_uploader()
+        self.max_workers = max_workers or int(os.getenv('S3_UPLOAD_WORKERS', '4'))
+        self.streaming = streaming if streaming is not None else os.getenv('S3_STREAM_UPLOADS', 'false').lower() == 'true'
+        self.stream_workers = stream_workers or self.max_workers
+
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='s3-upload')
+        self._stream_executor = None
+        if self.streaming:
+            self._stream_executor = ThreadPoolExecutor(max_workers=self.stream_workers, thread_name_prefix='s3-stream')
+        self._lock = threading.Lock()
+        self.pending = 0
+
+    def _track(self, delta):
+        with self._lock:
+            self.pending += delta
+
+    def _on_future_done(self, job_uuid, future, on_done):
+        try:
+            s3_result = future.result()
+        except Exception as e:
+            s3_result = {'status': 'error', 'message': f"Upload exception: {str(e)}"}
+        finally:
+            self._track(-1)
+
+        try:
+            on_done(s3_result)
+        except Exception as e:
+            print(f"❌ Upload completion handler failed for job {job_uuid}: {str(e)}")
+
+    def submit(self, job_uuid, file_path, object_name, on_done, content_type='video/mp4'):
+        """Upload a finished file in the background and pass the S3 result to on_done"""
+        self._track(1)
+        future = self._executor.submit(self.uploader.upload_file, file_path, object_name, content_type)
+        future.add_done_callback(lambda f: self._on_future_done(job_uuid, f, on_done))
+
+    def stream(self, job_uuid, file_path, object_name, content_type='video/mp4'):
+        """
+        Start uploading file_path while it is being written. Set the handle's
+        done_event when the writer has finished, then call attach().
+        """
+        self._track(1)
+        handle = StreamingUpload(job_uuid, file_path, object_name)
+        handle.future = self._stream_executor.submit(
+            self.uploader.upload_growing_file, str(file_path), object_name, handle.done_event,
+            content_type, cancel_event=handle.cancel_event
+        )
+        return handle
+
+    def cancel(self, handle):
+        """Abort a streaming upload whose render failed"""
+        handle.cancel_event.set()
+        handle.done_event.set()
+        self.attach(handle, lambda s3_result: None)
+
+    def attach(self, handle, on_done):
+        """Pass the S3 result of a streaming upload to on_done once it completes"""
+        handle.future.add_done_callback(lambda f: self._on_future_done(handle.job_uuid, f, on_done))
+
+    def stats(self):
+        return {
+            'pending': self.pending,
+            'max_workers': self.max_workers,
+            'streaming': self.streaming,
+            'stream_workers': self.stream_workers if self.streaming else 0,
+            **self.uploader.stats()
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+        if self._stream_executor:
+            self._stream_executor.shutdown(wait=True)
@@ -0,0 +1,210 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from pathlib import Path
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from services.metrics import STAGE_SECONDS, WEBHOOKS_TOTAL
+
+COMPLETION_PATH = '/webhooks/job-completion'
+BATCH_PATH = '/webhooks/job-completion/batch'
+
+
+class WebhookDispatcher:
+    """
+    Delivers job completion webhooks to the backend.
+
+    Notifications are written to a SQLite outbox first and sent by a single
+    thread over a keep-alive session, several per POST when the backend has
+    the batch route. Failed deliveries stay in the outbox with exponential
+    backoff and whatever is left at shutdown is replayed at startup, so a
+    completion is only dropped when the backend rejects it outright (4xx).
+    """
+
+    def __init__(self, backend_url=None, api_key=None, path=None, batch_size=None, poll_seconds=None):
+        self.backend_url = (backend_url or os.getenv('BACKEND_URL', 'http://localhost:5000')).rstrip('/')
+        self.api_key = api_key or os.getenv('WEBHOOK_API_KEY')
+        self.path = Path(path or os.getenv('WEBHOOK_OUTBOX_PATH', 'data/webhook_outbox.db'))
+        self.batching = os.getenv('WEBHOOK_BATCH', 'true').lower() == 'true'
+        self.batch_size = batch_size or int(os.getenv('WEBHOOK_BATCH_SIZE', '25'))
+        self.timeout = float(os.getenv('WEBHOOK_TIMEOUT_SECONDS', '10'))
+        self.max_backoff = float(os.getenv('WEBHOOK_MAX_BACKOFF_SECONDS', '300'))
+        # Other processes (SERVICE_ROLE=api) write to the outbox without waking this one up,
+        # so with poll_seconds it is checked at least that often
+        self.poll_seconds = poll_seconds
+
+        self.session = requests.Session()
+        self.session.headers.update({'Content-Type': 'application/json', 'X-Webhook-Key': self.api_key or ''})
+        self.session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=2))
+        self.session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=2))
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.delivered = 0
+        self.dropped = 0
+        self.failed_attempts = 0
+        self.batches = 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        with self._lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS webhook_outbox (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    job_uuid TEXT NOT NULL UNIQUE,
+                    payload TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    next_attempt_at REAL NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_error TEXT
+                )
+            ''')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS webhook_outbox_due ON webhook_outbox (next_attempt_at)')
+
+    def start(self):
+        """Replay whatever a previous run left undelivered, then start sending"""
+        with self._lock, self._conn:
+            replayed = self._conn.execute(
+                'UPDATE webhook_outbox SET next_attempt_at = ?', (time.time(),)
+            ).rowcount
+        if replayed:
+            print(f"📬 Replaying {replayed} undelivered webhook(s) from the outbox")
+        self._thread = threading.Thread(target=self._run, daemon=True, name='webhook-dispatcher')
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self._wake.set()
+
+    def send(self, payload):
+        """Queue a completion for delivery; a newer notification for the same job replaces an undelivered one"""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                '''INSERT OR REPLACE INTO webhook_outbox (job_uuid, payload, attempts, next_attempt_at, created_at)
+                   VALUES (?, ?, 0, ?, ?)''',
+                (payload['job_uuid'], json.dumps(payload), now, now)
+            )
+        self._wake.set()
+
+    def pending(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM webhook_outbox').fetchone()[0]
+
+    def stats(self):
+        return {
+            'pending': self.pending(),
+            'delivered': self.delivered,
+            'dropped': self.dropped,
+            'failed_attempts': self.failed_attempts,
+            'batches': self.batches,
+            'batching': self.batching
+        }
+
+    def _due(self):
+        with self._lock:
+            rows = self._conn.execute(
+                '''SELECT id, job_uuid, payload, attempts, created_at FROM webhook_outbox
+                   WHERE next_attempt_at <= ? ORDER BY next_attempt_at LIMIT ?''',
+                (time.time(), self.batch_size if self.batching else 1)
+            ).fetchall()
+        return [
+            {'id': row[0], 'job_uuid': row[1], 'payload': json.loads(row[2]), 'attempts': row[3], 'created_at': row[4]}
+            for row in rows
+        ]
+
+    def _seconds_until_due(self):
+        with self._lock:
+            row = self._conn.execute('SELECT MIN(next_attempt_at) FROM webhook_outbox').fetchone()
+        if row[0] is None:
+            return None
+        return max(0.0, row[0] - time.time())
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                self._wake.clear()
+                events = self._due()
+                if events:
+                    self._deliver(events)
+                    continue
+                wait = self._seconds_until_due()
+                if self.poll_seconds:
+                    wait = self.poll_seconds if wait is None else min(wait, self.poll_seconds)
+                self._wake.wait(wait)
+            except Exception as e:
+                print(f"⚠️ Webhook dispatcher error: {str(e)}")
+                self._stop_event.wait(1)
+
+    def _deliver(self, events):
+        if self.batching and len(events) > 1:
+            try:
+                response = self.session.post(
+                    f"{self.backend_url}{BATCH_PATH}",
+                    json={'events': [event['payload'] for event in events]},
+                    timeout=self.timeout
+                )
+            except requests.RequestException as e:
+                for event in events:
+                    self._settle(event, None, str(e))
+                return
+
+            if response.status_code in (404, 405):
+                print("⚠️ Backend has no batch webhook route, sending completions one at a time")
+                self.batching = False
+            elif response.status_code == 200:
+                self.batches += 1
+                results = {r.get('job_uuid'): r for r in (response.json().get('results') or [])}
+                for event in events:
+                    result = results.get(event['job_uuid']) or {'status': 500, 'error': 'missing from batch response'}
+                    self._settle(event, result.get('status', 200), result.get('error'))
+                return
+            else:
+                for event in events:
+                    self._settle(event, response.status_code, response.text[:200])
+                return
+
+        for event in events:
+            try:
+                response = self.session.post(
+                    f"{self.backend_url}{COMPLETION_PATH}", json=event['payload'], timeout=self.timeout
+                )
+                self._settle(event, response.status_code, response.text[:200])
+            except requests.RequestException as e:
+                self._settle(event, None, str(e))
+
+    def _settle(self, event, status_code, error):
+        """Drop an outbox entry once it was accepted or rejected, otherwise schedule a retry"""
+        job_uuid = event['job_uuid']
+        retry = status_code is None or status_code >= 500 or status_code in (408, 429)
+
+        with self._lock, self._conn:
+            if retry:
+                attempts = event['attempts'] + 1
+                self._conn.execute(
+                    'UPDATE webhook_outbox SET attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?',
+                    (attempts, time.time() + min(self.max_backoff, 2 ** (attempts - 1)), error, event['id'])
+                )
+            else:
+                self._conn.execute('DELETE FROM webhook_outbox WHERE id = ?', (event['id'],))
+
+        if retry:
+            self.failed_attempts += 1
+            WEBHOOKS_TOTAL.inc(outcome='retried')
+            print(f"❌ Notify attempt {event['attempts'] + 1} failed for job {job_uuid}: {status_code or error}")
+        elif 200 <= status_code < 300:
+            self.delivered += 1
+            WEBHOOKS_TOTAL.inc(outcome='delivered')
+            STAGE_SECONDS.observe(time.time() - event['created_at'], stage='webhook')
+            print(f"✅ Successfully notified backend for job {job_uuid}")
+        else:
+            self.dropped += 1
+            WEBHOOKS_TOTAL.inc(outcome='dropped')
+            print(f"🚨 Backend rejected the notification for job {job_uuid}: {status_code} - {error}")
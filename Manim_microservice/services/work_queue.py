@@ -0,0 +1,428 @@
+import os
+import json
+import time
+import uuid
+import queue
+import socket
+import sqlite3
+import threading
+from pathlib import Path
+
+
+def default_node_id():
+    return os.getenv('NODE_ID') or f"{socket.gethostname()}-{os.getpid()}"
+
+
+class Lease:
+    """A job handed to one worker until it is acked, released or expires"""
+
+    def __init__(self, job_data, lease_id, worker_id, deliveries=1):
+        self.job_data = job_data
+        self.lease_id = lease_id
+        self.worker_id = worker_id
+        self.deliveries = deliveries
+
+    @property
+    def job_uuid(self):
+        return self.job_data.get('job_uuid')
+
+
+class WorkQueue:
+    """
+    Queue between /render and the render workers.
+
+    Workers lease jobs instead of popping them. While a lease is held a
+    background heartbeater keeps extending it; once the job is finished it
+    must be acked. A lease that is not extended (the node died) becomes
+    visible again after lease_seconds and is redelivered to another worker.
+    """
+
+    durable = False
+
+    def __init__(self, lease_seconds=None):
+        self.lease_seconds = lease_seconds or int(os.getenv('WORK_QUEUE_LEASE_SECONDS', '60'))
+        self._active = {}  # lease_id -> Lease
+        self._active_lock = threading.Lock()
+        self._heartbeater = None
+
+    def put(self, job_data):
+        """Add a job; putting a job that is already queued is a no-op"""
+        raise NotImplementedError
+
+    def _lease(self, worker_id, timeout):
+        raise NotImplementedError
+
+    def _extend(self, lease):
+        raise NotImplementedError
+
+    def _ack(self, lease):
+        raise NotImplementedError
+
+    def _release(self, lease):
+        raise NotImplementedError
+
+    def qsize(self):
+        raise NotImplementedError
+
+    def remove(self, job_uuid):
+        """Drop a job that hasn't been leased yet; returns whether it was queued"""
+        raise NotImplementedError
+
+    def lease(self, worker_id, timeout=1):
+        """Wait up to timeout seconds for a job; returns a Lease or None"""
+        lease = self._lease(worker_id, timeout)
+        if lease is not None:
+            with self._active_lock:
+                self._active[lease.lease_id] = lease
+            self._ensure_heartbeater()
+        return lease
+
+    def ack(self, lease):
+        """The job is finished and must not be redelivered"""
+        with self._active_lock:
+            self._active.pop(lease.lease_id, None)
+        self._ack(lease)
+
+    def release(self, lease):
+        """Give the job back to the queue for another worker"""
+        with self._active_lock:
+            self._active.pop(lease.lease_id, None)
+        self._release(lease)
+
+    def _ensure_heartbeater(self):
+        if self._heartbeater is None or not self._heartbeater.is_alive():
+            self._heartbeater = threading.Thread(target=self._heartbeat_loop, daemon=True, name="work-queue-heartbeat")
+            self._heartbeater.start()
+
+    def _heartbeat_loop(self):
+        interval = max(1, self.lease_seconds / 3)
+        while True:
+            time.sleep(interval)
+            with self._active_lock:
+                leases = list(self._active.values())
+            for lease in leases:
+                try:
+                    self._extend(lease)
+                except Exception as e:
+                    print(f"⚠️ Failed to extend lease for job {lease.job_uuid}: {e}")
+
+    def estimate(self, job_uuid, workers=1, job_seconds=30):
+        """
+        (queue_position, estimated_wait_seconds); FIFO queues only know their
+        depth, so every job ahead is assumed to take job_seconds.
+        """
+        position = self.qsize()
+        return position, int(position * job_seconds / max(1, workers))
+
+    def backlog_seconds(self, workers=1, job_seconds=30):
+        """Expected seconds until the queue drains, assuming job_seconds per queued job"""
+        return self.qsize() * job_seconds / max(1, workers)
+
+    def stats(self):
+        with self._active_lock:
+            leased_here = len(self._active)
+        return {
+            'backend': type(self).__name__,
+            'pending': self.qsize(),
+            'leased_by_this_node': leased_here,
+            'lease_seconds': self.lease_seconds
+        }
+
+
+class LocalWorkQueue(WorkQueue):
+    """In-process queue; leases can't outlive the process so they never expire"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._queue = queue.Queue()
+
+    def put(self, job_data):
+        self._queue.put(job_data)
+
+    def _lease(self, worker_id, timeout):
+        try:
+            job_data = self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        return Lease(job_data, uuid.uuid4().hex, worker_id)
+
+    def lease(self, worker_id, timeout=1):
+        # Nothing to heartbeat for an in-process queue
+        return self._lease(worker_id, timeout)
+
+    def ack(self, lease):
+        pass
+
+    def release(self, lease):
+        self._queue.put(lease.job_data)
+
+    def qsize(self):
+        return self._queue.qsize()
+
+    def remove(self, job_uuid):
+        with self._queue.mutex:
+            for job_data in self._queue.queue:
+                if job_data.get('job_uuid') == job_uuid:
+                    self._queue.queue.remove(job_data)
+                    self._queue.unfinished_tasks -= 1
+                    return True
+        return False
+
+
+class SQLiteWorkQueue(WorkQueue):
+    """
+    Queue in a SQLite database that several render nodes can share, e.g. on a
+    shared disk. Also the simplest way to test multi-node behaviour on one
+    machine: point two processes at the same file.
+    """
+
+    durable = True
+
+    def __init__(self, path, poll_interval=0.2, **kwargs):
+        super().__init__(**kwargs)
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.poll_interval = poll_interval
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS work_queue (
+                    job_uuid TEXT PRIMARY KEY,
+                    payload TEXT NOT NULL,
+                    enqueued_at REAL NOT NULL,
+                    lease_id TEXT,
+                    lease_owner TEXT,
+                    lease_expires_at REAL,
+                    deliveries INTEGER NOT NULL DEFAULT 0
+                )
+            ''')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS work_queue_visible ON work_queue (lease_expires_at, enqueued_at)')
+
+    def put(self, job_data):
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR IGNORE INTO work_queue (job_uuid, payload, enqueued_at) VALUES (?, ?, ?)',
+                (job_data['job_uuid'], json.dumps(job_data), time.time())
+            )
+
+    def _try_lease(self, worker_id):
+        now = time.time()
+        lease_id = uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = self._conn.execute(
+                    '''SELECT job_uuid, payload, deliveries FROM work_queue
+                       WHERE lease_expires_at IS NULL OR lease_expires_at < ?
+                       ORDER BY enqueued_at LIMIT 1''',
+                    (now,)
+                ).fetchone()
+                if row is None:
+                    self._conn.execute('COMMIT')
+                    return None
+                self._conn.execute(
+                    '''UPDATE work_queue SET lease_id = ?, lease_owner = ?, lease_expires_at = ?,
+                       deliveries = deliveries + 1 WHERE job_uuid = ?''',
+                    (lease_id, worker_id, now + self.lease_seconds, row['job_uuid'])
+                )
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+
+        if row['deliveries'] > 0:
+            print(f"♻️ Redelivering job {row['job_uuid']} (delivery {row['deliveries'] + 1})")
+        return Lease(json.loads(row['payload']), lease_id, worker_id, row['deliveries'] + 1)
+
+    def _lease(self, worker_id, timeout):
+        deadline = time.time() + timeout
+        while True:
+            lease = self._try_lease(worker_id)
+            if lease is not None or time.time() >= deadline:
+                return lease
+            time.sleep(self.poll_interval)
+
+    def _extend(self, lease):
+        with self._lock:
+            self._conn.execute(
+                'UPDATE work_queue SET lease_expires_at = ? WHERE job_uuid = ? AND lease_id = ?',
+                (time.time() + self.lease_seconds, lease.job_uuid, lease.lease_id)
+            )
+
+    def _ack(self, lease):
+        with self._lock:
+            self._conn.execute(
+                'DELETE FROM work_queue WHERE job_uuid = ? AND lease_id = ?',
+                (lease.job_uuid, lease.lease_id)
+            )
+
+    def _release(self, lease):
+        with self._lock:
+            self._conn.execute(
+                '''UPDATE work_queue SET lease_id = NULL, lease_owner = NULL, lease_expires_at = NULL
+                   WHERE job_uuid = ? AND lease_id = ?''',
+                (lease.job_uuid, lease.lease_id)
+            )
+
+    def qsize(self):
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT COUNT(*) FROM work_queue WHERE lease_expires_at IS NULL OR lease_expires_at < ?',
+                (time.time(),)
+            ).fetchone()
+        return row[0]
+
+    def remove(self, job_uuid):
+        with self._lock:
+            removed = self._conn.execute(
+                'DELETE FROM work_queue WHERE job_uuid = ? AND lease_id IS NULL',
+                (job_uuid,)
+            ).rowcount
+        return removed > 0
+
+
+class RedisWorkQueue(WorkQueue):
+    """
+    Queue on Redis (or any Redis-compatible server). Requires the optional
+    `redis` package.
+
+    Pending job ids live in a list, payloads in a hash and leases in a sorted
+    set scored by expiry; expired leases are moved back to the list by
+    whichever node polls next.
+    """
+
+    durable = True
+
+    # Pop the next job id and record its lease in one step
+    _LEASE_SCRIPT = """
+    local job_uuid = redis.call('RPOP', KEYS[1])
+    if not job_uuid then return nil end
+    redis.call('ZADD', KEYS[2], ARGV[1], job_uuid)
+    redis.call('HSET', KEYS[3], job_uuid, ARGV[2])
+    local deliveries = redis.call('HINCRBY', KEYS[4], job_uuid, 1)
+    return {job_uuid, deliveries}
+    """
+
+    # Requeue leases that were not extended in time
+    _REQUEUE_SCRIPT = """
+    local expired = redis.call('ZRANGEBYSCORE', KEYS[1], 0, ARGV[1])
+    for _, job_uuid in ipairs(expired) do
+        redis.call('ZREM', KEYS[1], job_uuid)
+        redis.call('HDEL', KEYS[3], job_uuid)
+        redis.call('RPUSH', KEYS[2], job_uuid)
+    end
+    return #expired
+    """
+
+    def __init__(self, url, prefix=None, poll_interval=0.2, **kwargs):
+        super().__init__(**kwargs)
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("WORK_QUEUE_URL uses redis:// but the 'redis' package is not installed")
+
+        self.redis = redis.Redis.from_url(url)
+        self.poll_interval = poll_interval
+        prefix = prefix or os.getenv('WORK_QUEUE_PREFIX', 'manim:work')
+        self.pending_key = f"{prefix}:pending"
+        self.leases_key = f"{prefix}:leases"
+        self.payloads_key = f"{prefix}:payloads"
+        self.lease_ids_key = f"{prefix}:lease_ids"
+        self.deliveries_key = f"{prefix}:deliveries"
+
+        self._lease_script = self.redis.register_script(self._LEASE_SCRIPT)
+        self._requeue_script = self.redis.register_script(self._REQUEUE_SCRIPT)
+
+    def put(self, job_data):
+        # The payload hash doubles as the de-duplication gate
+        if self.redis.hsetnx(self.payloads_key, job_data['job_uuid'], json.dumps(job_data)):
+            self.redis.lpush(self.pending_key, job_data['job_uuid'])
+
+    def _lease(self, worker_id, timeout):
+        deadline = time.time() + timeout
+        while True:
+            now = time.time()
+            self._requeue_script(keys=[self.leases_key, self.pending_key, self.lease_ids_key], args=[now])
+
+            lease_id = uuid.uuid4().hex
+            leased = self._lease_script(
+                keys=[self.pending_key, self.leases_key, self.lease_ids_key, self.deliveries_key],
+                args=[now + self.lease_seconds, lease_id]
+            )
+            if leased:
+                job_uuid = leased[0].decode('utf-8')
+                payload = self.redis.hget(self.payloads_key, job_uuid)
+                if payload is None:
+                    # Acked by a previous holder after its lease had expired
+                    self.redis.zrem(self.leases_key, job_uuid)
+                    continue
+                return Lease(json.loads(payload), lease_id, worker_id, int(leased[1]))
+
+            if time.time() >= deadline:
+                return None
+            time.sleep(self.poll_interval)
+
+    def _owns(self, lease):
+        current = self.redis.hget(self.lease_ids_key, lease.job_uuid)
+        return current is not None and current.decode('utf-8') == lease.lease_id
+
+    def _extend(self, lease):
+        if self._owns(lease):
+            self.redis.zadd(self.leases_key, {lease.job_uuid: time.time() + self.lease_seconds}, xx=True)
+
+    def _ack(self, lease):
+        if not self._owns(lease):
+            return
+        pipe = self.redis.pipeline()
+        pipe.zrem(self.leases_key, lease.job_uuid)
+        pipe.hdel(self.payloads_key, lease.job_uuid)
+        pipe.hdel(self.lease_ids_key, lease.job_uuid)
+        pipe.hdel(self.deliveries_key, lease.job_uuid)
+        pipe.execute()
+
+    def _release(self, lease):
+        if not self._owns(lease):
+            return
+        pipe = self.redis.pipeline()
+        pipe.zrem(self.leases_key, lease.job_uuid)
+        pipe.hdel(self.lease_ids_key, lease.job_uuid)
+        pipe.rpush(self.pending_key, lease.job_uuid)
+        pipe.execute()
+
+    def qsize(self):
+        return self.redis.llen(self.pending_key)
+
+    def remove(self, job_uuid):
+        if not self.redis.lrem(self.pending_key, 0, job_uuid):
+            return False
+        pipe = self.redis.pipeline()
+        pipe.hdel(self.payloads_key, job_uuid)
+        pipe.hdel(self.deliveries_key, job_uuid)
+        pipe.execute()
+        return True
+
+
+def create_work_queue(url=None, cost_fn=None):
+    """
+    Build the work queue named by WORK_QUEUE_URL: local:// (in-process,
+    the default; fair-share scheduled unless SCHEDULER=fifo),
+    sqlite:///path/to/queue.db or redis://host:6379/0. cost_fn(job_data)
+    gives the expected render seconds the scheduler orders jobs by.
+    """
+    url = url or os.getenv('WORK_QUEUE_URL', 'local://')
+
+    if url.startswith('local://'):
+        if os.getenv('SCHEDULER', 'fair') == 'fifo':
+            return LocalWorkQueue()
+        from services.scheduler import FairScheduler
+        return FairScheduler(cost_fn=cost_fn)
+    if url.startswith('sqlite:///'):
+        return SQLiteWorkQueue(url[len('sqlite:///'):])
+    if url.startswith('redis://') or url.startswith('rediss://'):
+        return RedisWorkQueue(url)
+
+    raise ValueError(f"Unsupported WORK_QUEUE_URL: {url}")
@@ -0,0 +1,316 @@
+import os
+import time
+import uuid
+import queue
+import threading
+
+from services.work_queue import default_node_id
+
+
+def _physical_memory_mb():
+    """Total physical memory of the host in MB (0 if it can't be determined)"""
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') // (1024 * 1024)
+    except (ValueError, OSError, AttributeError):
+        return 0
+
+
+def compute_pool_size():
+    """
+    Work out how many render workers to run.
+
+    RENDER_WORKERS can pin the number explicitly; otherwise ("auto") the pool
+    is sized so that every worker gets WORKER_CPUS cores and WORKER_MEMORY_MB
+    of memory out of the CPU / memory budget of the host.
+    """
+    configured = os.getenv('RENDER_WORKERS', 'auto').strip().lower()
+    if configured and configured != 'auto':
+        return max(1, int(configured))
+
+    cpus_per_worker = float(os.getenv('WORKER_CPUS', '1'))
+    memory_per_worker = int(os.getenv('WORKER_MEMORY_MB', '1536'))
+
+    cpu_budget = float(os.getenv('RENDER_CPU_BUDGET', os.cpu_count() or 1))
+    memory_budget = int(os.getenv('RENDER_MEMORY_BUDGET_MB', int(_physical_memory_mb() * 0.8)))
+
+    by_cpu = int(cpu_budget // cpus_per_worker) if cpus_per_worker > 0 else 1
+    by_memory = memory_budget // memory_per_worker if memory_per_worker > 0 and memory_budget > 0 else by_cpu
+
+    return max(1, min(by_cpu, by_memory))
+
+
+class _Part:
+    def __init__(self, fn, label):
+        self.fn = fn
+        self.label = label
+        self.result = None
+        self.done = threading.Event()
+
+    def run(self, container):
+        try:
+            self.result = self.fn(container)
+        except Exception as e:
+            self.result = {'status': 'failed', 'error': f"Exception: {str(e)}"}
+        finally:
+            self.done.set()
+
+
+class PartBoard:
+    """
+    Parts of a job (separate scenes, animation ranges) that any render worker
+    on this node picks up before leasing new work, so one submission can
+    render on several containers at once. Parts write to the node's local
+    output directory, so they never leave the node.
+    """
+
+    def __init__(self):
+        self._parts = queue.Queue()
+
+    def take(self):
+        try:
+            return self._parts.get_nowait()
+        except queue.Empty:
+            return None
+
+    def run(self, fns, container, label='part'):
+        """
+        Run fn(container) for every fn across idle workers and return the
+        results in order. The calling worker works through parts on its own
+        container as well, so this completes even when no one else is free.
+        """
+        parts = [_Part(fn, f"{label}#{index}") for index, fn in enumerate(fns)]
+        for part in parts:
+            self._parts.put(part)
+
+        while not all(part.done.is_set() for part in parts):
+            part = self.take()
+            if part is not None:
+                part.run(container)
+            else:
+                next(p for p in parts if not p.done.is_set()).done.wait(0.2)
+
+        return [part.result for part in parts]
+
+    def pending(self):
+        return self._parts.qsize()
+
+
+class RenderWorker:
+    """
+    One render slot: a thread that leases jobs from the work queue and
+    runs them in its own warm container. The handler receives the lease and
+    is responsible for acking it once the job is finished.
+    """
+
+    def __init__(self, worker_id, executor, work_queue, handler, health_interval=15, node_id=None, part_board=None):
+        self.worker_id = worker_id
+        self.part_board = part_board or PartBoard()
+        self.node_id = node_id or default_node_id()
+        self.executor = executor
+        self.work_queue = work_queue
+        self.handler = handler
+        self.health_interval = health_interval
+
+        self.container = None
+        self.state = 'starting'
+        self.current_job = None
+        self.jobs_processed = 0
+        self.restarts = 0
+        self.last_error = None
+        self.last_heartbeat = time.time()
+        self.last_health_check = 0
+
+        self._stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(
+            target=self._run,
+            daemon=True,
+            name=f"render-worker-{self.worker_id}"
+        )
+        self.thread.start()
+
+    def stop(self, keep_container=False):
+        self._stop_event.set()
+        if keep_container and self.container:
+            self.executor.release_container(self.container)
+            self.container = None
+        self._stop_container()
+
+    def is_alive(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def _container_name(self):
+        return f"manim-worker-{self.worker_id}-{uuid.uuid4().hex[:8]}"
+
+    def _stop_container(self):
+        if self.container:
+            self.executor.stop_container(self.container)
+            self.container = None
+
+    def _ensure_container(self):
+        """Health-check this worker's container and replace it if it died"""
+        self.last_health_check = time.time()
+
+        if self.container is None:
+            # A container left by the previous process, if it could be adopted
+            self.container = self.executor.claim_container(self.worker_id)
+        if self.container and self.executor.is_container_running(self.container):
+            return True
+
+        if self.container:
+            print(f"⚠️ Worker {self.worker_id}: container {self.container.id[:12]} is not running, replacing it")
+            self._stop_container()
+            self.restarts += 1
+
+        self.container = self.executor.start_container(self._container_name(), worker_id=self.worker_id)
+        if self.container:
+            self.last_error = None
+            return True
+
+        self.last_error = 'Failed to start container'
+        return False
+
+    def _run(self):
+        print(f"🔥 Render worker {self.worker_id} started")
+
+        while not self._stop_event.is_set():
+            self.last_heartbeat = time.time()
+
+            if not self.executor.ready.is_set():
+                # Docker and the image are still being set up
+                self.executor.ready.wait(1)
+                continue
+
+            if not self.container or time.time() - self.last_health_check >= self.health_interval:
+                if not self._ensure_container():
+                    self.state = 'unhealthy'
+                    self._stop_event.wait(self.health_interval)
+                    continue
+
+            # Help with parts of jobs running on other workers first
+            part = self.part_board.take()
+            if part is not None:
+                self._run_part(part)
+                continue
+
+            self.state = 'idle'
+            try:
+                lease = self.work_queue.lease(f"{self.node_id}/{self.worker_id}", timeout=1)
+            except Exception as e:
+                print(f"⚠️ Worker {self.worker_id} could not lease a job: {str(e)}")
+                self._stop_event.wait(1)
+                continue
+            if lease is None:
+                continue
+
+            self.state = 'busy'
+            self.current_job = lease.job_uuid
+            try:
+                self.handler(lease, self)
+            except Exception as e:
+                print(f"❌ Worker {self.worker_id} handler error: {str(e)}")
+            finally:
+                self.jobs_processed += 1
+                self.current_job = None
+
+        self.state = 'stopped'
+
+    def _run_part(self, part):
+        self.state = 'busy'
+        self.current_job = part.label
+        try:
+            part.run(self.container)
+        finally:
+            self.current_job = None
+
+    def run_parts(self, fns, label='part'):
+        """Render the parts of this worker's current job in parallel (see PartBoard)"""
+        return self.part_board.run(fns, self.container, label)
+
+    def status(self):
+        return {
+            'worker_id': self.worker_id,
+            'state': self.state if self.is_alive() or self.state == 'stopped' else 'dead',
+            'container_id': self.container.id[:12] if self.container else None,
+            'current_job': self.current_job,
+            'jobs_processed': self.jobs_processed,
+            'restarts': self.restarts,
+            'last_error': self.last_error,
+            'seconds_since_heartbeat': round(time.time() - self.last_heartbeat, 1)
+        }
+
+
+class WorkerPool:
+    """
+    A fixed-size pool of render workers sharing one work queue.
+
+    A supervisor thread watches the worker threads and replaces any that
+    died; each worker health-checks (and replaces) its own container.
+    """
+
+    def __init__(self, executor, work_queue, handler, size=None, health_interval=None):
+        self.executor = executor
+        self.work_queue = work_queue
+        self.handler = handler
+        self.size = size or compute_pool_size()
+        self.health_interval = health_interval or int(os.getenv('WORKER_HEALTH_INTERVAL', '15'))
+
+        self.workers = []
+        self.part_board = PartBoard()
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._supervisor = None
+
+    def _new_worker(self, worker_id):
+        return RenderWorker(
+            worker_id, self.executor, self.work_queue, self.handler, self.health_interval,
+            part_board=self.part_board
+        )
+
+    def start(self):
+        print(f"Starting render worker pool with {self.size} worker(s)")
+        with self._lock:
+            for worker_id in range(self.size):
+                worker = self._new_worker(worker_id)
+                self.workers.append(worker)
+                worker.start()
+
+        self._supervisor = threading.Thread(target=self._supervise, daemon=True, name="render-pool-supervisor")
+        self._supervisor.start()
+
+    def _supervise(self):
+        while not self._stop_event.wait(self.health_interval):
+            with self._lock:
+                for index, worker in enumerate(self.workers):
+                    if worker.is_alive():
+                        continue
+                    print(f"🚨 Render worker {worker.worker_id} died, replacing it")
+                    worker.stop()
+                    replacement = self._new_worker(worker.worker_id)
+                    replacement.restarts = worker.restarts + 1
+                    replacement.jobs_processed = worker.jobs_processed
+                    self.workers[index] = replacement
+                    replacement.start()
+
+    def stop(self, keep_containers=None):
+        """
+        Stop the workers. Their containers keep running for the next process
+        to adopt when WORKER_ADOPT is on (keep_containers overrides).
+        """
+        if keep_containers is None:
+            keep_containers = self.executor.adopt_workers
+        self._stop_event.set()
+        with self._lock:
+            for worker in self.workers:
+                worker.stop(keep_container=keep_containers)
+
+    def active_count(self):
+        return sum(1 for worker in self.workers if worker.current_job)
+
+    def ready_count(self):
+        return sum(1 for worker in self.workers if worker.container is not None)
+
+    def status(self):
+        return [worker.status() for worker in self.workers]
@@ -0,0 +1,31 @@
+from benchmarks.run import compare, output_sizes
+
+
+def report_with(output_bytes):
+    return {'jobs_per_min': 60.0, 'peak_rss_mb': 100.0, 'stages': {}, 'output_bytes': output_bytes}
+
+
+def test_output_sizes_per_profile():
+    sizes = output_sizes([
+        {'file_size': 700, 'encoding': {'profile': 'balanced', 'bytes': 700, 'rendered_bytes': 1000}},
+        {'file_size': 1400, 'encoding': {'profile': 'balanced', 'bytes': 1400, 'rendered_bytes': 2000}},
+        {'file_size': 500},
+    ])
+    assert sizes['balanced']['count'] == 2 and sizes['balanced']['p50'] == 700 and sizes['balanced']['p95'] == 1400
+    assert sizes['balanced']['total'] == 2100 and sizes['balanced']['ratio'] == 0.7
+    assert sizes['default']['total'] == 500 and sizes['default']['ratio'] == 1.0
+
+
+def test_bigger_output_is_a_regression():
+    baseline = report_with({'balanced': {'p50': 1000, 'p95': 2000, 'total': 10000}})
+    current = report_with({'balanced': {'p50': 1300, 'p95': 2050, 'total': 11500}})
+    rows = {metric: regressed for metric, _, _, _, regressed in compare(current, baseline, tolerance=0.1)}
+    assert rows['bytes.balanced.p50'] and rows['bytes.balanced.total']
+    assert not rows['bytes.balanced.p95'] and not rows['jobs_per_min']
+
+
+def test_profiles_missing_from_the_baseline_are_not_compared():
+    baseline = report_with({'balanced': {'p50': 1000, 'p95': 2000, 'total': 10000}})
+    rows = compare(report_with({'small': {'p50': 1, 'p95': 1, 'total': 1}}), baseline, tolerance=0.1)
+    assert not [row for row in rows if row[0].startswith('bytes.')]
+    assert compare(report_with({}), {'stages': {}}, tolerance=0.1) == []
@@ -0,0 +1,125 @@
+import sys
+import atexit
+import time
+import threading
+
+import pytest
+
+
+@pytest.fixture(scope='module')
+def service(tmp_path_factory):
+    """
+    The service with one render worker on the benchmark's fake Docker and S3.
+    Everything app.py touches is put back on teardown: environment, cwd,
+    docker.from_env, the default S3 uploader, metric callbacks, its threads
+    and atexit hooks.
+    """
+    import docker
+    from benchmarks import fakes
+    from services import s3_manager
+    from services.metrics import Gauge, registry
+
+    workdir = tmp_path_factory.mktemp('service')
+    fake_docker = fakes.FakeDockerClient(fakes.CostModel(time_scale=0.01))
+    with pytest.MonkeyPatch.context() as patch:
+        patch.chdir(workdir)
+        for name, value in {
+            'RENDER_WORKERS': '1',
+            'NODE_ID': 'test-cancel',
+            'WORKER_ADOPT': 'false',
+            'WEBHOOK_API_KEY': 'test',
+            'BACKEND_URL': 'http://127.0.0.1:9',
+            'JOB_STORE_URL': f"sqlite:///{workdir}/data/jobs.db",
+            'WEBHOOK_OUTBOX_PATH': f"{workdir}/data/webhook_outbox.db",
+            # The pruning and GC threads can't be stopped; keep them asleep
+            'JOB_STORE_PRUNE_INTERVAL': '86400',
+            'OUTPUT_GC_INTERVAL_SECONDS': '86400',
+        }.items():
+            patch.setenv(name, value)
+        patch.setattr(docker, 'from_env', lambda **kwargs: fake_docker)
+        patch.setattr(s3_manager, '_default_uploader',
+                      s3_manager.S3Uploader(client=fakes.FakeS3Client(), bucket_name='test'))
+        for metric in registry._metrics:
+            if isinstance(metric, Gauge):
+                patch.setattr(metric, '_function', metric._function)
+
+        import app
+        try:
+            deadline = time.time() + 30
+            while app.worker_pool.ready_count() == 0 and time.time() < deadline:
+                time.sleep(0.05)
+            yield app
+        finally:
+            atexit.unregister(app.worker_pool.stop)
+            atexit.unregister(app.webhook_dispatcher.stop)
+            app.worker_pool.stop(keep_containers=False)
+            app.webhook_dispatcher.stop()
+            app.upload_stage.shutdown()
+            for worker in app.worker_pool.workers:
+                if worker.thread:
+                    worker.thread.join(timeout=10)
+            sys.modules.pop('app', None)
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, 'timed out'
+        time.sleep(0.02)
+
+
+@pytest.fixture
+def webhooks(service, monkeypatch):
+    sent = []
+    monkeypatch.setattr(service.webhook_dispatcher, 'send', sent.append)
+    return sent
+
+
+@pytest.fixture
+def held_render(service, monkeypatch):
+    """render_job that waits for release(); it doesn't register with the executor, like a render on another node"""
+    started = threading.Event()
+    release = threading.Event()
+
+    def render_job(job_uuid, code, config, container, render_done=None, run_parts=None):
+        started.set()
+        release.wait(10)
+        path = service.manim_executor.output_path_for(job_uuid)
+        path.write_bytes(b'video')
+        return {'success': True, 'status': 'completed', 'video_path': str(path), 'file_size': 5}
+
+    monkeypatch.setattr(service.manim_executor, 'render_job', render_job)
+    return started, release
+
+
+CODE = "from manim import *\n\nclass Demo(Scene):\n    def construct(self):\n        self.wait()\n"
+
+
+def test_cancel_during_render_is_reported_once(service, webhooks, held_render):
+    started, release = held_render
+    client = service.app.test_client()
+    assert client.post('/render', json={'job_uuid': 'cancel-1', 'code': CODE}).status_code == 200
+    assert started.wait(10)
+
+    response = client.delete('/render/cancel-1')
+    assert response.status_code == 200 and response.json['status'] == 'cancelled'
+    release.set()
+
+    wait_for(lambda: service.work_queue.qsize() == 0 and not service.worker_pool.active_count())
+    time.sleep(0.2)
+    assert service.job_store.get_status('cancel-1') == 'cancelled'
+    assert [(event['job_uuid'], event['status']) for event in webhooks] == [('cancel-1', 'cancelled')]
+
+
+def test_job_cancelled_before_a_worker_took_it_is_skipped(service, webhooks, held_render):
+    started, release = held_render
+    record = {'job_uuid': 'cancel-2', 'code': CODE, 'config': {}}
+    service.job_store.enqueue(record)
+    service.job_store.finish('cancel-2', 'cancelled', dict(service.CANCELLED))
+    service.work_queue.put(record)
+
+    wait_for(lambda: service.work_queue.qsize() == 0)
+    time.sleep(0.2)
+    assert not started.is_set()
+    assert service.job_store.get_status('cancel-2') == 'cancelled'
+    assert webhooks == []
@@ -0,0 +1,54 @@
+import pytest
+
+from services.job_store import MemoryJobStore, SQLiteJobStore
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, tmp_path):
+    if request.param == 'memory':
+        return MemoryJobStore()
+    return SQLiteJobStore(tmp_path / 'jobs.db')
+
+
+def test_transitions_of_a_pending_job(store):
+    store.enqueue({'job_uuid': 'a'})
+    assert store.set_status('a', 'processing')
+    assert store.set_status('a', 'uploading')
+    assert store.get('a')['attempts'] == 1
+    assert store.finish('a', 'completed', {'success': True})
+    assert store.get_status('a') == 'completed'
+
+
+@pytest.mark.parametrize('final', ['cancelled', 'completed', 'failed', 'timed_out'])
+def test_final_states_are_not_overwritten_by_a_worker(store, final):
+    store.enqueue({'job_uuid': 'a'})
+    store.finish('a', final, {'success': final == 'completed'})
+
+    assert not store.set_status('a', 'processing')
+    assert not store.set_status('a', 'uploading')
+    assert store.get_status('a') == final
+    assert store.get('a')['attempts'] == 0
+
+
+def test_unknown_job(store):
+    assert not store.set_status('missing', 'processing')
+    assert store.get('missing') is None
+
+
+def test_cancelled_job_stays_cancelled(store):
+    store.enqueue({'job_uuid': 'a'})
+    store.set_status('a', 'processing')
+    assert store.finish('a', 'cancelled', {'success': False, 'status': 'cancelled'})
+
+    assert not store.finish('a', 'completed', {'success': True})
+    assert not store.finish('a', 'failed', {'success': False})
+    assert store.get_status('a') == 'cancelled'
+    assert store.get_result('a')['status'] == 'cancelled'
+
+
+def test_resubmitted_job_starts_over(store):
+    store.enqueue({'job_uuid': 'a'})
+    store.finish('a', 'cancelled', {'success': False})
+    store.enqueue({'job_uuid': 'a'})
+    assert store.set_status('a', 'processing')
+    assert store.finish('a', 'completed', {'success': True})
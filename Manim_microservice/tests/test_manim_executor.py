@@ -0,0 +1,105 @@
+import pytest
+
+from services.manim_executor import ManimExecutor
+
+CODE = '''from manim import *
+
+class Demo(Scene):
+    def construct(self):
+        self.play(Create(Circle()))
+'''
+
+
+@pytest.fixture
+def executor(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('MANIM_RUNTIME_PATH', str(tmp_path / 'manim_runtime.json'))
+    return ManimExecutor()
+
+
+def test_cache_is_bypassed_until_the_manim_version_is_known(executor):
+    assert executor.render_cache_key(CODE, {'quality': 'low'}) is None
+
+    executor._manim_version = 'Manim Community v0.19.0'
+    key = executor.render_cache_key(CODE, {'quality': 'low'})
+    assert key and key == executor.render_cache_key(CODE, {'quality': 'low'})
+    assert key != executor.render_cache_key(CODE, {'quality': 'high'})
+
+    executor._manim_version = 'Manim Community v0.19.1'
+    assert executor.render_cache_key(CODE, {'quality': 'low'}) != key
+
+
+def test_api_process_uses_the_published_version(executor, tmp_path):
+    worker = ManimExecutor()
+    worker._manim_version = 'Manim Community v0.19.0'
+    worker.publish_runtime()
+
+    assert executor.render_cache_key(CODE, {}) == worker.render_cache_key(CODE, {})
+
+
+def test_api_process_checks_names_against_the_published_namespace(executor):
+    code = 'class Demo(Scene):\n    def construct(self):\n        self.play(Creat(Circle()))\n'
+    # Before the render process has published the namespace, names can't be checked
+    assert executor.preflight(code)['ok']
+
+    worker = ManimExecutor()
+    worker._manim_version = 'Manim Community v0.19.0'
+    worker.manim_names = frozenset({'Scene', 'Circle', 'Create'})
+    worker.publish_runtime()
+    executor._runtime_checked = 0
+
+    report = executor.preflight(code)
+    assert [issue['type'] for issue in report['errors']] == ['undefined_name']
+    # Lines refer to the submitted code, not the prepended manim import
+    assert report['errors'][0]['line'] == 3
+    assert report['hints']['scenes'] == ['Demo']
+
+
+@pytest.mark.parametrize('count, min_animations, max_shards', [
+    (1, 8, 4), (7, 8, 4), (8, 8, 4), (16, 8, 4), (17, 8, 4), (31, 8, 4), (33, 8, 4), (100, 8, 4), (9, 1, 3), (5, 0, 8)
+])
+def test_shard_ranges_cover_every_animation_once(executor, count, min_animations, max_shards):
+    executor.shard_min_animations = min_animations
+    executor.max_shards = max_shards
+    ranges = executor.plan_shards(count)
+
+    # manim -n start,end is inclusive at both ends and counts from 0
+    assert ranges[0][0] == 0 and ranges[-1][1] == count - 1
+    for (_, end), (start, _) in zip(ranges, ranges[1:]):
+        assert start == end + 1
+    sizes = [end - start + 1 for start, end in ranges]
+    assert min(sizes) >= 1 and max(sizes) - min(sizes) <= 1
+    assert len(ranges) <= max_shards
+    assert len(ranges) == 1 or min(sizes) >= max(1, min_animations)
+
+
+def test_short_scenes_are_not_sharded(executor):
+    executor.shard_min_animations = 8
+    executor.max_shards = 4
+    assert executor.plan_shards(0) == [] and executor.plan_shards(None) == []
+    assert executor.plan_shards(15) == [(0, 14)]
+    assert executor.plan_shards(16) == [(0, 7), (8, 15)]
+
+
+def test_shards_render_their_ranges(executor, monkeypatch):
+    calls = []
+    monkeypatch.setattr(executor, '_run_code_in_persistent_container',
+                        lambda job_uuid, code, config, container, **kwargs: calls.append(kwargs) or {'status': 'success'})
+    monkeypatch.setattr(executor, '_render_parts',
+                        lambda job_uuid, tasks, labels, container, run_parts=None: (labels, [task(container) for task in tasks]))
+
+    labels, _ = executor._render_shards('job', CODE, {}, None, 'Demo', [(0, 4), (5, 9)])
+    assert [call['extra_args'] for call in calls] == [('-n', '0,4'), ('-n', '5,9')]
+    assert [call['part'] for call in calls] == [0, 1]
+    assert labels == ['Demo animations 0-4', 'Demo animations 5-9']
+
+
+def test_scene_detection_has_one_source(executor):
+    code = (
+        'from manim import *\n\nclass Helper:\n    pass\n\n'
+        'class Base(Scene):\n    pass\n\nclass Intro(Base):\n    pass\n\nclass Outro(ThreeDScene):\n    pass\n'
+    )
+    assert executor._extract_scene_classes(code) == ['Intro', 'Outro']
+    assert executor._extract_scene_class(code) == 'Intro'
+    # A class that isn't a scene is never picked to render
+    assert executor._extract_scene_class('class Helper:\n    pass\n') is None
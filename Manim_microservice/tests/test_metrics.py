@@ -0,0 +1,34 @@
+from services.metrics import Gauge, Registry
+from services.render_predictor import RenderPredictor
+
+CODE = "class A(Scene):\n    def construct(self):\n        self.play(Create(Circle()), run_time=2)\n"
+
+
+def prediction_gauges(predictor):
+    """Wired the way app.py does it"""
+    registry = Registry()
+    mae = registry.register(Gauge('manim_render_prediction_mae_seconds', 'MAE'))
+    mape = registry.register(Gauge('manim_render_prediction_mape', 'MAPE'))
+    mae.set_function(lambda: predictor.error_stats()['mae_seconds'])
+    mape.set_function(lambda: predictor.error_stats()['mape'])
+    return registry
+
+
+def test_prediction_error_is_exported_once_there_is_one(tmp_path):
+    predictor = RenderPredictor(path=tmp_path / 'stats.db')
+    registry = prediction_gauges(predictor)
+    # No finished predicted job yet: no sample rather than a made-up zero
+    assert not [line for line in registry.render().splitlines() if not line.startswith('#')]
+
+    for index, actual in enumerate((10.0, 30.0)):
+        predictor.record({'job_uuid': f"j{index}", 'code': CODE, 'config': {}, 'predicted_render_seconds': 20.0},
+                         {'render': actual}, success=True)
+    lines = registry.render().splitlines()
+    assert 'manim_render_prediction_mae_seconds 10.0' in lines
+    assert 'manim_render_prediction_mape 0.667' in lines
+
+
+def test_gauge_callbacks_that_fail_are_skipped():
+    gauge = Gauge('broken', 'Raises on scrape')
+    gauge.set_function(lambda: 1 / 0)
+    assert gauge.samples() == []
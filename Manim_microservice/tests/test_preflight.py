@@ -0,0 +1,87 @@
+import pytest
+
+from services.preflight import preflight, format_errors
+
+MANIM_NAMES = {'Scene', 'Circle', 'Square', 'Create', 'FadeIn', 'BLUE', 'UP', 'Tex', 'MathTex'}
+
+SCENE = '''from manim import *
+
+class Demo(Scene):
+    def construct(self):
+{body}
+'''
+
+
+def check(body, **kwargs):
+    code = SCENE.format(body='\n'.join('        ' + line for line in body.splitlines()))
+    return preflight(code, **kwargs)
+
+
+def types(report):
+    return [issue['type'] for issue in report['errors']]
+
+
+def test_clean_scene_passes_with_hints():
+    report = check('c = Circle(color=BLUE)\nself.play(Create(c))\nself.wait(2)', manim_names=MANIM_NAMES)
+    assert report['ok'] and report['errors'] == []
+    assert report['hints']['play_count'] == 1
+
+
+@pytest.mark.parametrize('body, kind', [
+    ('import os', 'forbidden_import'),
+    ('import os.path as p', 'forbidden_import'),
+    ('from subprocess import run', 'forbidden_import'),
+    ('open("/etc/passwd")', 'forbidden_call'),
+    ('eval("1 + 1")', 'forbidden_call'),
+    ('__import__("socket")', 'forbidden_call'),
+    ('x = ().__class__.__bases__', 'forbidden_attribute'),
+    ('f = self.construct.__globals__', 'forbidden_attribute'),
+    ('SVGMobject("logo.svg")', 'file_access'),
+    ('np.load("data.npy")', 'file_access'),
+])
+def test_forbidden_constructs_are_rejected(body, kind):
+    report = check(body)
+    assert not report['ok']
+    assert kind in types(report)
+
+
+def test_relative_and_extra_forbidden_imports(monkeypatch):
+    assert check('from .os import thing')['ok']
+    monkeypatch.setenv('PREFLIGHT_FORBIDDEN_MODULES', 'scipy, sympy')
+    assert types(check('import sympy')) == ['forbidden_import']
+
+
+def test_undefined_names_are_reported_once_with_their_line():
+    report = check('c = Circel()\nd = Circel()\nself.play(Create(c))', manim_names=MANIM_NAMES)
+    assert types(report) == ['undefined_name']
+    assert report['errors'][0]['line'] == 5
+    assert "'Circel'" in format_errors(report['errors'])
+
+
+def test_names_bound_anywhere_in_the_code_are_known():
+    body = '\n'.join([
+        'def helper(size):',
+        '    return Square(side_length=size)',
+        'for i in range(3):',
+        '    self.add(helper(i))',
+        'try:',
+        '    pass',
+        'except ValueError as err:',
+        '    print(err)',
+        'total = sum(x for x in [1, 2])',
+    ])
+    assert check(body, manim_names=MANIM_NAMES)['ok']
+
+
+def test_undefined_names_are_skipped_when_the_namespace_is_unknown():
+    # Without the manim namespace, or behind another star import, nothing can be told apart
+    assert check('c = Circel()')['ok']
+    code = 'from manim import *\nfrom numpy import *\n\nclass Demo(Scene):\n    def construct(self):\n        self.add(Circel())\n'
+    assert preflight(code, manim_names=MANIM_NAMES)['ok']
+
+
+def test_line_offset_and_syntax_errors():
+    code = 'from manim import *\n\nclass Demo(Scene):\n    def construct(self)\n        pass\n'
+    report = preflight(code, line_offset=2)
+    assert types(report) == ['syntax_error']
+    assert report['errors'][0]['line'] == 2
@@ -0,0 +1,55 @@
+import random
+
+from services.render_predictor import PRIOR_WEIGHTS, RenderPredictor, _RecursiveLeastSquares
+
+
+def train_without_tex(model, rng, samples=5000):
+    for _ in range(samples):
+        plays = rng.randint(1, 10)
+        seconds = plays * rng.uniform(1, 2)
+        model.update([1.0, plays, seconds, 0.0], 10 + 0.5 * plays + 1.5 * seconds + rng.gauss(0, 1))
+
+
+def test_covariance_stays_bounded_for_features_that_never_vary():
+    model = _RecursiveLeastSquares(PRIOR_WEIGHTS['medium'])
+    train_without_tex(model, random.Random(1))
+    assert max(model.p[i][i] for i in range(4)) <= model.max_variance * (1 + 1e-9)
+
+
+def test_one_outlier_barely_moves_the_model():
+    model = _RecursiveLeastSquares(PRIOR_WEIGHTS['medium'])
+    train_without_tex(model, random.Random(1))
+    before = model.predict([1.0, 3, 4, 6])
+
+    model.update([1.0, 3, 4, 1], 300.0)  # one TeX job stuck for 300 s
+
+    assert model.weights[3] < 10
+    assert model.predict([1.0, 3, 4, 6]) < before + 60
+
+
+def test_a_real_change_is_still_learned():
+    rng = random.Random(2)
+    model = _RecursiveLeastSquares(PRIOR_WEIGHTS['medium'])
+    train_without_tex(model, rng, samples=2000)
+    for _ in range(300):
+        plays = rng.randint(1, 10)
+        seconds = plays * rng.uniform(1, 2)
+        tex = rng.randint(0, 6)
+        model.update([1.0, plays, seconds, tex], 10 + 0.5 * plays + 1.5 * seconds + 10 * tex + rng.gauss(0, 1))
+    assert abs(model.weights[3] - 10) < 1
+
+
+def test_recorded_samples_are_replayed(tmp_path):
+    code = "class A(Scene):\n    def construct(self):\n" + "        self.play(Create(Circle()), run_time=2)\n" * 5
+    predictor = RenderPredictor(path=tmp_path / 'stats.db')
+    for index in range(50):
+        predictor.record({'job_uuid': f"j{index}", 'code': code, 'config': {'quality': 'low'}},
+                         {'render': 40.0}, success=True)
+    predictor.record({'job_uuid': 'failed', 'code': code, 'config': {'quality': 'low'}},
+                     {'render': 500.0}, success=False)
+    predicted = predictor.predict(code, {'quality': 'low'})
+    assert abs(predicted - 40) < 5
+
+    restarted = RenderPredictor(path=tmp_path / 'stats.db')
+    assert restarted.samples == 50
+    assert abs(restarted.predict(code, {'quality': 'low'}) - predicted) < 1e-6
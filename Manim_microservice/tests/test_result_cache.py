@@ -0,0 +1,77 @@
+import time
+
+import pytest
+
+from services.result_cache import RenderResultCache, SQLiteRenderResultCache, create_render_cache
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def cache(request, tmp_path):
+    if request.param == 'memory':
+        return RenderResultCache(max_entries=2, ttl_seconds=60)
+    return SQLiteRenderResultCache(tmp_path / 'cache.db', max_entries=2, ttl_seconds=60)
+
+
+def test_lru_eviction(cache):
+    cache.put('a', {'video_path': 'a'})
+    cache.put('b', {'video_path': 'b'})
+    cache.put('c', {'video_path': 'c'})
+    assert cache.get('a') is None
+    assert cache.get('c') == {'video_path': 'c'}
+
+
+def test_identical_jobs_attach_to_the_leader(cache):
+    assert cache.attach('k', 'leader') is None
+    assert cache.attach('k', 'f1') == 'leader'
+    assert cache.attach('k', 'f1') == 'leader'  # attaching twice doesn't add it twice
+    assert cache.attach('k', 'f2') == 'leader'
+
+    assert cache.finish('k', leader='f1') == []  # not the leader: nothing finishes
+    assert cache.finish('k', leader='leader') == ['f1', 'f2']
+    assert cache.attach('k', 'next') is None
+
+
+def test_requeued_leader_keeps_its_followers(cache):
+    cache.attach('k', 'leader')
+    cache.attach('k', 'f1')
+    assert cache.attach('k', 'leader') is None
+    assert cache.finish('k', leader='leader') == ['f1']
+
+
+def test_detach(cache):
+    cache.attach('k', 'leader')
+    cache.attach('k', 'f1')
+    assert cache.detach('k', 'leader') == ('shared', 'leader')
+    assert cache.detach('k', 'f1') == ('follower', 'leader')
+    assert cache.detach('k', 'leader') == ('leader', 'leader')
+    assert cache.detach('k', 'leader') == (None, None)
+
+
+def test_stale_flight_is_taken_over(cache):
+    cache.flight_ttl_seconds = 0.1
+    cache.attach('k', 'lost')
+    time.sleep(0.2)
+    assert cache.attach('k', 'new') is None
+    assert cache.finish('k', leader='lost') == []
+    assert cache.attach('k', 'f1') == 'new'
+
+
+def test_flights_are_shared_between_processes(tmp_path):
+    # Two nodes on one queue: the follower submitted to one is released by the other
+    submitting = SQLiteRenderResultCache(tmp_path / 'cache.db')
+    rendering = SQLiteRenderResultCache(tmp_path / 'cache.db')
+    assert submitting.attach('k', 'leader') is None
+    assert submitting.attach('k', 'follower') == 'leader'
+
+    rendering.put('k', {'video_path': 'v'})
+    assert rendering.finish('k', leader='leader') == ['follower']
+    assert submitting.get('k') == {'video_path': 'v'}
+    assert submitting.finish('k', leader='leader') == []
+
+
+def test_without_coalescing_every_job_renders(tmp_path):
+    cache = create_render_cache('memory://', coalesce=False)
+    assert cache.attach('k', 'a') is None
+    assert cache.attach('k', 'b') is None
+    assert cache.finish('k', leader='a') == []
+    assert cache.detach('k', 'b') == (None, None)
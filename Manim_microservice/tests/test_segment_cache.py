@@ -0,0 +1,90 @@
+import os
+import errno
+
+from services.segment_cache import SegmentCache
+
+
+def render(job_dir, segments):
+    """Write partial movies and the file list like a manim render would"""
+    for name, data in segments.items():
+        if not os.path.lexists(job_dir / name):
+            (job_dir / name).write_bytes(data)
+    (job_dir / SegmentCache.file_list_name).write_text(
+        ''.join(f"file '{job_dir / name}'\n" for name in segments)
+    )
+
+
+def test_eviction_leaves_hard_linked_segments_to_running_jobs(tmp_path):
+    cache = SegmentCache(root=tmp_path / 'store', max_bytes=100)
+    first = tmp_path / 'first'
+    cache.collect('l', first, cache.prepare('l', first), success=False)
+    render(first, {'a.mp4': b'a' * 60})
+    assert cache.collect('l', first, set())['segments_rendered'] == 1
+
+    running = tmp_path / 'running'
+    linked = cache.prepare('l', running)
+    assert linked == {'a.mp4'} and not cache._pinned
+
+    # Another job's segments push the store over its budget while 'running' renders
+    other = tmp_path / 'other'
+    cache.prepare('l', other)
+    render(other, {'a.mp4': b'', 'b.mp4': b'b' * 60})
+    cache.collect('l', other, {'a.mp4'})
+    assert cache.stats()['bytes'] <= 100
+    assert (running / 'a.mp4').read_bytes() == b'a' * 60
+
+    render(running, {'a.mp4': b''})
+    assert cache.collect('l', running, linked)['segments_reused'] == 1
+
+
+def test_symlinked_segments_are_pinned_until_collected(tmp_path, monkeypatch):
+    cache = SegmentCache(root=tmp_path / 'store', max_bytes=100)
+    seed = tmp_path / 'seed'
+    cache.prepare('l', seed)
+    render(seed, {'a.mp4': b'a' * 60})
+    cache.collect('l', seed, set())
+
+    def cross_device(src, dst):
+        raise OSError(errno.EXDEV, os.strerror(errno.EXDEV))
+
+    with monkeypatch.context() as m:
+        m.setattr(os, 'link', cross_device)
+        running = tmp_path / 'running'
+        linked = cache.prepare('l', running)
+    assert linked == {'a.mp4'} and (running / 'a.mp4').is_symlink()
+    assert cache._pinned == {('l', 'a.mp4'): 1}
+
+    other = tmp_path / 'other'
+    cache.prepare('l', other)
+    render(other, {'a.mp4': b'', 'b.mp4': b'b' * 60})
+    cache.collect('l', other, {'a.mp4'})
+    # The pinned segment survives; the store is over budget until the job is done
+    assert ('l', 'a.mp4') in cache._index
+
+    render(running, {'a.mp4': b''})
+    cache.collect('l', running, linked)
+    assert not cache._pinned
+
+
+def test_a_large_store_links_a_bounded_set_of_candidates(tmp_path):
+    cache = SegmentCache(root=tmp_path / 'store', max_bytes=10 ** 9, max_links=50)
+    seed = tmp_path / 'seed'
+    cache.prepare('l', seed)
+    render(seed, {f"{index:05d}.mp4": b'x' for index in range(5000)})
+    cache.collect('l', seed, set())
+    assert cache.stats()['segments'] == 5000
+
+    # A first render of the scene gets the most recently used segments
+    first = tmp_path / 'first'
+    linked = cache.prepare('l', first, hint='job/Demo')
+    assert len(linked) == 50 and len(os.listdir(first)) == 50
+    render(first, {'00007.mp4': b'', '00042.mp4': b'', 'new.mp4': b'n'})
+    stats = cache.collect('l', first, linked, hint='job/Demo')
+    assert stats['segments_rendered'] >= 1
+
+    # Its retry links what the first attempt used before anything else
+    retry = tmp_path / 'retry'
+    linked = cache.prepare('l', retry, hint='job/Demo')
+    assert len(linked) == 50 and {'00007.mp4', '00042.mp4', 'new.mp4'} <= linked
+    render(retry, {'00007.mp4': b'', '00042.mp4': b'', 'new.mp4': b''})
+    assert cache.collect('l', retry, linked, hint='job/Demo')['segments_reused'] == 3
@@ -0,0 +1,45 @@
+import threading
+
+from services.upload_stage import UploadStage
+
+
+class BlockingUploader:
+    """Streams until the writer is done; plain uploads return at once"""
+
+    def upload_file(self, file_path, object_name, content_type):
+        return {'status': 'success', 'object_name': object_name}
+
+    def upload_growing_file(self, file_path, object_name, done_event, content_type, cancel_event=None):
+        done_event.wait()
+        return {'status': 'cancelled' if cancel_event.is_set() else 'success', 'object_name': object_name}
+
+    def stats(self):
+        return {}
+
+
+def test_streams_do_not_block_finished_uploads():
+    stage = UploadStage(uploader=BlockingUploader(), max_workers=1, streaming=True, stream_workers=2)
+    streams = [stage.stream(f'render-{i}', f'/tmp/render-{i}.mp4', f'render-{i}.mp4') for i in range(2)]
+
+    uploaded = threading.Event()
+    stage.submit('done', '/tmp/done.mp4', 'done.mp4', lambda s3_result: uploaded.set())
+    assert uploaded.wait(timeout=2), 'finished upload queued behind running streams'
+
+    results = []
+    for handle in streams:
+        handle.done_event.set()
+        stage.attach(handle, results.append)
+    stage.shutdown()
+    assert [r['status'] for r in results] == ['success', 'success']
+    assert stage.pending == 0
+
+
+def test_cancelled_stream_releases_its_thread():
+    stage = UploadStage(uploader=BlockingUploader(), max_workers=1, streaming=True, stream_workers=1)
+    stage.cancel(stage.stream('failed', '/tmp/failed.mp4', 'failed.mp4'))
+
+    handle = stage.stream('next', '/tmp/next.mp4', 'next.mp4')
+    handle.done_event.set()
+    assert handle.future.result(timeout=2)['status'] == 'success'
+    stage.shutdown()
+    assert stage.stats()['stream_workers'] == 1
@@ -0,0 +1,65 @@
+import time
+
+from services.work_queue import SQLiteWorkQueue
+
+
+def make_queue(tmp_path, lease_seconds=1):
+    return SQLiteWorkQueue(tmp_path / 'queue.db', poll_interval=0.05, lease_seconds=lease_seconds)
+
+
+def test_expired_lease_is_redelivered_to_another_node(tmp_path):
+    dead_node = make_queue(tmp_path)
+    other_node = make_queue(tmp_path)
+    dead_node.put({'job_uuid': 'a'})
+
+    # _lease skips the heartbeater, like a node that died after leasing
+    lease = dead_node._lease('dead/0', timeout=0)
+    assert lease.job_uuid == 'a' and lease.deliveries == 1
+    assert other_node.lease('other/0', timeout=0) is None
+
+    time.sleep(1.1)
+    redelivered = other_node.lease('other/0', timeout=0)
+    assert redelivered.job_uuid == 'a'
+    assert redelivered.deliveries == 2
+
+    # The dead node's ack comes too late and must not drop the new lease
+    dead_node._ack(lease)
+    assert other_node.qsize() == 0
+    other_node.ack(redelivered)
+    time.sleep(1.1)
+    assert other_node.lease('other/0', timeout=0) is None
+
+
+def test_heartbeat_keeps_the_lease(tmp_path):
+    node = make_queue(tmp_path, lease_seconds=2)
+    other_node = make_queue(tmp_path, lease_seconds=2)
+    node.put({'job_uuid': 'a'})
+
+    lease = node.lease('node/0', timeout=0)
+    time.sleep(3)
+    assert other_node.lease('other/0', timeout=0) is None
+    node.ack(lease)
+
+
+def test_released_job_is_leased_again_right_away(tmp_path):
+    queue = make_queue(tmp_path, lease_seconds=60)
+    queue.put({'job_uuid': 'a'})
+    queue.put({'job_uuid': 'a'})  # already queued: no-op
+
+    lease = queue.lease('node/0', timeout=0)
+    assert queue.qsize() == 0
+    queue.release(lease)
+    again = queue.lease('node/1', timeout=0)
+    assert again.job_uuid == 'a' and again.deliveries == 2
+    assert queue.lease('node/1', timeout=0) is None
+
+
+def test_only_unleased_jobs_can_be_removed(tmp_path):
+    queue = make_queue(tmp_path, lease_seconds=60)
+    queue.put({'job_uuid': 'a'})
+    queue.put({'job_uuid': 'b'})
+
+    lease = queue.lease('node/0', timeout=0)
+    assert not queue.remove(lease.job_uuid)
+    assert queue.remove('b')
+    assert queue.lease('node/0', timeout=0) is None
@@ -0,0 +1,17 @@
+"""
+Render process of a split deployment: the render workers, uploads, webhook
+delivery and output GC, taking jobs from the shared work queue that the
+front ends (gunicorn -c gunicorn.conf.py app:app) fill. /health, /metrics and
+/profiles/slowest of the render side are served on WORKER_PORT.
+"""
+import os
+
+os.environ['SERVICE_ROLE'] = 'worker'
+
+from app import app  # noqa: E402
+
+
+if __name__ == '__main__':
+    port = int(os.environ.get('WORKER_PORT', 8001))
+    print(f"Starting Manim render process on port {port}")
+    app.run(host=os.environ.get('WORKER_HOST', '0.0.0.0'), port=port, debug=False, threaded=True)
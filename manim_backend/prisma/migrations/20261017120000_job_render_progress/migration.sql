@@ -0,0 +1,2 @@
+-- AlterTable
+ALTER TABLE "public"."jobs" ADD COLUMN     "renderProgress" INTEGER;
@@ -60,7 +60,7 @@ export const createJob = async (req: AuthenticatedRequest, res: Response) => {
 async function processJobAsync(jobId: number, jobUuid: string, prompt: string, config: any, userId: number, llm?: any) {
   try {
     // Step 1: Update status to running
-    await prisma.job.update({
+    const runningJob = await prisma.job.update({
       where: { id: jobId },
       data: { status: 'PROCESSING' }
     });
@@ -91,11 +91,40 @@ async function processJobAsync(jobId: number, jobUuid: string, prompt: string, c
       headers: { 'Content-Type': 'application/json' },
       body: JSON.stringify({
         job_uuid: jobUuid,
+        user_id: userId,
         code: codeResult.generatedCode,
-        config: config
+        config: config,
+        // Echoed back in the completion webhook so a redelivered failure is applied once
+        attempt: runningJob.retryLeft
       })
     });
 
+    if (pythonResponse.status === 422) {
+      // Rejected by preflight validation: re-prompt with the errors right away
+      const rejection = await pythonResponse.json();
+      console.warn(`🛑 Job ${jobUuid} rejected by preflight: ${rejection.error_message}`);
+      const job = await prisma.job.findUnique({ where: { id: jobId } });
+      if (job) {
+        await handleRenderFailure(job, rejection.error_message, rejection.error_category, rejection.error_line, runningJob.retryLeft);
+      }
+      return;
+    }
+
+    if (pythonResponse.status === 429) {
+      // Render backlog is over the admission limit: fail now rather than after a long wait
+      const throttled = await pythonResponse.json();
+      const retryAfter = pythonResponse.headers.get('Retry-After') || throttled.retry_after_seconds;
+      await prisma.job.update({
+        where: { id: jobId },
+        data: {
+          status: 'FAILED',
+          errorMessage: `The render service is busy, please try again in ${retryAfter} seconds`
+        }
+      });
+      console.warn(`🚦 Job ${jobUuid} throttled by the Python service, retry after ${retryAfter}s`);
+      return;
+    }
+
     if (!pythonResponse.ok) {
       throw new Error(`Python service error: ${pythonResponse.statusText}`);
     }
@@ -107,6 +136,12 @@ async function processJobAsync(jobId: number, jobUuid: string, prompt: string, c
     if (pythonResult.status === 'queued') {
       console.log(`✅ Job ${jobUuid} successfully queued in Python microservice`);
       console.log(`📋 Queue position: ${pythonResult.queue_position}, estimated wait: ${pythonResult.estimated_wait_seconds}s`);
+      if (pythonResult.downshift) {
+        console.log(`⏬ Job ${jobUuid} will render at ${JSON.stringify(pythonResult.downshift.applied)} because of load`);
+      }
+    } else if (pythonResult.status === 'completed') {
+      // Served from the render cache; the completion webhook carries the video
+      console.log(`♻️ Job ${jobUuid} served from the Python microservice render cache`);
     } else {
       // Python service failed
       await prisma.job.update({
@@ -179,7 +214,11 @@ export const getJobStatus = async (req: AuthenticatedRequest, res: Response) =>
       created_at: job.createdAt.toISOString(),
       completed_at: job.completedAt?.toISOString(),
       error_message: job.errorMessage,
-      progress: progressMap[job.status as keyof typeof progressMap],
+      // While rendering, 50-95 follows the render service's progress webhooks
+      progress: job.status === 'PROCESSING' && job.renderProgress != null
+        ? 50 + Math.round(job.renderProgress * 0.45)
+        : progressMap[job.status as keyof typeof progressMap],
+      render_progress: job.renderProgress,
 
       // ✅ Include video information when completed
       ...(job.videoId && {
@@ -197,72 +236,125 @@ export const getJobStatus = async (req: AuthenticatedRequest, res: Response) =>
   }
 };
 
-export const handleJobCompletion = async (req: Request, res: Response) => {
-  try {
-    const { job_uuid, status, video_url, file_size, error_message } = req.body;
+// Re-prompt the LLM with the render error while retries are left, otherwise fail the job.
+// error_category / error_line come from the Python service's preflight and dry-run checks.
+// attempt is the retryLeft the failed render was submitted with; a failure for an attempt
+// that was already handled (a redelivered webhook) is ignored.
+async function handleRenderFailure(job: any, error_message: string, error_category?: string, error_line?: number, attempt?: number) {
+  const job_uuid = job.jobUuid;
+  if (job.status !== 'PROCESSING' || (typeof attempt === 'number' && attempt !== job.retryLeft)) {
+    console.log(`♻️ Job ${job_uuid} already handled this failure, ignoring duplicate webhook`);
+    return;
+  }
 
-    console.log(`📡 Webhook received for job ${job_uuid}: ${status}`);
+  const retriesLeft = (job.retryLeft || 0) - 1;
+  // Conditional on what was just read, so two copies of the same event can't both spend a retry
+  const claimed = await prisma.job.updateMany({
+    where: { jobUuid: job_uuid, status: 'PROCESSING', retryLeft: job.retryLeft },
+    data: { retryLeft: retriesLeft }
+  });
+  if (claimed.count === 0) {
+    console.log(`♻️ Job ${job_uuid} failure was handled concurrently, ignoring duplicate webhook`);
+    return;
+  }
 
+  if (retriesLeft > 0) {
+    const category = error_category
+      ? `\n        ERROR_CATEGORY: ${error_category}${error_line ? ` (line ${error_line})` : ''}`
+      : '';
+    const newPrompt = `There is a problem with the generated code: 
+        CODE: ${job.generatedCode},
+        ERROR_MESSAGE: ${error_message}${category}`;
 
-    const job = await prisma.job.findUnique({ where: { jobUuid: job_uuid } });
+    console.log(`🔄 Retrying job ${job_uuid}, retries left: ${retriesLeft}`);
+    processJobAsync(job.id, job_uuid, newPrompt, {}, job.userId, 'openai');
+  }
+  else {
+    await prisma.job.update({
+      where: { jobUuid: job_uuid },
+      data: {
+        status: 'FAILED',
+        errorMessage: error_message || 'Unknown error'
+      }
+    });
+    console.log(`⛔ Job ${job_uuid} permanently failed`);
+  }
+}
 
-    if (!job) {
-      return res.status(404).json({ error: `Job ${job_uuid} not found` });
+// Applies one completion event; returns the HTTP status for it
+async function applyJobCompletion(event: any): Promise<number> {
+  const { job_uuid, status, video_url, error_message, error_category, error_line, downshift, profile, attempt } = event;
+
+  console.log(`📡 Webhook received for job ${job_uuid}: ${status}`);
+  if (downshift) {
+    console.log(`⏬ Job ${job_uuid} was rendered at ${JSON.stringify(downshift.applied)} instead of ${JSON.stringify(downshift.requested)}`);
+  }
+  if (profile?.totals) {
+    console.log(`⏱️ Job ${job_uuid} render profile: ${JSON.stringify(profile.totals)}`);
+  }
+
+  const job = await prisma.job.findUnique({ where: { jobUuid: job_uuid } });
+
+  if (!job) {
+    return 404;
+  }
+
+  if (status === 'completed' && video_url) {
+    if (job.status === 'COMPLETED' && job.videoId) {
+      // Redelivered notification: the video is already linked
+      console.log(`♻️ Job ${job_uuid} already completed, ignoring duplicate webhook`);
+      return 200;
     }
 
-    if (status === 'completed' && video_url) {
-      // Update job as completed
-      const [updatedJob, video] = await prisma.$transaction([
-        prisma.job.update({
-          where: { jobUuid: job_uuid },
-          data: {
-            status: 'COMPLETED',
-            completedAt: new Date()
-          }
-        }),
-        prisma.video.create({
-          data: {
-            userId: job.userId,
-            jobId: job.jobUuid,
-            title: `Video for ${job.prompt.substring(0, 30)}...`,
-            associatedCode: job.generatedCode || '',
-            videoUrl: video_url
-          }
-        })
-      ]);
-      // Link video to job
-      await prisma.job.update({
+    // Update job as completed
+    const [updatedJob, video] = await prisma.$transaction([
+      prisma.job.update({
         where: { jobUuid: job_uuid },
-        data: { videoId: video.id }
-      });
+        data: {
+          status: 'COMPLETED',
+          completedAt: new Date()
+        }
+      }),
+      prisma.video.create({
+        data: {
+          userId: job.userId,
+          jobId: job.jobUuid,
+          title: `Video for ${job.prompt.substring(0, 30)}...`,
+          associatedCode: job.generatedCode || '',
+          videoUrl: video_url
+        }
+      })
+    ]);
+    // Link video to job
+    await prisma.job.update({
+      where: { jobUuid: job_uuid },
+      data: { videoId: video.id }
+    });
 
-      console.log(`✅ Job ${job_uuid} completed with video ID ${video.id}`);
-    } else {
-      // Handle failure
-      const retriesLeft = (job.retryLeft || 0) - 1;
-      await prisma.job.update({
-        where: { jobUuid: job_uuid },
-        data: { retryLeft: retriesLeft }
-      });
+    console.log(`✅ Job ${job_uuid} completed with video ID ${video.id}`);
+  } else if (status === 'cancelled') {
+    // Cancelled on purpose: no re-prompt
+    await prisma.job.update({
+      where: { jobUuid: job_uuid },
+      data: {
+        status: 'FAILED',
+        errorMessage: error_message || 'Job was cancelled'
+      }
+    });
+    console.log(`🛑 Job ${job_uuid} was cancelled`);
+  } else {
+    // Handle failure (including renders that hit their time limit)
+    await handleRenderFailure(job, error_message, error_category, error_line, attempt);
+  }
+  return 200;
+}
 
-      if (retriesLeft > 0) {
-        const newPrompt = `There is a problem with the generated code: 
-        CODE: ${job.generatedCode},
-        ERROR_MESSAGE: ${error_message}`;
+export const handleJobCompletion = async (req: Request, res: Response) => {
+  try {
+    const status = await applyJobCompletion(req.body);
 
-        console.log(`🔄 Retrying job ${job_uuid}, retries left: ${retriesLeft}`);
-        processJobAsync(job.id, job_uuid, newPrompt, {}, job.userId, 'openai');
-      }
-      else {
-        await prisma.job.update({
-          where: { jobUuid: job_uuid },
-          data: {
-            status: 'FAILED',
-            errorMessage: error_message || 'Unknown error'
-          }
-        });
-        console.log(`⛔ Job ${job_uuid} permanently failed`);
-      }
+    if (status === 404) {
+      return res.status(404).json({ error: `Job ${req.body.job_uuid} not found` });
     }
     res.json({ success: true });
 
@@ -272,6 +364,54 @@ export const handleJobCompletion = async (req: Request, res: Response) => {
   }
 };
 
+// Several completion events in one request; each gets its own status
+export const handleJobCompletionBatch = async (req: Request, res: Response) => {
+  const { events } = req.body;
+
+  if (!Array.isArray(events)) {
+    return res.status(400).json({ error: 'events must be an array' });
+  }
+
+  const results = [];
+  for (const event of events) {
+    try {
+      const status = await applyJobCompletion(event);
+      results.push(status === 404
+        ? { job_uuid: event.job_uuid, status, error: `Job ${event.job_uuid} not found` }
+        : { job_uuid: event.job_uuid, status });
+    } catch (error) {
+      console.error(`Webhook error for job ${event.job_uuid}:`, error);
+      results.push({ job_uuid: event.job_uuid, status: 500, error: 'Webhook processing failed' });
+    }
+  }
+
+  console.log(`📡 Processed webhook batch of ${events.length} event(s)`);
+  res.json({ success: true, results });
+};
+
+
+// Live render progress (best effort, only sent with PROGRESS_WEBHOOKS on the render service)
+export const handleJobProgress = async (req: Request, res: Response) => {
+  const { job_uuid, progress } = req.body;
+  const percent = progress?.job_percent;
+
+  if (typeof percent !== 'number') {
+    // No animation count for this render, nothing to show yet
+    return res.json({ success: true });
+  }
+
+  try {
+    // A late progress update must not touch a job that already finished
+    await prisma.job.updateMany({
+      where: { jobUuid: job_uuid, status: 'PROCESSING' },
+      data: { renderProgress: Math.round(percent) }
+    });
+    res.json({ success: true });
+  } catch (error) {
+    console.error(`Progress webhook error for job ${job_uuid}:`, error);
+    res.status(500).json({ error: 'Progress update failed' });
+  }
+};
 
 // ✅ New endpoint to get presigned URL for video download
 export const getVideoUrl = async (req: AuthenticatedRequest, res: Response) => {
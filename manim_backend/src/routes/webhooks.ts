@@ -1,9 +1,11 @@
 import { Router } from "express";
 import { requireWebhookAuth } from "../middleware/webhookAuth";
-import { handleJobCompletion } from "../controllers/jobController";
+import { handleJobCompletion, handleJobCompletionBatch, handleJobProgress } from "../controllers/jobController";
 
 const router = Router();
 
 router.post('/job-completion', requireWebhookAuth, handleJobCompletion);
+router.post('/job-completion/batch', requireWebhookAuth, handleJobCompletionBatch);
+router.post('/job-progress', requireWebhookAuth, handleJobProgress);
 
 export default router;
@@ -19,6 +19,8 @@ export interface CodeGenerationRequest {
     quality?: 'low' | 'medium' | 'high';
     duration?: number;
     resolution?: '720p' | '1080p' | '4k';
+    encoding_profile?: string; // fast-preview, balanced, archival, web, gif (see the Python service)
+    profile?: boolean | 'cprofile' | { cprofile?: boolean }; // timings returned with the completion webhook
   };
 }
 